@@ -1,3 +1,25 @@
 from django.contrib import admin
+from .models import Booking, BookingSeat, BookingHistory
+from .services import cancel_bookings
 
-# Register your models here.
+class BookingSeatInline(admin.TabularInline):
+    model = BookingSeat
+    extra = 0
+
+@admin.register(Booking)
+class BookingAdmin(admin.ModelAdmin):
+    list_display = ('booking_id', 'user', 'schedule', 'total_amount', 'status', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('booking_id', 'user__username')
+    inlines = [BookingSeatInline]
+    actions = ['cancel_selected']
+
+    def cancel_selected(self, request, queryset):
+        cancelled = cancel_bookings(list(queryset), changed_by=request.user, reason='Cancelled by staff')
+        self.message_user(request, f'{cancelled} booking(s) cancelled.')
+    cancel_selected.short_description = 'Cancel selected bookings and release their seats'
+
+@admin.register(BookingHistory)
+class BookingHistoryAdmin(admin.ModelAdmin):
+    list_display = ('booking', 'status_change', 'changed_by', 'timestamp')
+    search_fields = ('booking__booking_id',)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from bookings.models import Booking
+from bookings.services import cancel_bookings, CANCELLABLE_STATUSES
+
+class Command(BaseCommand):
+    help = 'Cancel bookings in bulk and release their seats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('booking_ids', nargs='*', help='Booking ids to cancel')
+        parser.add_argument('--schedule', type=int, help='Cancel every active booking on this schedule')
+        parser.add_argument('--reason', default='Cancelled by operator')
+
+    def handle(self, *args, **options):
+        if not options['booking_ids'] and not options['schedule']:
+            raise CommandError('Give booking ids or --schedule.')
+
+        bookings = Booking.objects.filter(status__in=CANCELLABLE_STATUSES)
+        if options['booking_ids']:
+            bookings = bookings.filter(booking_id__in=options['booking_ids'])
+        if options['schedule']:
+            bookings = bookings.filter(schedule_id=options['schedule'])
+
+        cancelled = cancel_bookings(list(bookings), reason=options['reason'])
+        self.stdout.write(self.style.SUCCESS(f'{cancelled} booking(s) cancelled.'))
@@ -0,0 +1,207 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor
+from transportation.models import Schedule
+from transportation.inventory import seat_map
+import json
+import random
+import threading
+import time
+
+User = get_user_model()
+
+STEPS = ['search', 'seat_map', 'hold_seats', 'create_booking', 'process_payment']
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class FunnelStats:
+    """Thread-safe collector of per-step latencies and outcomes."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {step: [] for step in STEPS}
+        self.outcomes = {step: {'ok': 0, 'conflict': 0, 'error': 0} for step in STEPS}
+
+    def record(self, step, seconds, outcome):
+        with self.lock:
+            self.latencies[step].append(seconds)
+            self.outcomes[step][outcome] += 1
+
+    def summary(self, elapsed):
+        steps = {}
+        for step in STEPS:
+            latencies = self.latencies[step]
+            outcomes = self.outcomes[step]
+            total = sum(outcomes.values())
+            steps[step] = {
+                'requests': total,
+                'throughput_rps': round(total / elapsed, 2) if elapsed else None,
+                'p50_ms': _ms(percentile(latencies, 0.50)),
+                'p95_ms': _ms(percentile(latencies, 0.95)),
+                'p99_ms': _ms(percentile(latencies, 0.99)),
+                'error_rate': round(outcomes['error'] / total, 4) if total else None,
+                'conflict_rate': round(outcomes['conflict'] / total, 4) if total else None,
+                **outcomes,
+            }
+        return steps
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+class Command(BaseCommand):
+    help = 'Drive the search -> seat map -> booking -> payment funnel with concurrent simulated users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Concurrent simulated users')
+        parser.add_argument('--iterations', type=int, default=10, help='Funnel runs per user')
+        parser.add_argument('--schedules', type=int, default=5,
+                            help='Size of the pool of departures users pick from; smaller means more contention')
+        parser.add_argument('--max-seats', type=int, default=4, help='Maximum seats per booking')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', default='loadtest_results.json', help='Where to write the JSON report')
+
+    def handle(self, *args, **options):
+        schedules = list(
+            Schedule.objects.filter(status='scheduled', departure_date__gte=timezone.now().date())
+            .select_related('route')
+            .order_by('departure_date', 'departure_time')[:options['schedules']]
+        )
+        if not schedules:
+            raise CommandError('No upcoming schedules found. Run populate_data first.')
+
+        users = []
+        for number in range(options['users']):
+            user, created = User.objects.get_or_create(username=f'loadtest_user_{number:04d}')
+            if created:
+                user.set_unusable_password()
+                user.save()
+            users.append(user)
+
+        stats = FunnelStats()
+        base_seed = options['seed'] if options['seed'] is not None else random.randrange(1 << 30)
+
+        self.stdout.write(
+            f"Running {options['users']} users x {options['iterations']} iterations "
+            f"over {len(schedules)} schedules..."
+        )
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['users']) as pool:
+            futures = [
+                pool.submit(self.run_user, user, schedules, stats, options, random.Random(base_seed + index))
+                for index, user in enumerate(users)
+            ]
+            for future in futures:
+                future.result()
+        elapsed = time.perf_counter() - started
+
+        report = {
+            'finished_at': timezone.now().isoformat(),
+            'elapsed_seconds': round(elapsed, 3),
+            'config': {key: options[key] for key in ('users', 'iterations', 'schedules', 'max_seats')},
+            'seed': base_seed,
+            'steps': stats.summary(elapsed),
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+
+        for step, result in report['steps'].items():
+            self.stdout.write(
+                f"{step:16} {result['requests']:6} req  {result['throughput_rps']} rps  "
+                f"p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  "
+                f"errors {result['error_rate']}  conflicts {result['conflict_rate']}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def run_user(self, user, schedules, stats, options, rng):
+        client = Client()
+        client.force_login(user)
+        try:
+            for _ in range(options['iterations']):
+                self.run_funnel(client, user, rng.choice(schedules), stats, options, rng)
+        finally:
+            connections.close_all()
+
+    def timed(self, stats, step, request, classify):
+        started = time.perf_counter()
+        try:
+            response = request()
+        except Exception:
+            stats.record(step, time.perf_counter() - started, 'error')
+            return None
+        outcome = classify(response)
+        stats.record(step, time.perf_counter() - started, outcome)
+        return response if outcome == 'ok' else None
+
+    def run_funnel(self, client, user, schedule, stats, options, rng):
+        def status_ok(response):
+            return 'ok' if response.status_code == 200 else 'error'
+
+        search = self.timed(stats, 'search', lambda: client.get(reverse('transportation:search'), {
+            'origin': schedule.route.origin,
+            'destination': schedule.route.destination,
+            'departure_date': schedule.departure_date.isoformat(),
+        }), status_ok)
+        if search is None:
+            return
+
+        seat_map_url = reverse('transportation:seat_map', args=[schedule.id])
+        if self.timed(stats, 'seat_map', lambda: client.get(seat_map_url), status_ok) is None:
+            return
+
+        # Pick seats the way a user would: from what the seat map currently shows as free
+        free = [seat['id'] for row in seat_map(schedule, user=user) for seat in row['seats'] if seat['is_available']]
+        if not free:
+            stats.record('hold_seats', 0.0, 'conflict')
+            return
+        seat_ids = rng.sample(free, min(len(free), rng.randint(1, options['max_seats'])))
+
+        def hold_outcome(response):
+            if response.status_code == 409:
+                return 'conflict'
+            return status_ok(response)
+
+        if self.timed(stats, 'hold_seats', lambda: client.post(seat_map_url, {'seat_ids': seat_ids}), hold_outcome) is None:
+            return
+
+        def booking_outcome(response):
+            if response.status_code == 302 and '/bookings/confirm/' in response.url:
+                return 'ok'
+            if response.status_code == 302 and response.url == seat_map_url:
+                return 'conflict'
+            return 'error'
+
+        booking = self.timed(stats, 'create_booking', lambda: client.post(reverse('bookings:create_booking'), {
+            'schedule_id': schedule.id,
+            'seat_ids': seat_ids,
+            'passenger_names': [f'Passenger {index}' for index in range(len(seat_ids))],
+            'passenger_ages': [rng.randint(18, 80) for _ in seat_ids],
+            'passenger_genders': [rng.choice(['male', 'female', 'other']) for _ in seat_ids],
+            'special_requests': '',
+        }), booking_outcome)
+        if booking is None:
+            return
+        booking_id = booking.url.rstrip('/').rsplit('/', 1)[-1]
+
+        def payment_outcome(response):
+            # Payments are settled by the payment workers, so submitting one ends at the processing page
+            if response.status_code == 302 and '/payments/processing/' in response.url:
+                return 'ok'
+            return 'error'
+
+        self.timed(stats, 'process_payment', lambda: client.post(
+            reverse('payments:process_payment', args=[booking_id]),
+            {'payment_method': 'credit_card'}
+        ), payment_outcome)
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.12 on 2026-10-18 13:00
+
+from django.db import migrations
+import ticket_reservation_system.money
+from ticket_reservation_system.money import convert_to_cents
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_booking_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='total_amount',
+            field=ticket_reservation_system.money.MoneyField(),
+        ),
+        convert_to_cents('bookings', 'Booking', 'total_amount'),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.1.12 on 2026-10-18 15:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_booking_total_amount_cents'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='bookinghistory',
+            options={'ordering': ['timestamp', 'id']},
+        ),
+        migrations.AlterField(
+            model_name='bookinghistory',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='bookinghistory',
+            index=models.Index(fields=['booking', 'timestamp'], name='booking_history_time_idx'),
+        ),
+    ]
@@ -1,14 +1,10 @@
 from django.db import models
 from djongo import models as djongo_models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from transportation.models import Schedule, Seat
+from ticket_reservation_system.money import MoneyField
 import uuid
-import decimal
-from decimal import Decimal
-try:
-    from bson.decimal128 import Decimal128
-except ImportError:
-    Decimal128 = None
 
 User = get_user_model()
 
@@ -17,7 +13,7 @@ class Booking(djongo_models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE)
     booking_date = models.DateTimeField(auto_now_add=True)
-    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    total_amount = MoneyField()
     status = models.CharField(
         max_length=20,
         choices=[
@@ -33,28 +29,10 @@ class Booking(djongo_models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def save(self, *args, **kwargs):
-        # Ensure total_amount is a proper Decimal before saving
-        if self.total_amount is not None and not isinstance(self.total_amount, Decimal):
-            try:
-                # Handle MongoDB Decimal128 type
-                if Decimal128 and hasattr(self.total_amount, 'to_decimal'):
-                    self.total_amount = self.total_amount.to_decimal()
-                elif Decimal128 and str(type(self.total_amount)).find('Decimal128') != -1:
-                    self.total_amount = Decimal(str(self.total_amount))
-                # Handle string values that might have quotes
-                elif isinstance(self.total_amount, str):
-                    # Remove quotes and whitespace
-                    cleaned_amount = str(self.total_amount).strip().strip('"\'')
-                    self.total_amount = Decimal(cleaned_amount)
-                else:
-                    # Convert numeric types to string first, then to Decimal
-                    self.total_amount = Decimal(str(self.total_amount))
-            except (ValueError, TypeError, decimal.InvalidOperation):
-                # If conversion fails, set to 0.00 as fallback
-                self.total_amount = Decimal('0.00')
-
-        super().save(*args, **kwargs)
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', 'id'], name='booking_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Booking {self.booking_id} - {self.user.username}"
@@ -84,7 +62,14 @@ class BookingHistory(djongo_models.Model):
     status_change = models.CharField(max_length=50)
     changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     change_reason = models.TextField(blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens; rows are written later in batches by ticket_reservation_system.audit
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['timestamp', 'id']
+        indexes = [
+            models.Index(fields=['booking', 'timestamp'], name='booking_history_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.booking.booking_id} - {self.status_change}"
@@ -0,0 +1,78 @@
+"""
+Hand-written MongoDB reads for booking pages, used when settings.NATIVE_MONGO_READS is on.
+
+Records are dicts shaped like Booking instances as the templates use them,
+including `get_status_display` and `booked_seats.all`.
+"""
+from ticket_reservation_system.money import from_cents
+from ticket_reservation_system.mongo import collection, paginate_aggregate
+from transportation.models import Route, Schedule, Seat
+from transportation.repository import schedule_record
+from payments.models import Payment
+from .models import Booking, BookingSeat
+
+MY_BOOKINGS_ORDERING = ('-created_at', 'id')
+
+_STATUS_LABELS = dict(Booking._meta.get_field('status').choices)
+
+BOOKING_JOINS = [
+    {'$lookup': {'from': Schedule._meta.db_table, 'localField': 'schedule_id', 'foreignField': 'id', 'as': 'schedule'}},
+    {'$unwind': '$schedule'},
+    {'$lookup': {'from': Route._meta.db_table, 'localField': 'schedule.route_id', 'foreignField': 'id', 'as': 'schedule.route'}},
+    {'$unwind': '$schedule.route'},
+    {'$lookup': {'from': Payment._meta.db_table, 'localField': 'id', 'foreignField': 'booking_id', 'as': 'payment'}},
+    {'$lookup': {'from': BookingSeat._meta.db_table, 'localField': 'id', 'foreignField': 'booking_id', 'as': 'booked_seats'}},
+    {'$lookup': {'from': Seat._meta.db_table, 'localField': 'booked_seats.seat_id', 'foreignField': 'id', 'as': 'seats'}},
+]
+
+
+def booking_record(document):
+    seat_numbers = {seat['id']: seat['seat_number'] for seat in document.get('seats', [])}
+    booked_seats = [{
+        'id': booked['id'],
+        'seat': {'id': booked['seat_id'], 'seat_number': seat_numbers.get(booked['seat_id'])},
+        'passenger_name': booked['passenger_name'],
+        'passenger_age': booked['passenger_age'],
+        'passenger_gender': booked['passenger_gender'],
+    } for booked in sorted(document.get('booked_seats', []), key=lambda booked: booked['id'])]
+
+    payments = document.get('payment') or []
+    payment = None
+    if payments:
+        payment = dict(payments[0], amount=from_cents(payments[0]['amount']),
+                       refund_amount=from_cents(payments[0].get('refund_amount')))
+        payment.pop('_id', None)
+
+    return {
+        'id': document['id'],
+        'booking_id': document['booking_id'],
+        'user_id': document['user_id'],
+        'status': document['status'],
+        'get_status_display': _STATUS_LABELS.get(document['status'], document['status']),
+        'total_amount': from_cents(document['total_amount']),
+        'passenger_details': document.get('passenger_details') or [],
+        'special_requests': document.get('special_requests', ''),
+        'booking_date': document.get('booking_date'),
+        'created_at': document['created_at'],
+        'schedule': schedule_record(document['schedule']),
+        'payment': payment,
+        'booked_seats': {'all': booked_seats, 'count': len(booked_seats)},
+    }
+
+
+def user_bookings(user_id, page_size=10, after=None, before=None):
+    """Native equivalent of MyBookingsView's queryset and keyset page."""
+    return paginate_aggregate(
+        Booking, {'user_id': user_id}, MY_BOOKINGS_ORDERING, page_size, booking_record,
+        stages=BOOKING_JOINS, after=after, before=before,
+    )
+
+
+def booking_detail(user_id, booking_id):
+    """One of the user's bookings with everything the detail page shows, or None."""
+    documents = list(collection(Booking).aggregate([
+        {'$match': {'user_id': user_id, 'booking_id': booking_id}},
+        {'$limit': 1},
+        *BOOKING_JOINS,
+    ]))
+    return booking_record(documents[0]) if documents else None
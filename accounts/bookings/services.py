@@ -0,0 +1,160 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from transportation.models import Schedule
+from transportation.allocation import MAX_GROUP_SIZE
+from transportation.inventory import claim_seats, release_seats, SeatUnavailableError
+from transportation.search_cache import bump_date_version
+from reporting import rollups
+from ticket_reservation_system import audit
+from .models import Booking, BookingSeat, BookingHistory
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+SERVICE_FEE = Decimal('2.00')
+
+# Bookings in these states hold seats on their schedule
+ACTIVE_STATUSES = ['pending', 'confirmed', 'completed']
+CANCELLABLE_STATUSES = ['pending', 'confirmed']
+
+
+class BookingError(Exception):
+    """Raised when a booking request is invalid or cannot be fulfilled."""
+
+
+def calculate_total(schedule, seat_count, unit_price=None):
+    unit_price = schedule.price if unit_price is None else unit_price
+    return unit_price * seat_count + SERVICE_FEE
+
+
+def create_booking(user, schedule, seat_ids, passengers, special_requests='', unit_price=None):
+    """
+    Book all requested seats on a schedule or none of them.
+
+    `passengers` is a list of dicts with `name`, `age` and `gender`, one per seat.
+    Seats are charged `unit_price` (the fare quoted to the user), or the
+    schedule's current price when it is not given.
+    Seats are claimed with a single conditional write on the schedule's inventory,
+    booking seats are written with one bulk insert and the schedule's seat counter
+    is decremented in place. If anything fails the seats are released again.
+    """
+    seat_ids = [int(seat_id) for seat_id in seat_ids]
+    if not seat_ids:
+        raise BookingError('Please select at least one seat.')
+    if len(seat_ids) > MAX_GROUP_SIZE:
+        raise BookingError(f'At most {MAX_GROUP_SIZE} seats can be booked at once.')
+    if len(set(seat_ids)) != len(seat_ids):
+        raise BookingError('The same seat was selected more than once.')
+    if len(passengers) != len(seat_ids):
+        raise BookingError('Passenger details are required for every seat.')
+
+    # Raises SeatUnavailableError without touching anything if a seat is taken
+    # or held by someone else; the user's own holds are converted into the booking
+    claim_seats(schedule, seat_ids, user=user)
+
+    try:
+        with transaction.atomic():
+            booking = Booking.objects.create(
+                booking_id=str(uuid.uuid4())[:8].upper(),
+                user=user,
+                schedule=schedule,
+                total_amount=calculate_total(schedule, len(seat_ids), unit_price),
+                passenger_details=passengers,
+                special_requests=special_requests,
+            )
+            BookingSeat.objects.bulk_create([
+                BookingSeat(
+                    booking=booking,
+                    seat_id=seat_id,
+                    passenger_name=passenger['name'],
+                    passenger_age=passenger['age'],
+                    passenger_gender=passenger['gender'],
+                )
+                for seat_id, passenger in zip(seat_ids, passengers)
+            ])
+            Schedule.objects.filter(pk=schedule.pk).update(
+                available_seats=F('available_seats') - len(seat_ids)
+            )
+            audit.record(
+                BookingHistory,
+                booking_id=booking.pk,
+                status_change='Booking created',
+                changed_by=user,
+                change_reason=f'{len(seat_ids)} seat(s) booked',
+            )
+    except Exception:
+        # The inventory lives outside the transaction, so undo the claim explicitly
+        release_seats(schedule, seat_ids)
+        raise
+
+    bump_date_version(schedule.departure_date)
+    rollups.record_booking(schedule.pk, len(seat_ids))
+
+    return booking
+
+
+def cancel_bookings(bookings, changed_by=None, reason=''):
+    """
+    Cancel many bookings at once and give their seats back.
+
+    Bookings that are not pending or confirmed are skipped. Each status change is
+    a conditional update, so of two concurrent cancellations (or a cancellation
+    racing a refund) only one releases the seats. Each affected schedule then gets
+    one inventory write and one counter update, and the history entries go to the
+    buffered audit writer. Returns the number of bookings cancelled.
+    """
+    now = timezone.now()
+    bookings = [
+        booking for booking in bookings
+        if booking.status in CANCELLABLE_STATUSES
+        and Booking.objects.filter(pk=booking.pk, status__in=CANCELLABLE_STATUSES).update(status='cancelled', updated_at=now)
+    ]
+    if not bookings:
+        return 0
+    booking_ids = [booking.pk for booking in bookings]
+
+    seats_by_schedule = defaultdict(list)
+    schedule_of_booking = {booking.pk: booking.schedule_id for booking in bookings}
+    for booking_id, seat_id in BookingSeat.objects.filter(booking_id__in=booking_ids).values_list('booking_id', 'seat_id'):
+        seats_by_schedule[schedule_of_booking[booking_id]].append(seat_id)
+
+    for booking in bookings:
+        audit.record(
+            BookingHistory,
+            booking_id=booking.pk,
+            status_change='Booking cancelled',
+            changed_by=changed_by,
+            change_reason=reason,
+        )
+
+    schedules = Schedule.objects.in_bulk(list(seats_by_schedule))
+    released_per_schedule = {}
+    for schedule_id, seat_ids in seats_by_schedule.items():
+        # Only seats that were still booked come back, so the counter cannot overshoot
+        released = release_seats(schedules[schedule_id], seat_ids)
+        released_per_schedule[schedule_id] = len(released)
+        if released:
+            Schedule.objects.filter(pk=schedule_id).update(
+                available_seats=F('available_seats') + len(released)
+            )
+        bump_date_version(schedules[schedule_id].departure_date)
+
+    cancelled_per_schedule = defaultdict(int)
+    for booking in bookings:
+        cancelled_per_schedule[booking.schedule_id] += 1
+    for schedule_id, count in cancelled_per_schedule.items():
+        rollups.record_cancellation(schedule_id, released_per_schedule.get(schedule_id, 0), bookings=count)
+
+    for booking in bookings:
+        booking.status = 'cancelled'
+    return len(bookings)
+
+
+def cancel_booking(booking, changed_by=None, reason=''):
+    """
+    Cancel a pending or confirmed booking and give its seats back.
+
+    Returns False if the booking was not in a cancellable state.
+    """
+    return cancel_bookings([booking], changed_by=changed_by, reason=reason) == 1
@@ -1,3 +1,157 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from transportation.inventory import SeatUnavailableError, get_inventory, hold_seats
+from transportation.models import Route, Schedule, Seat, TransportationType, Vehicle
+from .models import Booking, BookingSeat
+from .services import BookingError, cancel_booking, create_booking
+from datetime import date, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+User = get_user_model()
+
+
+def make_schedule(seat_count=4):
+    transport_type = TransportationType.objects.create(name='Bus')
+    route = Route.objects.create(
+        origin='Boston', destination='New York', distance=350,
+        estimated_duration=timedelta(hours=4), transportation_type=transport_type,
+    )
+    vehicle = Vehicle.objects.create(vehicle_number='BUS-TEST', transportation_type=transport_type, capacity=seat_count)
+    seats = [
+        Seat.objects.create(vehicle=vehicle, seat_number=f'{position // 4 + 1}{"ABCD"[position % 4]}', seat_type='window')
+        for position in range(seat_count)
+    ]
+    schedule = Schedule.objects.create(
+        route=route, vehicle=vehicle, departure_date=date.today() + timedelta(days=7),
+        departure_time=time(9, 0), arrival_time=time(13, 0), price=Decimal('25.00'), available_seats=seat_count,
+    )
+    return schedule, seats
+
+
+def passengers(count):
+    return [{'name': f'Passenger {number}', 'age': 30, 'gender': 'other'} for number in range(count)]
+
+
+class BookingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='secret')
+        self.other_user = User.objects.create_user('bob', password='secret')
+        self.schedule, self.seats = make_schedule()
+
+    def assertSeatsFree(self, seats, free=True):
+        inventory = get_inventory(self.schedule)
+        index = inventory.seat_index()
+        self.assertEqual([inventory.is_free(index[seat.id]) for seat in seats], [free] * len(seats))
+
+    def assertAvailableSeats(self, count):
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.available_seats, count)
+
+
+class CreateBookingTests(BookingTestCase):
+    def test_books_every_seat(self):
+        booking = create_booking(self.user, self.schedule, [seat.id for seat in self.seats[:2]], passengers(2))
+        self.assertEqual(booking.total_amount, Decimal('52.00'))
+        self.assertEqual(BookingSeat.objects.filter(booking=booking).count(), 2)
+        self.assertSeatsFree(self.seats[:2], free=False)
+        self.assertAvailableSeats(2)
+
+    def test_taken_seat_books_nothing(self):
+        create_booking(self.user, self.schedule, [self.seats[0].id], passengers(1))
+        with self.assertRaises(SeatUnavailableError) as raised:
+            create_booking(self.other_user, self.schedule, [self.seats[1].id, self.seats[0].id], passengers(2))
+        self.assertEqual(raised.exception.seat_ids, [self.seats[0].id])
+        self.assertFalse(Booking.objects.filter(user=self.other_user).exists())
+        self.assertSeatsFree([self.seats[1]])
+        self.assertAvailableSeats(3)
+
+    def test_seat_held_by_another_user_is_not_booked(self):
+        hold_seats(self.schedule, [self.seats[0].id], self.other_user)
+        with self.assertRaises(SeatUnavailableError):
+            create_booking(self.user, self.schedule, [self.seats[0].id], passengers(1))
+        self.assertSeatsFree([self.seats[0]])
+
+    def test_failed_write_releases_claimed_seats(self):
+        with mock.patch.object(BookingSeat.objects, 'bulk_create', side_effect=RuntimeError('write failed')):
+            with self.assertRaises(RuntimeError):
+                create_booking(self.user, self.schedule, [seat.id for seat in self.seats[:2]], passengers(2))
+        self.assertSeatsFree(self.seats[:2])
+        self.assertAvailableSeats(4)
+
+    def test_rejects_more_seats_than_a_group(self):
+        # Checked before any seat is looked up
+        with self.assertRaisesMessage(BookingError, 'At most 6 seats'):
+            create_booking(self.user, self.schedule, list(range(1000, 1007)), passengers(7))
+
+
+class CancelBookingTests(BookingTestCase):
+    def test_second_cancel_releases_nothing(self):
+        booking = create_booking(self.user, self.schedule, [seat.id for seat in self.seats[:2]], passengers(2))
+        stale_copy = Booking.objects.get(pk=booking.pk)
+
+        self.assertTrue(cancel_booking(booking))
+        self.assertFalse(cancel_booking(stale_copy))
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'cancelled')
+        self.assertSeatsFree(self.seats[:2])
+        self.assertAvailableSeats(4)
+
+    def test_late_cancel_does_not_free_a_resold_seat(self):
+        booking = create_booking(self.user, self.schedule, [self.seats[0].id], passengers(1))
+        stale_copy = Booking.objects.get(pk=booking.pk)
+        cancel_booking(booking)
+        create_booking(self.other_user, self.schedule, [self.seats[0].id], passengers(1))
+
+        self.assertFalse(cancel_booking(stale_copy))
+        self.assertSeatsFree([self.seats[0]], free=False)
+        self.assertAvailableSeats(3)
+
+
+class IdempotentBookingTests(BookingTestCase):
+    def post_booking(self, key):
+        return self.client.post(reverse('bookings:create_booking'), {
+            'schedule_id': self.schedule.id,
+            'seat_ids': [self.seats[0].id],
+            'passenger_names': ['Alice'],
+            'passenger_ages': ['30'],
+            'passenger_genders': ['female'],
+            'special_requests': '',
+            'idempotency_key': key,
+        })
+
+    def test_repeated_post_is_replayed(self):
+        self.client.force_login(self.user)
+        hold_seats(self.schedule, [self.seats[0].id], self.user)
+
+        first = self.post_booking('key-1')
+        second = self.post_booking('key-1')
+
+        self.assertEqual(first.status_code, 302)
+        self.assertEqual(second.status_code, 302)
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Booking.objects.filter(user=self.user).count(), 1)
+        self.assertAvailableSeats(3)
+
+    def test_unheld_seats_are_not_booked(self):
+        self.client.force_login(self.user)
+        hold_seats(self.schedule, [self.seats[0].id], self.user)
+
+        response = self.client.post(reverse('bookings:create_booking'), {
+            'schedule_id': self.schedule.id,
+            'seat_ids': [self.seats[0].id, self.seats[1].id],
+            'passenger_names': ['Alice', 'Bob'],
+            'passenger_ages': ['30', '31'],
+            'passenger_genders': ['female', 'male'],
+            'special_requests': '',
+            'idempotency_key': 'key-2',
+        })
+
+        self.assertRedirects(
+            response, reverse('transportation:seat_map', args=[self.schedule.id]), fetch_redirect_response=False
+        )
+        self.assertFalse(Booking.objects.filter(user=self.user).exists())
+        self.assertAvailableSeats(4)
@@ -3,14 +3,23 @@ from django.views.generic import CreateView, ListView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
+from django.utils import timezone
 from .models import Booking, BookingSeat
+from .services import create_booking, cancel_booking, calculate_total, BookingError, SERVICE_FEE
 from transportation.models import Schedule, Seat
+from transportation.inventory import SeatUnavailableError, held_seat_ids
+from transportation import pricing
 from payments.models import Payment
+from ticket_reservation_system.idempotency import IdempotentPostMixin
+from ticket_reservation_system.mongo import native_reads_enabled
+from ticket_reservation_system.pagination import KeysetPaginationMixin
+from . import repository
 import uuid
+from datetime import datetime
 from decimal import Decimal
 
-class CreateBookingView(LoginRequiredMixin, CreateView):
+class CreateBookingView(LoginRequiredMixin, IdempotentPostMixin, CreateView):
     model = Booking
     template_name = 'bookings/create_booking.html'
     fields = ['special_requests']
@@ -29,14 +38,20 @@ class CreateBookingView(LoginRequiredMixin, CreateView):
             context['selected_seats'] = seats
             context['seat_ids'] = seat_ids
 
-            # Calculate total amount
+            # Calculate total amount at the quoted fare, which stays locked while the seats are held
             if schedule_id:
                 schedule = context['schedule']
-                service_fee = Decimal('2.00')
-                subtotal = Decimal(str(schedule.price)) * len(seat_ids)
-                context['subtotal'] = subtotal
-                context['service_fee'] = service_fee
-                context['total_amount'] = subtotal + service_fee
+                quoted = pricing.quote(schedule, self.request.user)
+                if quoted is not None:
+                    unit_price, expires_at = quoted
+                    context['price_locked_until'] = datetime.fromtimestamp(expires_at, tz=timezone.utc)
+                else:
+                    unit_price = pricing.current_price(schedule)
+                total_amount = calculate_total(schedule, len(seat_ids), unit_price)
+                context['unit_price'] = unit_price
+                context['subtotal'] = total_amount - SERVICE_FEE
+                context['service_fee'] = SERVICE_FEE
+                context['total_amount'] = total_amount
 
         return context
 
@@ -49,31 +64,46 @@ class CreateBookingView(LoginRequiredMixin, CreateView):
 
         schedule = get_object_or_404(Schedule, id=schedule_id)
 
-        # Create booking
-        booking = form.save(commit=False)
-        booking.user = self.request.user
-        booking.schedule = schedule
-        booking.booking_id = str(uuid.uuid4())[:8].upper()
-
-        # Calculate total amount including service fee
-        subtotal = Decimal(str(schedule.price)) * len(seat_ids)
-        service_fee = Decimal('2.00')
-        booking.total_amount = subtotal + service_fee
-        booking.save()
-
-        # Create booking seats
-        for i, seat_id in enumerate(seat_ids):
-            seat = get_object_or_404(Seat, id=seat_id)
-            BookingSeat.objects.create(
-                booking=booking,
-                seat=seat,
-                passenger_name=passenger_names[i],
-                passenger_age=int(passenger_ages[i]),
-                passenger_gender=passenger_genders[i]
+        # The quote covers exactly the held seats, so only those can be booked at it
+        try:
+            requested = {int(seat_id) for seat_id in seat_ids}
+        except ValueError:
+            messages.error(self.request, 'Invalid seat or passenger details. Please try again.')
+            return redirect('transportation:seat_map', schedule_id=schedule.id)
+        if requested != held_seat_ids(schedule, self.request.user):
+            messages.error(self.request, 'Your seat hold expired or does not match the selected seats. Please select your seats again.')
+            return redirect('transportation:seat_map', schedule_id=schedule.id)
+
+        # Charge the fare quoted on the user's holds; it lasts as long as they do
+        quoted = pricing.quote(schedule, self.request.user)
+        if quoted is None:
+            messages.error(self.request, 'Your seat hold expired, so the fare is no longer guaranteed. Please select your seats again.')
+            return redirect('transportation:seat_map', schedule_id=schedule.id)
+        unit_price = quoted[0]
+
+        try:
+            passengers = [
+                {'name': name, 'age': int(age), 'gender': gender}
+                for name, age, gender in zip(passenger_names, passenger_ages, passenger_genders)
+            ]
+            # Claims every seat, writes all booking seats and updates the seat counter, or nothing at all
+            booking = create_booking(
+                user=self.request.user,
+                schedule=schedule,
+                seat_ids=seat_ids,
+                passengers=passengers,
+                special_requests=form.cleaned_data.get('special_requests', ''),
+                unit_price=unit_price,
             )
-            # Mark seat as unavailable
-            seat.is_available = False
-            seat.save()
+        except SeatUnavailableError:
+            messages.error(self.request, 'Some of the selected seats are no longer available. Please choose again.')
+            return redirect('transportation:seat_map', schedule_id=schedule.id)
+        except ValueError:
+            messages.error(self.request, 'Invalid seat or passenger details. Please try again.')
+            return redirect('transportation:seat_map', schedule_id=schedule.id)
+        except BookingError as e:
+            messages.error(self.request, str(e))
+            return redirect('transportation:seat_map', schedule_id=schedule.id)
 
         messages.success(self.request, f'Booking {booking.booking_id} created successfully!')
         return redirect('bookings:confirm_booking', booking_id=booking.booking_id)
@@ -85,13 +115,29 @@ class ConfirmBookingView(LoginRequiredMixin, DetailView):
     slug_field = 'booking_id'
     slug_url_kwarg = 'booking_id'
 
-class MyBookingsView(LoginRequiredMixin, ListView):
+class MyBookingsView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Booking
     template_name = 'bookings/my_bookings.html'
     context_object_name = 'bookings'
+    paginate_by = 10
+    keyset_ordering = ('-created_at', 'id')
 
     def get_queryset(self):
-        return Booking.objects.filter(user=self.request.user).order_by('-created_at')
+        # Load schedules, routes, payments and seats for the whole page up front
+        return (
+            Booking.objects.filter(user=self.request.user)
+            .select_related('schedule__route', 'payment')
+            .prefetch_related('booked_seats__seat')
+        )
+
+    def get_keyset_page(self, queryset, page_size):
+        if native_reads_enabled():
+            return repository.user_bookings(
+                self.request.user.id, page_size,
+                after=self.request.GET.get('after'),
+                before=self.request.GET.get('before'),
+            )
+        return super().get_keyset_page(queryset, page_size)
 
 class BookingDetailView(LoginRequiredMixin, DetailView):
     model = Booking
@@ -103,6 +149,14 @@ class BookingDetailView(LoginRequiredMixin, DetailView):
     def get_queryset(self):
         return Booking.objects.filter(user=self.request.user)
 
+    def get_object(self, queryset=None):
+        if not native_reads_enabled():
+            return super().get_object(queryset)
+        booking = repository.booking_detail(self.request.user.id, self.kwargs[self.slug_url_kwarg])
+        if booking is None:
+            raise Http404('No booking found matching the query')
+        return booking
+
 class CancelBookingView(LoginRequiredMixin, DetailView):
     model = Booking
     template_name = 'bookings/cancel_booking.html'
@@ -112,15 +166,7 @@ class CancelBookingView(LoginRequiredMixin, DetailView):
 
     def post(self, request, *args, **kwargs):
         booking = self.get_object()
-        if booking.status in ['pending', 'confirmed']:
-            booking.status = 'cancelled'
-            booking.save()
-
-            # Make seats available again
-            for booking_seat in booking.booked_seats.all():
-                booking_seat.seat.is_available = True
-                booking_seat.seat.save()
-
+        if cancel_booking(booking, changed_by=request.user, reason='Cancelled by customer'):
             messages.success(request, f'Booking {booking.booking_id} cancelled successfully!')
         else:
             messages.error(request, 'This booking cannot be cancelled.')
@@ -0,0 +1,35 @@
+"""
+Mock payment gateway.
+
+Stands in for a real provider's client; a real implementation would make an
+HTTP call bounded by `timeout` and map the provider's responses onto these
+exceptions.
+"""
+from django.conf import settings
+import random
+
+# Seconds a single charge may take before it is treated as failed and retried
+GATEWAY_TIMEOUT = getattr(settings, 'PAYMENT_GATEWAY_TIMEOUT', 30)
+
+GATEWAY_NAME = 'Mock Gateway'
+
+SUCCESS_RATE = 1.0  # 100% success rate for testing
+
+
+class GatewayError(Exception):
+    """The gateway could not be reached or did not answer in time; the charge may be retried."""
+
+
+class PaymentDeclined(Exception):
+    """The gateway refused the charge; retrying will not help."""
+
+
+def charge(amount, payment_method, reference, timeout=GATEWAY_TIMEOUT):
+    """Charge `amount` and return the gateway's transaction id."""
+    if random.random() >= SUCCESS_RATE:
+        raise PaymentDeclined('The payment was declined.')
+    return f"TXN{random.randint(100000, 999999)}"
+
+
+def refund(transaction_id, amount, timeout=GATEWAY_TIMEOUT):
+    """Return `amount` of a completed charge to the customer."""
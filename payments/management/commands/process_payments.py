@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+from payments.queue import run_worker
+from ticket_reservation_system import audit
+import multiprocessing
+
+
+def _worker(options):
+    try:
+        run_worker(
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+            stop_when_idle=options['once'],
+        )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Forked workers exit without running atexit handlers
+        audit.flush()
+
+
+class Command(BaseCommand):
+    help = 'Run payment workers that charge queued payments and confirm their bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Number of worker processes')
+        parser.add_argument('--batch-size', type=int, default=10, help='Payments each worker claims at a time')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when no payment is due')
+        parser.add_argument('--once', action='store_true', help='Exit once no payment is due')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Starting {options['workers']} payment worker(s)...")
+        if options['workers'] <= 1:
+            _worker(options)
+            return
+
+        # Each forked worker must open its own database connection
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_worker, args=(options,)) for _ in range(options['workers'])]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+        self.stdout.write(self.style.SUCCESS('Payment workers stopped.'))
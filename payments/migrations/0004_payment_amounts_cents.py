@@ -0,0 +1,26 @@
+# Generated by Django 3.1.12 on 2026-10-18 13:00
+
+from django.db import migrations
+import ticket_reservation_system.money
+from ticket_reservation_system.money import convert_to_cents
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_payment_queue'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='amount',
+            field=ticket_reservation_system.money.MoneyField(),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='refund_amount',
+            field=ticket_reservation_system.money.MoneyField(default=0),
+        ),
+        convert_to_cents('payments', 'Payment', 'amount', 'refund_amount'),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.1.12 on 2026-10-18 15:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_payment_amounts_cents'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='paymenthistory',
+            options={'ordering': ['timestamp', 'id']},
+        ),
+        migrations.AlterField(
+            model_name='paymenthistory',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='paymenthistory',
+            index=models.Index(fields=['payment', 'timestamp'], name='payment_history_time_idx'),
+        ),
+    ]
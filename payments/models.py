@@ -1,20 +1,16 @@
 from django.db import models
 from djongo import models as djongo_models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from bookings.models import Booking
-import decimal
-from decimal import Decimal
-try:
-    from bson.decimal128 import Decimal128
-except ImportError:
-    Decimal128 = None
+from ticket_reservation_system.money import MoneyField
 
 User = get_user_model()
 
 class Payment(djongo_models.Model):
     booking = models.OneToOneField(Booking, on_delete=models.CASCADE)
     payment_id = models.CharField(max_length=50, unique=True)
-    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    amount = MoneyField()
     payment_method = models.CharField(
         max_length=20,
         choices=[
@@ -39,47 +35,18 @@ class Payment(djongo_models.Model):
     transaction_id = models.CharField(max_length=100, blank=True)
     payment_gateway = models.CharField(max_length=50, blank=True)
     payment_date = models.DateTimeField(auto_now_add=True)
-    refund_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    refund_amount = MoneyField(default=0)
     refund_reason = models.TextField(blank=True)
+    # Work queue state used by the payment workers (see payments/queue.py)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
 
-    def save(self, *args, **kwargs):
-        # Ensure amount is a proper Decimal before saving
-        if self.amount is not None and not isinstance(self.amount, Decimal):
-            try:
-                # Handle MongoDB Decimal128 type
-                if Decimal128 and hasattr(self.amount, 'to_decimal'):
-                    self.amount = self.amount.to_decimal()
-                elif Decimal128 and str(type(self.amount)).find('Decimal128') != -1:
-                    self.amount = Decimal(str(self.amount))
-                # Handle string values that might have quotes
-                elif isinstance(self.amount, str):
-                    # Remove quotes and whitespace
-                    cleaned_amount = str(self.amount).strip().strip('"\'')
-                    self.amount = Decimal(cleaned_amount)
-                else:
-                    # Convert numeric types to string first, then to Decimal
-                    self.amount = Decimal(str(self.amount))
-            except (ValueError, TypeError, decimal.InvalidOperation):
-                # If conversion fails, set to 0.00 as fallback
-                self.amount = Decimal('0.00')
-
-        # Ensure refund_amount is also a proper Decimal
-        if self.refund_amount is not None and not isinstance(self.refund_amount, Decimal):
-            try:
-                # Handle MongoDB Decimal128 type
-                if Decimal128 and hasattr(self.refund_amount, 'to_decimal'):
-                    self.refund_amount = self.refund_amount.to_decimal()
-                elif Decimal128 and str(type(self.refund_amount)).find('Decimal128') != -1:
-                    self.refund_amount = Decimal(str(self.refund_amount))
-                elif isinstance(self.refund_amount, str):
-                    cleaned_refund = str(self.refund_amount).strip().strip('"\'')
-                    self.refund_amount = Decimal(cleaned_refund)
-                else:
-                    self.refund_amount = Decimal(str(self.refund_amount))
-            except (ValueError, TypeError, decimal.InvalidOperation):
-                self.refund_amount = Decimal('0.00')
-
-        super().save(*args, **kwargs)
+    class Meta:
+        indexes = [
+            models.Index(fields=['payment_status', 'next_attempt_at'], name='payment_queue_idx'),
+        ]
 
     def __str__(self):
         return f"Payment {self.payment_id} - {self.booking.booking_id}"
@@ -89,7 +56,14 @@ class PaymentHistory(djongo_models.Model):
     status_change = models.CharField(max_length=50)
     changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     change_reason = models.TextField(blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens; rows are written later in batches by ticket_reservation_system.audit
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['timestamp', 'id']
+        indexes = [
+            models.Index(fields=['payment', 'timestamp'], name='payment_history_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.payment.payment_id} - {self.status_change}"
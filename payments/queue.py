@@ -0,0 +1,182 @@
+"""
+Payment work queue.
+
+Submitting a payment only records it in the `processing` state; worker
+processes started with `manage.py process_payments` pick it up, call the
+gateway and confirm the booking. The payment rows themselves are the queue:
+
+- `next_attempt_at` is when the payment is next due,
+- `locked_until` is the lease of the worker handling it, so a payment whose
+  worker died is picked up again once the lease runs out,
+- `attempts` doubles as the claim token: a worker takes a payment with a
+  conditional update on the attempt count it read, so two workers can never
+  both claim the same attempt.
+
+A booking is only confirmed while it is still pending. If it was cancelled
+while its payment waited, the payment fails without a charge, or, when the
+gateway had already charged it, is refunded.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from bookings.models import Booking, BookingHistory
+from reporting import rollups
+from ticket_reservation_system import audit
+from .models import Payment, PaymentHistory
+from . import gateway
+from datetime import timedelta
+import time
+import traceback
+import uuid
+
+MAX_ATTEMPTS = getattr(settings, 'PAYMENT_MAX_ATTEMPTS', 5)
+
+# A lease comfortably longer than one gateway call
+LEASE_SECONDS = getattr(settings, 'PAYMENT_LEASE_SECONDS', gateway.GATEWAY_TIMEOUT + 30)
+
+# Delay before the first retry; doubles with every further attempt
+RETRY_BACKOFF_SECONDS = getattr(settings, 'PAYMENT_RETRY_BACKOFF_SECONDS', 5)
+
+FINAL_STATUSES = ['completed', 'failed', 'refunded']
+
+
+def enqueue_payment(booking, payment_method, user, payment=None):
+    """Record a payment for `booking` (or reset a failed one) for the workers to process."""
+    now = timezone.now()
+    if payment is None:
+        payment = Payment(booking=booking, payment_id=f"PAY{str(uuid.uuid4())[:8].upper()}")
+    payment.payment_method = payment_method
+    payment.amount = booking.total_amount
+    payment.payment_gateway = gateway.GATEWAY_NAME
+    payment.payment_status = 'processing'
+    payment.attempts = 0
+    payment.next_attempt_at = now
+    payment.locked_until = now
+    payment.last_error = ''
+    payment.save()
+
+    audit.record(
+        PaymentHistory,
+        payment_id=payment.pk,
+        status_change='Payment queued',
+        changed_by=user,
+        change_reason='Payment submitted'
+    )
+    return payment
+
+
+def _claim(payment, now):
+    claimed = Payment.objects.filter(
+        pk=payment.pk,
+        payment_status='processing',
+        attempts=payment.attempts,
+    ).update(locked_until=now + timedelta(seconds=LEASE_SECONDS), attempts=F('attempts') + 1)
+    if claimed:
+        payment.attempts += 1
+        return True
+    return False
+
+
+def claim_due_payments(limit):
+    """Claim up to `limit` payments that are due and not leased by another worker."""
+    now = timezone.now()
+    candidates = Payment.objects.filter(
+        payment_status='processing',
+        next_attempt_at__lte=now,
+        locked_until__lte=now,
+    ).order_by('next_attempt_at')[:limit]
+    return [payment for payment in candidates if _claim(payment, now)]
+
+
+def _finish(payment, status, transaction_id='', error=''):
+    refunded = False
+    with transaction.atomic():
+        # Only the worker holding the current attempt may settle the payment
+        updated = Payment.objects.filter(
+            pk=payment.pk,
+            payment_status='processing',
+            attempts=payment.attempts,
+        ).update(payment_status=status, transaction_id=transaction_id, last_error=error, locked_until=None)
+        if not updated:
+            return False
+        user_id = payment.booking.user_id
+        if status == 'completed':
+            # A booking cancelled while the payment waited keeps its cancellation
+            confirmed = Booking.objects.filter(pk=payment.booking_id, status='pending').update(
+                status='confirmed', updated_at=timezone.now()
+            )
+            if confirmed:
+                rollups.record_payment(payment.booking.schedule_id, payment.amount)
+                audit.record(
+                    BookingHistory,
+                    booking_id=payment.booking_id,
+                    status_change='Booking confirmed',
+                    changed_by_id=user_id,
+                    change_reason=f'Payment {payment.payment_id} completed'
+                )
+            else:
+                status, refunded = 'refunded', True
+                error = 'The booking was cancelled before the payment completed'
+                Payment.objects.filter(pk=payment.pk).update(
+                    payment_status=status, refund_amount=payment.amount, refund_reason=error, last_error=error
+                )
+                # rebuild() counts a refunded payment as revenue and as a refund; match it
+                rollups.record_payment(payment.booking.schedule_id, payment.amount)
+                rollups.record_refund(payment.booking.schedule_id, payment.amount)
+        audit.record(
+            PaymentHistory,
+            payment_id=payment.pk,
+            status_change=f"Payment {status}",
+            changed_by_id=user_id,
+            change_reason=error or 'Payment processing'
+        )
+    if refunded:
+        gateway.refund(transaction_id, payment.amount, timeout=gateway.GATEWAY_TIMEOUT)
+    return True
+
+
+def _retry_later(payment, error):
+    now = timezone.now()
+    delay = RETRY_BACKOFF_SECONDS * 2 ** (payment.attempts - 1)
+    Payment.objects.filter(pk=payment.pk, attempts=payment.attempts).update(
+        next_attempt_at=now + timedelta(seconds=delay),
+        locked_until=now,
+        last_error=error,
+    )
+
+
+def process_payment(payment):
+    """Run one claimed attempt: charge the gateway and settle, or schedule a retry."""
+    if not Booking.objects.filter(pk=payment.booking_id, status='pending').exists():
+        return _finish(payment, 'failed', error='The booking is no longer pending')
+    try:
+        transaction_id = gateway.charge(
+            payment.amount, payment.payment_method, payment.payment_id, timeout=gateway.GATEWAY_TIMEOUT
+        )
+    except gateway.PaymentDeclined as e:
+        return _finish(payment, 'failed', error=str(e))
+    except gateway.GatewayError as e:
+        if payment.attempts >= MAX_ATTEMPTS:
+            return _finish(payment, 'failed', error=f'Gave up after {payment.attempts} attempts: {e}')
+        _retry_later(payment, str(e))
+        return False
+    return _finish(payment, 'completed', transaction_id=transaction_id)
+
+
+def run_worker(batch_size=10, poll_interval=1.0, stop_when_idle=False):
+    """Process due payments until stopped (or until none are due, with `stop_when_idle`)."""
+    processed = 0
+    while True:
+        payments = claim_due_payments(batch_size)
+        for payment in payments:
+            try:
+                process_payment(payment)
+            except Exception:
+                # The lease runs out and another attempt picks the payment up
+                traceback.print_exc()
+        processed += len(payments)
+        if not payments:
+            if stop_when_idle:
+                return processed
+            time.sleep(poll_interval)
@@ -1,3 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from bookings.models import Booking
+from bookings.services import cancel_booking, create_booking
+from transportation.models import Route, Schedule, Seat, TransportationType, Vehicle
+from .models import Payment
+from .queue import claim_due_payments, enqueue_payment, process_payment
+from datetime import date, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+User = get_user_model()
+
+
+class PaymentSettlementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='secret')
+        transport_type = TransportationType.objects.create(name='Bus')
+        route = Route.objects.create(
+            origin='Boston', destination='New York', distance=350,
+            estimated_duration=timedelta(hours=4), transportation_type=transport_type,
+        )
+        vehicle = Vehicle.objects.create(vehicle_number='BUS-TEST', transportation_type=transport_type, capacity=2)
+        seat = Seat.objects.create(vehicle=vehicle, seat_number='1A', seat_type='window')
+        schedule = Schedule.objects.create(
+            route=route, vehicle=vehicle, departure_date=date.today() + timedelta(days=7),
+            departure_time=time(9, 0), arrival_time=time(13, 0), price=Decimal('25.00'), available_seats=2,
+        )
+        self.booking = create_booking(
+            self.user, schedule, [seat.id], [{'name': 'Alice', 'age': 30, 'gender': 'female'}]
+        )
+
+    def run_payment(self, **charge):
+        enqueue_payment(self.booking, 'credit_card', self.user)
+        [payment] = claim_due_payments(10)
+        with mock.patch('payments.queue.gateway.charge', **charge) as gateway_charge, \
+                mock.patch('payments.queue.gateway.refund') as gateway_refund:
+            process_payment(payment)
+        payment.refresh_from_db()
+        self.booking.refresh_from_db()
+        return payment, gateway_charge, gateway_refund
+
+    def test_pending_booking_is_confirmed(self):
+        payment, _, gateway_refund = self.run_payment(return_value='TXN1')
+        self.assertEqual(payment.payment_status, 'completed')
+        self.assertEqual(self.booking.status, 'confirmed')
+        gateway_refund.assert_not_called()
+
+    def test_booking_cancelled_while_queued_is_not_charged(self):
+        enqueue_payment(self.booking, 'credit_card', self.user)
+        cancel_booking(self.booking)
+        [payment] = claim_due_payments(10)
+        with mock.patch('payments.queue.gateway.charge') as gateway_charge:
+            process_payment(payment)
+
+        gateway_charge.assert_not_called()
+        payment.refresh_from_db()
+        self.booking.refresh_from_db()
+        self.assertEqual(payment.payment_status, 'failed')
+        self.assertEqual(self.booking.status, 'cancelled')
+
+    def test_booking_cancelled_during_the_charge_is_refunded(self):
+        def cancel_then_charge(*args, **kwargs):
+            cancel_booking(Booking.objects.get(pk=self.booking.pk))
+            return 'TXN2'
+
+        payment, _, gateway_refund = self.run_payment(side_effect=cancel_then_charge)
+        self.assertEqual(payment.payment_status, 'refunded')
+        self.assertEqual(payment.refund_amount, payment.amount)
+        self.assertEqual(self.booking.status, 'cancelled')
+        gateway_refund.assert_called_once()
+        self.assertEqual(gateway_refund.call_args[0], ('TXN2', payment.amount))
+
+    def test_cancelled_booking_cannot_be_paid(self):
+        cancel_booking(self.booking)
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('payments:process_payment', args=[self.booking.booking_id]), {'payment_method': 'credit_card'}
+        )
+        self.assertRedirects(response, reverse('bookings:my_bookings'), fetch_redirect_response=False)
+        self.assertFalse(Payment.objects.filter(booking=self.booking).exists())
+
+    def test_payment_is_refunded_once(self):
+        payment, _, _ = self.run_payment(return_value='TXN3')
+        self.client.force_login(self.user)
+        url = reverse('payments:refund', args=[payment.payment_id])
+
+        with mock.patch('payments.views.gateway.refund') as gateway_refund:
+            self.client.post(url, {'refund_reason': 'Change of plans'})
+            self.client.post(url, {'refund_reason': 'Change of plans'})
+
+        gateway_refund.assert_called_once()
+        self.assertEqual(gateway_refund.call_args[0], ('TXN3', payment.amount))
+        payment.refresh_from_db()
+        self.assertEqual(payment.payment_status, 'refunded')
+        self.assertEqual(payment.refund_amount, payment.amount)
@@ -5,6 +5,8 @@ app_name = 'payments'
 
 urlpatterns = [
     path('process/<str:booking_id>/', views.ProcessPaymentView.as_view(), name='process_payment'),
+    path('processing/<str:payment_id>/', views.PaymentProcessingView.as_view(), name='payment_processing'),
+    path('status/<str:payment_id>/', views.PaymentStatusView.as_view(), name='payment_status'),
     path('success/<str:payment_id>/', views.PaymentSuccessView.as_view(), name='payment_success'),
     path('failed/<str:payment_id>/', views.PaymentFailedView.as_view(), name='payment_failed'),
     path('refund/<str:payment_id>/', views.RefundView.as_view(), name='refund'),
@@ -0,0 +1,37 @@
+from django.contrib import admin
+from django.template.response import TemplateResponse
+from django.urls import path
+from .models import ScheduleRollup
+from .views import parse_window
+from . import rollups
+
+@admin.register(ScheduleRollup)
+class ScheduleRollupAdmin(admin.ModelAdmin):
+    list_display = ('schedule', 'date', 'transportation_type', 'capacity', 'seats_sold', 'gross_revenue', 'refunds')
+    list_filter = ('transportation_type', 'date')
+    search_fields = ('route__origin', 'route__destination')
+    date_hierarchy = 'date'
+    readonly_fields = ('updated_at',)
+
+    def get_urls(self):
+        return [
+            path('dashboard/', self.admin_site.admin_view(self.dashboard_view), name='reporting_dashboard'),
+        ] + super().get_urls()
+
+    def dashboard_view(self, request):
+        try:
+            date_from, date_to, group_by = parse_window(request.GET)
+        except ValueError:
+            date_from, date_to = rollups.default_window()
+            group_by = 'day'
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Occupancy and revenue',
+            'opts': self.model._meta,
+            'date_from': date_from,
+            'date_to': date_to,
+            'group_by': group_by,
+            'groupings': list(rollups.GROUPINGS),
+            'rows': rollups.summary(date_from, date_to, group_by),
+        }
+        return TemplateResponse(request, 'admin/reporting/dashboard.html', context)
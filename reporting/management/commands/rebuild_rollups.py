@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from reporting.rollups import rebuild
+from datetime import date
+
+
+class Command(BaseCommand):
+    help = 'Recompute occupancy and revenue rollups from bookings and payments (stop booking and payment writes first)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', help='First departure date to rebuild (YYYY-MM-DD); default: all')
+        parser.add_argument('--date-to', help='Last departure date to rebuild (YYYY-MM-DD); default: all')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Departures aggregated per round trip')
+
+    def handle(self, *args, **options):
+        try:
+            date_from = date.fromisoformat(options['date_from']) if options['date_from'] else None
+            date_to = date.fromisoformat(options['date_to']) if options['date_to'] else None
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        count = rebuild(date_from, date_to, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups for {count} departures.'))
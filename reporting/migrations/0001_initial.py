@@ -0,0 +1,42 @@
+# Generated by Django 3.1.12 on 2026-10-18 14:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import ticket_reservation_system.money
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('transportation', '0005_schedule_price_cents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('capacity', models.IntegerField()),
+                ('seats_sold', models.IntegerField(default=0)),
+                ('bookings', models.IntegerField(default=0)),
+                ('cancellations', models.IntegerField(default=0)),
+                ('gross_revenue', ticket_reservation_system.money.MoneyField(default=0)),
+                ('refunds', ticket_reservation_system.money.MoneyField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='transportation.route')),
+                ('schedule', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rollup', to='transportation.schedule')),
+                ('transportation_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='transportation.transportationtype')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='schedulerollup',
+            index=models.Index(fields=['date', 'route'], name='rollup_date_route_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedulerollup',
+            index=models.Index(fields=['date', 'transportation_type'], name='rollup_date_type_idx'),
+        ),
+    ]
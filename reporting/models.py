@@ -0,0 +1,38 @@
+from django.db import models
+from djongo import models as djongo_models
+from transportation.models import Schedule, Route, TransportationType
+from ticket_reservation_system.money import MoneyField
+
+class ScheduleRollup(djongo_models.Model):
+    """
+    Running occupancy and revenue totals for one departure.
+
+    Kept up to date by reporting.rollups as bookings and payments change and
+    rebuilt from scratch by `manage.py rebuild_rollups`. Route, transportation
+    type and date are copied from the schedule so daily totals per route or
+    type are a single grouped aggregation over this collection.
+    """
+    schedule = models.OneToOneField(Schedule, on_delete=models.CASCADE, related_name='rollup')
+    date = models.DateField()
+    route = models.ForeignKey(Route, on_delete=models.CASCADE)
+    transportation_type = models.ForeignKey(TransportationType, on_delete=models.CASCADE)
+    capacity = models.IntegerField()
+    seats_sold = models.IntegerField(default=0)
+    bookings = models.IntegerField(default=0)
+    cancellations = models.IntegerField(default=0)
+    gross_revenue = MoneyField(default=0)
+    refunds = MoneyField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'route'], name='rollup_date_route_idx'),
+            models.Index(fields=['date', 'transportation_type'], name='rollup_date_type_idx'),
+        ]
+
+    @property
+    def load_factor(self):
+        return self.seats_sold / self.capacity if self.capacity else 0.0
+
+    def __str__(self):
+        return f"{self.schedule} rollup"
@@ -0,0 +1,209 @@
+"""
+Occupancy and revenue rollups.
+
+Each departure has one ScheduleRollup row. Booking and payment events adjust
+its counters in place with F() updates, and rebuild() recomputes them from
+the bookings and payments with MongoDB aggregations. Reports never touch
+bookings or payments: summary() is a single $group over the rollup
+collection, so its cost depends on the number of departures in the date
+range, not on booking volume.
+
+rebuild() replaces the rollups it recomputes, so an increment made between
+its aggregation and its write is lost. Run it while booking and payment
+writes are quiesced (maintenance window, payment workers stopped).
+"""
+from django.db.models import F
+from django.utils import timezone
+from ticket_reservation_system.money import from_cents, to_cents
+from ticket_reservation_system.mongo import as_date, collection, to_mongo
+from transportation.models import Schedule, Route, Vehicle, TransportationType
+from bookings.models import Booking, BookingSeat
+from payments.models import Payment
+from .models import ScheduleRollup
+from datetime import timedelta
+
+PAID_STATUSES = ['completed', 'refunded']
+
+# Rollup fields identifying each group in summary()
+GROUPINGS = {
+    'day': ('date',),
+    'type': ('date', 'transportation_type_id'),
+    'route': ('date', 'route_id'),
+    'schedule': ('date', 'schedule_id'),
+}
+
+COUNTERS = ('capacity', 'seats_sold', 'bookings', 'cancellations', 'gross_revenue', 'refunds')
+
+DEFAULT_WINDOW_DAYS = 30
+
+
+def _create(schedule_id):
+    schedule = Schedule.objects.select_related('route', 'vehicle').get(pk=schedule_id)
+    ScheduleRollup.objects.get_or_create(schedule_id=schedule_id, defaults={
+        'date': schedule.departure_date,
+        'route_id': schedule.route_id,
+        'transportation_type_id': schedule.route.transportation_type_id,
+        'capacity': schedule.vehicle.capacity,
+    })
+
+
+def _increment(schedule_id, **amounts):
+    """Add `amounts` to a departure's counters, creating its rollup on first use."""
+    # Money columns hold cents, so their increments are passed as cents too
+    changes = {field: F(field) + amount for field, amount in amounts.items() if amount}
+    if not changes:
+        return
+    changes['updated_at'] = timezone.now()
+    if not ScheduleRollup.objects.filter(schedule_id=schedule_id).update(**changes):
+        _create(schedule_id)
+        ScheduleRollup.objects.filter(schedule_id=schedule_id).update(**changes)
+
+
+def record_booking(schedule_id, seats):
+    _increment(schedule_id, bookings=1, seats_sold=seats)
+
+
+def record_cancellation(schedule_id, seats, bookings=1):
+    _increment(schedule_id, cancellations=bookings, seats_sold=-seats)
+
+
+def record_payment(schedule_id, amount):
+    _increment(schedule_id, gross_revenue=to_cents(amount))
+
+
+def record_refund(schedule_id, amount):
+    _increment(schedule_id, refunds=to_cents(amount))
+
+
+def _date_match(field, date_from, date_to):
+    match = {}
+    if date_from:
+        match['$gte'] = to_mongo(date_from)
+    if date_to:
+        match['$lte'] = to_mongo(date_to)
+    return {field: match} if match else {}
+
+
+def _booking_totals(schedule_ids, active_statuses):
+    """Seats sold, bookings, cancellations and revenue per schedule, from one aggregation."""
+    pipeline = [
+        {'$match': {'schedule_id': {'$in': schedule_ids}}},
+        {'$lookup': {'from': BookingSeat._meta.db_table, 'localField': 'id', 'foreignField': 'booking_id', 'as': 'seats'}},
+        {'$lookup': {'from': Payment._meta.db_table, 'localField': 'id', 'foreignField': 'booking_id', 'as': 'payments'}},
+        {'$addFields': {'paid': {'$filter': {
+            'input': '$payments', 'as': 'payment', 'cond': {'$in': ['$$payment.payment_status', PAID_STATUSES]},
+        }}}},
+        {'$group': {
+            '_id': '$schedule_id',
+            'seats_sold': {'$sum': {'$cond': [{'$in': ['$status', active_statuses]}, {'$size': '$seats'}, 0]}},
+            'bookings': {'$sum': 1},
+            'cancellations': {'$sum': {'$cond': [{'$eq': ['$status', 'cancelled']}, 1, 0]}},
+            'gross_revenue': {'$sum': {'$sum': '$paid.amount'}},
+            'refunds': {'$sum': {'$sum': '$paid.refund_amount'}},
+        }},
+    ]
+    return {document['_id']: document for document in collection(Booking).aggregate(pipeline, allowDiskUse=True)}
+
+
+def rebuild(date_from=None, date_to=None, batch_size=1000):
+    """
+    Recompute the rollups of every departure between `date_from` and `date_to`.
+    Returns the count. Booking and payment writes must be quiesced meanwhile.
+    """
+    from bookings.services import ACTIVE_STATUSES
+
+    schedules = collection(Schedule).aggregate([
+        {'$match': _date_match('departure_date', date_from, date_to)},
+        {'$lookup': {'from': Route._meta.db_table, 'localField': 'route_id', 'foreignField': 'id', 'as': 'route'}},
+        {'$lookup': {'from': Vehicle._meta.db_table, 'localField': 'vehicle_id', 'foreignField': 'id', 'as': 'vehicle'}},
+        {'$unwind': '$route'},
+        {'$unwind': '$vehicle'},
+        {'$project': {
+            '_id': 0, 'id': 1, 'route_id': 1, 'departure_date': 1,
+            'transportation_type_id': '$route.transportation_type_id', 'capacity': '$vehicle.capacity',
+        }},
+    ], allowDiskUse=True)
+
+    rebuilt = 0
+    batch = []
+    for schedule in schedules:
+        batch.append(schedule)
+        if len(batch) >= batch_size:
+            rebuilt += _rebuild_batch(batch, ACTIVE_STATUSES)
+            batch = []
+    if batch:
+        rebuilt += _rebuild_batch(batch, ACTIVE_STATUSES)
+    return rebuilt
+
+
+def _rebuild_batch(schedules, active_statuses):
+    schedule_ids = [schedule['id'] for schedule in schedules]
+    totals = _booking_totals(schedule_ids, active_statuses)
+    rollups = []
+    for schedule in schedules:
+        total = totals.get(schedule['id'], {})
+        rollups.append(ScheduleRollup(
+            schedule_id=schedule['id'],
+            date=as_date(schedule['departure_date']),
+            route_id=schedule['route_id'],
+            transportation_type_id=schedule['transportation_type_id'],
+            capacity=schedule['capacity'],
+            seats_sold=total.get('seats_sold', 0),
+            bookings=total.get('bookings', 0),
+            cancellations=total.get('cancellations', 0),
+            gross_revenue=from_cents(total.get('gross_revenue', 0)),
+            refunds=from_cents(total.get('refunds', 0)),
+        ))
+    ScheduleRollup.objects.filter(schedule_id__in=schedule_ids).delete()
+    ScheduleRollup.objects.bulk_create(rollups, batch_size=len(rollups))
+    return len(rollups)
+
+
+def default_window():
+    today = timezone.now().date()
+    return today - timedelta(days=DEFAULT_WINDOW_DAYS - 1), today
+
+
+def _labels(group_by, rows):
+    if group_by == 'type':
+        names = dict(TransportationType.objects.filter(
+            id__in={row['transportation_type_id'] for row in rows}
+        ).values_list('id', 'name'))
+        return {row['transportation_type_id']: names.get(row['transportation_type_id']) for row in rows}
+    if group_by == 'route':
+        routes = Route.objects.in_bulk({row['route_id'] for row in rows})
+        return {
+            route_id: f'{route.origin} → {route.destination}' for route_id, route in routes.items()
+        }
+    return {}
+
+
+def summary(date_from, date_to, group_by='day'):
+    """Occupancy and revenue totals between two dates, grouped per day and optionally per type, route or schedule."""
+    keys = GROUPINGS[group_by]
+    pipeline = [
+        {'$match': _date_match('date', date_from, date_to)},
+        {'$group': {
+            '_id': {key: f'${key}' for key in keys},
+            **{counter: {'$sum': f'${counter}'} for counter in COUNTERS},
+        }},
+        {'$sort': {f'_id.{key}': 1 for key in keys}},
+    ]
+    rows = []
+    for document in collection(ScheduleRollup).aggregate(pipeline):
+        row = dict(document['_id'])
+        row['date'] = as_date(row['date'])
+        for counter in COUNTERS:
+            row[counter] = document[counter]
+        row['gross_revenue'] = from_cents(row['gross_revenue'])
+        row['refunds'] = from_cents(row['refunds'])
+        row['net_revenue'] = row['gross_revenue'] - row['refunds']
+        row['load_factor'] = round(row['seats_sold'] / row['capacity'], 4) if row['capacity'] else 0.0
+        rows.append(row)
+
+    labels = _labels(group_by, rows)
+    if labels:
+        key = keys[-1]
+        for row in rows:
+            row['label'] = labels.get(row[key])
+    return rows
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'reporting'
+
+urlpatterns = [
+    path('rollups/', views.rollups_view, name='rollups'),
+]
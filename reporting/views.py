@@ -0,0 +1,35 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from . import rollups
+from datetime import date
+
+
+def parse_window(params):
+    """Return (date_from, date_to, group_by) from query parameters, or raise ValueError."""
+    default_from, default_to = rollups.default_window()
+    date_from = date.fromisoformat(params['date_from']) if params.get('date_from') else default_from
+    date_to = date.fromisoformat(params['date_to']) if params.get('date_to') else default_to
+    group_by = params.get('group_by', 'day')
+    if group_by not in rollups.GROUPINGS:
+        raise ValueError(f"group_by must be one of {', '.join(rollups.GROUPINGS)}")
+    return date_from, date_to, group_by
+
+
+@staff_member_required
+def rollups_view(request):
+    try:
+        date_from, date_to, group_by = parse_window(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    rows = rollups.summary(date_from, date_to, group_by)
+    for row in rows:
+        row['date'] = row['date'].isoformat()
+        for field in ('gross_revenue', 'refunds', 'net_revenue'):
+            row[field] = str(row[field])
+    return JsonResponse({
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'group_by': group_by,
+        'rows': rows,
+    })
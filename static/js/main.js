@@ -178,6 +178,47 @@ function initializeSearchForm() {
             destinationInput.value = temp;
         });
     }
+    
+    // City suggestions while typing
+    const form = originInput ? originInput.form : null;
+    if (form && form.dataset.autocompleteUrl) {
+        initializeCityAutocomplete(originInput, 'origin', form.dataset.autocompleteUrl);
+        initializeCityAutocomplete(destinationInput, 'destination', form.dataset.autocompleteUrl);
+    }
+}
+
+function initializeCityAutocomplete(input, field, url) {
+    const datalist = document.getElementById(input.getAttribute('list'));
+    let controller = null;
+    
+    input.addEventListener('input', function() {
+        const query = input.value.trim();
+        if (controller) {
+            controller.abort();
+        }
+        if (!query || !datalist) {
+            return;
+        }
+        
+        // Only the latest keystroke's answer is shown
+        controller = new AbortController();
+        const params = new URLSearchParams({q: query, field: field});
+        fetch(`${url}?${params}`, {signal: controller.signal})
+            .then(response => response.json())
+            .then(data => {
+                datalist.innerHTML = '';
+                (data.results || []).forEach(city => {
+                    const option = document.createElement('option');
+                    option.value = city;
+                    datalist.appendChild(option);
+                });
+            })
+            .catch(error => {
+                if (error.name !== 'AbortError') {
+                    console.error('Autocomplete failed:', error);
+                }
+            });
+    });
 }
 
 // Loading spinner
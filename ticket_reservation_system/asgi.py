@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ticket_reservation_system.settings')
 
 application = get_asgi_application()
+
+# Load the search timetable before the first request needs it
+from transportation import snapshot  # noqa: E402
+
+snapshot.warm_in_background()
@@ -0,0 +1,105 @@
+"""
+Buffered writer for audit history (BookingHistory, PaymentHistory).
+
+record() only appends the row to an in-process buffer, so a request pays no
+database round trip for its audit trail. The buffer is flushed with one bulk
+insert per model when it reaches AUDIT_BATCH_SIZE rows, every
+AUDIT_FLUSH_INTERVAL seconds from a background thread, and once more when the
+process exits. Rows carry the time of the event, not of the flush, so the
+history stays time-ordered.
+
+Rows recorded inside a transaction are only buffered once it commits.
+Processes that end with os._exit (multiprocessing workers) must call flush()
+themselves.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from collections import defaultdict
+import atexit
+import os
+import threading
+import traceback
+
+AUDIT_BATCH_SIZE = getattr(settings, 'AUDIT_BATCH_SIZE', 200)
+AUDIT_FLUSH_INTERVAL = getattr(settings, 'AUDIT_FLUSH_INTERVAL', 1.0)
+
+# Rows kept for a retry when the database is unavailable; older ones are dropped
+MAX_BUFFERED = AUDIT_BATCH_SIZE * 50
+
+
+class AuditWriter:
+    def __init__(self, batch_size=AUDIT_BATCH_SIZE, flush_interval=AUDIT_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.buffer = []
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self.thread.start()
+
+    def add(self, row):
+        with self.lock:
+            self.buffer.append(row)
+            full = len(self.buffer) >= self.batch_size
+        if full:
+            self.wakeup.set()
+
+    def flush(self):
+        # One flush at a time keeps batches in event order
+        with self.flush_lock:
+            with self.lock:
+                rows, self.buffer = self.buffer, []
+            if not rows:
+                return 0
+            by_model = defaultdict(list)
+            for row in rows:
+                by_model[type(row)].append(row)
+            try:
+                for model, model_rows in by_model.items():
+                    model.objects.bulk_create(model_rows, batch_size=self.batch_size)
+            except Exception:
+                traceback.print_exc()
+                with self.lock:
+                    self.buffer = (rows + self.buffer)[-MAX_BUFFERED:]
+                return 0
+            return len(rows)
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer, _writer_pid
+    # Threads do not survive fork, so each process starts its own writer
+    if _writer is None or _writer_pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer_pid != os.getpid():
+                _writer = AuditWriter()
+                _writer_pid = os.getpid()
+    return _writer
+
+
+def record(model, **fields):
+    """Queue an audit row such as record(BookingHistory, booking_id=..., status_change=...)."""
+    row = model(timestamp=timezone.now(), **fields)
+    transaction.on_commit(lambda: get_writer().add(row))
+
+
+def flush():
+    """Write everything buffered so far; returns the number of rows written."""
+    if _writer is None or _writer_pid != os.getpid():
+        return 0
+    return _writer.flush()
+
+
+atexit.register(flush)
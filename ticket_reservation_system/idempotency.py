@@ -0,0 +1,105 @@
+"""
+Idempotency keys for form posts that create things (bookings, payments).
+
+Clients send a key with the request, either as an `Idempotency-Key` header or
+as an `idempotency_key` form field (the forms render a fresh one each time
+they are shown). The first response for a key is stored in the cache and
+replayed for every later request with the same key, so double clicks and
+client retries never run the booking or payment again. A duplicate that
+arrives while the first request is still running waits for its response.
+
+Keys are scoped to the user and the URL, and are only as durable as the
+cache backend; use a shared backend (see CACHES) when running several
+processes.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+import hashlib
+import time
+import uuid
+
+IDEMPOTENCY_KEY_TTL = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+
+# How long a duplicate waits for the in-flight request before giving up
+IN_FLIGHT_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+
+HEADER = 'Idempotency-Key'
+FORM_FIELD = 'idempotency_key'
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def _store(key, response):
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    cache.set(key, {
+        'status': response.status_code,
+        'content': response.content,
+        'headers': list(response.items()),
+    }, IDEMPOTENCY_KEY_TTL)
+
+
+def _replay(stored):
+    response = HttpResponse(stored['content'], status=stored['status'])
+    for header, value in stored['headers']:
+        response[header] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent_response(key, handle):
+    """Return the stored response for `key`, or run `handle()` once and store its response."""
+    stored = cache.get(key)
+    if stored is not None:
+        return _replay(stored)
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, IN_FLIGHT_TIMEOUT):
+        try:
+            response = handle()
+            # Server errors are not final; let the client retry them
+            if response.status_code < 500:
+                _store(key, response)
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + IN_FLIGHT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        stored = cache.get(key)
+        if stored is not None:
+            return _replay(stored)
+        if cache.get(lock_key) is None:
+            break
+
+    return HttpResponse('A request with this idempotency key is still being processed.', status=409)
+
+
+class IdempotentPostMixin:
+    """
+    View mixin making POST idempotent per client-supplied key.
+
+    Put it after LoginRequiredMixin so keys are scoped to an authenticated user.
+    Templates get a fresh `idempotency_key` to render into the form.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        client_key = None
+        if request.method == 'POST':
+            client_key = request.headers.get(HEADER) or request.POST.get(FORM_FIELD)
+        if not client_key:
+            return super().dispatch(request, *args, **kwargs)
+
+        scope = f'{request.path}:{request.user.pk}:{client_key}'
+        key = f'idempotency:{hashlib.md5(scope.encode()).hexdigest()}'
+        return idempotent_response(key, lambda: super(IdempotentPostMixin, self).dispatch(request, *args, **kwargs))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['idempotency_key'] = new_key()
+        return context
@@ -0,0 +1,210 @@
+"""
+Per-view request, query and database-time metrics exposed in Prometheus text format.
+
+Every database connection gets an execute wrapper that counts ORM queries
+and times them end to end (djongo's SQL translation plus the MongoDB round
+trips). A pymongo command listener counts and times the MongoDB commands
+alone, including the native pymongo reads that bypass the ORM, so
+translation time is the difference between the two. Both add to the current
+request's counters, which live in a context variable that sync_to_async
+copies into its worker threads.
+
+Motor runs its commands in its own executor threads, without that context,
+so reads through the async client are not seen. Requests that use it (see
+mongo.async_collection) record their latency only and are left out of the
+database histograms rather than reported as free. Metrics are kept per
+process in memory; Prometheus should scrape every worker. /metrics is served
+to staff users and to METRICS_ALLOWED_IPS only.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from collections import defaultdict
+from contextvars import ContextVar
+import asyncio
+import bisect
+import threading
+import time
+
+try:
+    from pymongo import monitoring
+except ImportError:
+    monitoring = None
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+METRICS_ALLOWED_IPS = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+
+
+class RequestCounters:
+    __slots__ = ('queries', 'db_seconds', 'mongo_commands', 'mongo_seconds', 'unmeasured')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.mongo_commands = 0
+        self.mongo_seconds = 0.0
+        self.unmeasured = False
+
+
+# The counters of the request being handled, or None outside a request
+_request_state = ContextVar('metrics_request_state', default=None)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # label value -> [bucket counts..., +Inf count], sum
+        self.counts = defaultdict(lambda: [0] * (len(buckets) + 1))
+        self.sums = defaultdict(float)
+
+    def observe(self, view, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[view][index] += 1
+            self.sums[view] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for view in sorted(self.counts):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), self.counts[view]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{self.name}_bucket{{view="{view}",le="{le}"}} {cumulative}')
+                lines.append(f'{self.name}_sum{{view="{view}"}} {self.sums[view]:.6f}')
+                lines.append(f'{self.name}_count{{view="{view}"}} {cumulative}')
+        return lines
+
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Total request latency by view.', LATENCY_BUCKETS)
+QUERY_COUNT = Histogram('db_queries_per_request', 'ORM queries issued per request by view.', QUERY_COUNT_BUCKETS)
+COMMAND_COUNT = Histogram(
+    'db_mongo_commands_per_request', 'MongoDB commands per request by view, native reads included.', QUERY_COUNT_BUCKETS
+)
+DB_TIME = Histogram('db_mongo_seconds', 'Time spent in MongoDB commands per request by view.', LATENCY_BUCKETS)
+TRANSLATION_TIME = Histogram(
+    'db_translation_seconds', 'Time spent outside MongoDB in database calls (djongo SQL translation) per request by view.',
+    LATENCY_BUCKETS
+)
+HISTOGRAMS = [REQUEST_LATENCY, QUERY_COUNT, COMMAND_COUNT, DB_TIME, TRANSLATION_TIME]
+
+
+if monitoring is not None:
+    class MongoCommandTimer(monitoring.CommandListener):
+        """Counts every MongoDB command and adds its duration to the current request's totals."""
+
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            self._record(event)
+
+        def failed(self, event):
+            self._record(event)
+
+        def _record(self, event):
+            state = _request_state.get()
+            if state is not None:
+                state.mongo_commands += 1
+                state.mongo_seconds += event.duration_micros / 1e6
+
+    # Listeners only apply to clients created after registration, so this has to
+    # run before djongo opens its connection; the middleware is loaded at startup.
+    monitoring.register(MongoCommandTimer())
+
+
+def _record_query(execute, sql, params, many, context):
+    state = _request_state.get()
+    if state is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        state.queries += 1
+        state.db_seconds += time.perf_counter() - started
+
+
+def _install_wrapper(sender, connection, **kwargs):
+    # Connections are per thread, so wrap each one as it opens instead of per request
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install_wrapper)
+
+
+def mark_unmeasured():
+    """Flag the current request as reading through a client the listener cannot attribute (motor)."""
+    state = _request_state.get()
+    if state is not None:
+        state.unmeasured = True
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Lets Django call this middleware as a coroutine, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        state = RequestCounters()
+        token = _request_state.set(state)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        _observe(request, state, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        state = RequestCounters()
+        token = _request_state.set(state)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        _observe(request, state, time.perf_counter() - started)
+        return response
+
+
+def _observe(request, state, elapsed):
+    view = _view_name(request)
+    if view != 'metrics':
+        REQUEST_LATENCY.observe(view, elapsed)
+        if state.unmeasured:
+            return
+        QUERY_COUNT.observe(view, state.queries)
+        COMMAND_COUNT.observe(view, state.mongo_commands)
+        DB_TIME.observe(view, state.mongo_seconds)
+        TRANSLATION_TIME.observe(view, max(state.db_seconds - state.mongo_seconds, 0.0))
+
+
+def _view_name(request):
+    match = request.resolver_match
+    return match.view_name if match else 'unresolved'
+
+
+def metrics_view(request):
+    user = getattr(request, 'user', None)
+    if not (user is not None and user.is_staff) and request.META.get('REMOTE_ADDR') not in METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
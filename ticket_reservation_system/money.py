@@ -0,0 +1,90 @@
+"""
+Money stored as integer minor units (cents).
+
+MoneyField values are Decimals with two places in Python and 64-bit integers
+in MongoDB, so saves need no Decimal128 or string coercion and sums can run
+as native $sum aggregations.
+"""
+from django import forms
+from django.db import migrations, models
+from decimal import Decimal, ROUND_HALF_UP
+
+CENT = Decimal('0.01')
+
+
+def to_cents(value):
+    return int((Decimal(str(value)) / CENT).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    return None if cents is None else (Decimal(int(cents)) * CENT).quantize(CENT)
+
+
+class MoneyField(models.BigIntegerField):
+    description = 'Amount of money stored as integer cents'
+
+    def from_db_value(self, value, expression, connection):
+        return from_cents(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+        except ArithmeticError:
+            raise forms.ValidationError('Enter a valid amount.', code='invalid')
+
+    def get_prep_value(self, value):
+        if value is None or hasattr(value, 'resolve_expression'):
+            return value
+        return to_cents(value)
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{
+            'form_class': forms.DecimalField,
+            'max_digits': 12,
+            'decimal_places': 2,
+            **kwargs,
+        })
+
+
+def _convert(app_label, model_name, fields, convert):
+    def run(apps, schema_editor):
+        from pymongo import UpdateOne
+
+        model = apps.get_model(app_label, model_name)
+        # djongo's connection object is the pymongo Database
+        collection = schema_editor.connection.connection[model._meta.db_table]
+        updates = []
+        for document in collection.find({}, {field: 1 for field in fields}):
+            values = {field: convert(document[field]) for field in fields if document.get(field) is not None}
+            if values:
+                updates.append(UpdateOne({'_id': document['_id']}, {'$set': values}))
+            if len(updates) >= 1000:
+                collection.bulk_write(updates, ordered=False)
+                updates = []
+        if updates:
+            collection.bulk_write(updates, ordered=False)
+    return run
+
+
+def _legacy_to_cents(value):
+    # Old documents hold Decimal128, floats or (occasionally quoted) strings
+    if hasattr(value, 'to_decimal'):
+        value = value.to_decimal()
+    elif isinstance(value, str):
+        value = value.strip().strip('"\'')
+    return to_cents(value)
+
+
+def _cents_to_legacy(value):
+    from bson.decimal128 import Decimal128
+    return Decimal128(from_cents(value))
+
+
+def convert_to_cents(app_label, model_name, *fields):
+    """Migration operation rewriting existing `fields` documents from decimal amounts to cents."""
+    return migrations.RunPython(
+        _convert(app_label, model_name, fields, _legacy_to_cents),
+        _convert(app_label, model_name, fields, _cents_to_legacy),
+    )
@@ -0,0 +1,152 @@
+"""
+Direct pymongo access to the database djongo writes to.
+
+Used by the hand-written read paths that bypass djongo's SQL translation.
+Clients are built from the same DATABASES['default'] settings so every
+path talks to the same server and database. The async client (motor) is
+optional and only used by the async views.
+"""
+from django.conf import settings
+from datetime import date, datetime, time, timedelta
+from .metrics import mark_unmeasured
+from .pagination import decode_cursor, page_from_rows
+import threading
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:
+    AsyncIOMotorClient = None
+
+_client = None
+_client_lock = threading.Lock()
+_async_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from pymongo import MongoClient
+                _client = MongoClient(**settings.DATABASES['default'].get('CLIENT', {}))
+    return _client
+
+
+def get_database():
+    return get_client()[settings.DATABASES['default']['NAME']]
+
+
+def async_reads_available(request):
+    """True when motor is installed and the request is running on an ASGI server's event loop."""
+    return AsyncIOMotorClient is not None and hasattr(request, 'scope')
+
+
+def get_async_database():
+    global _async_client
+    if _async_client is None:
+        # One client, and so one connection pool, per worker process. Motor binds
+        # it to the event loop it is first used on, which under ASGI is the server's.
+        _async_client = AsyncIOMotorClient(**settings.DATABASES['default'].get('CLIENT', {}))
+    return _async_client[settings.DATABASES['default']['NAME']]
+
+
+def native_reads_enabled():
+    return getattr(settings, 'NATIVE_MONGO_READS', False)
+
+
+# djongo stores dates as midnight datetimes, times as datetimes on 1900-01-01
+# and durations as integer microseconds. These helpers convert in both
+# directions; money is stored as cents (see money.from_cents).
+
+def to_mongo(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if isinstance(value, time):
+        return datetime(1900, 1, 1, value.hour, value.minute, value.second, value.microsecond)
+    return value
+
+
+def as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def as_time(value):
+    if isinstance(value, datetime):
+        return value.time()
+    if isinstance(value, str):
+        return time.fromisoformat(value)
+    return value
+
+
+def as_duration(value):
+    if isinstance(value, int):
+        return timedelta(microseconds=value)
+    return value
+
+
+def collection(model):
+    return get_database()[model._meta.db_table]
+
+
+def async_collection(model):
+    # Motor's commands run outside the request context, so metrics cannot time them
+    mark_unmeasured()
+    return get_async_database()[model._meta.db_table]
+
+
+def _keyset_match(ordering, values, reverse=False):
+    """MongoDB equivalent of pagination._after."""
+    clauses = []
+    for position, field in enumerate(ordering):
+        descending = field.startswith('-') != reverse
+        clause = {previous.lstrip('-'): to_mongo(value) for previous, value in zip(ordering[:position], values)}
+        clause[field.lstrip('-')] = {'$lt' if descending else '$gt': to_mongo(values[position])}
+        clauses.append(clause)
+    return {'$or': clauses}
+
+
+def _sort(ordering, reverse=False):
+    return {field.lstrip('-'): -1 if field.startswith('-') != reverse else 1 for field in ordering}
+
+
+def _page_pipeline(model, match, ordering, page_size, stages, after, before):
+    if before:
+        condition = _keyset_match(ordering, decode_cursor(model, ordering, before), reverse=True)
+    elif after:
+        condition = _keyset_match(ordering, decode_cursor(model, ordering, after))
+    else:
+        condition = None
+    return [
+        {'$match': {'$and': [match, condition]} if condition else match},
+        {'$sort': _sort(ordering, reverse=bool(before))},
+        {'$limit': page_size + 1},
+        *stages,
+    ]
+
+
+def paginate_aggregate(model, match, ordering, page_size, build, stages=(), after=None, before=None):
+    """
+    Keyset-paginate `model`'s collection with an aggregation pipeline.
+
+    Mirrors pagination.paginate_keyset and produces the same cursors, so a
+    page link rendered by either path works with the other. The range, sort
+    and limit run before `stages` (typically $lookup joins) so joins only
+    touch the rows on the page; `build` turns each document into the record
+    handed to the template and must expose the ordering fields.
+    """
+    pipeline = _page_pipeline(model, match, ordering, page_size, stages, after, before)
+    rows = [build(document) for document in collection(model).aggregate(pipeline)]
+    return page_from_rows(rows, ordering, page_size, after, before)
+
+
+async def apaginate_aggregate(model, match, ordering, page_size, build, stages=(), after=None, before=None):
+    """paginate_aggregate() on the async client."""
+    pipeline = _page_pipeline(model, match, ordering, page_size, stages, after, before)
+    rows = [build(document) async for document in async_collection(model).aggregate(pipeline)]
+    return page_from_rows(rows, ordering, page_size, after, before)
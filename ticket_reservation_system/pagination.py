@@ -0,0 +1,153 @@
+"""
+Keyset (cursor) pagination for list views.
+
+Instead of OFFSET-style page numbers, each page link carries the sort key of
+the last (or first) row shown and the next page is fetched with a range
+condition on that key, so page cost does not grow with how far back a user
+pages. The ordering must end in a unique field, e.g. ('departure_date',
+'departure_time', 'id').
+"""
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+import base64
+import json
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(values):
+    raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(model, ordering, cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise Http404('Invalid page cursor.')
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise Http404('Invalid page cursor.')
+    try:
+        return [
+            model._meta.get_field(field.lstrip('-')).to_python(value)
+            for field, value in zip(ordering, values)
+        ]
+    except ValidationError:
+        raise Http404('Invalid page cursor.')
+
+
+def _after(ordering, values, reverse=False):
+    """Rows strictly after `values` in `ordering` (or before them when `reverse`)."""
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        descending = field.startswith('-') != reverse
+        step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[position]})
+        for previous, value in zip(ordering[:position], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def _flip(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def paginate_keyset(queryset, ordering, page_size, after=None, before=None):
+    """Return the KeysetPage after cursor `after`, before cursor `before`, or the first page."""
+    model = queryset.model
+
+    def key(obj):
+        return [getattr(obj, field.lstrip('-')) for field in ordering]
+
+    if before:
+        values = decode_cursor(model, ordering, before)
+        rows = list(
+            queryset.filter(_after(ordering, values, reverse=True))
+            .order_by(*[_flip(field) for field in ordering])[:page_size + 1]
+        )
+        has_more = len(rows) > page_size
+        rows = list(reversed(rows[:page_size]))
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(key(rows[-1])) if rows else None,
+            previous_cursor=encode_cursor(key(rows[0])) if rows and has_more else None,
+        )
+
+    if after:
+        queryset = queryset.filter(_after(ordering, decode_cursor(model, ordering, after)))
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(key(rows[-1])) if rows and has_more else None,
+        previous_cursor=encode_cursor(key(rows[0])) if rows and after else None,
+    )
+
+
+def page_from_rows(rows, ordering, page_size, after=None, before=None):
+    """
+    Build the KeysetPage for up to page_size + 1 dict rows already fetched in
+    keyset order (reversed when paging `before`), for pages read outside the ORM.
+    """
+    def key(record):
+        return [record[field.lstrip('-')] for field in ordering]
+
+    has_more = len(rows) > page_size
+    if before:
+        rows = list(reversed(rows[:page_size]))
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(key(rows[-1])) if rows else None,
+            previous_cursor=encode_cursor(key(rows[0])) if rows and has_more else None,
+        )
+    rows = rows[:page_size]
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(key(rows[-1])) if rows and has_more else None,
+        previous_cursor=encode_cursor(key(rows[0])) if rows and after else None,
+    )
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin replacing page-number pagination with keyset pagination.
+
+    Pages are selected with ?after=<cursor> or ?before=<cursor>. The template
+    gets `page_obj` with has_next/has_previous and next_cursor/previous_cursor.
+    """
+    keyset_ordering = ('id',)
+
+    def get_keyset_page(self, queryset, page_size):
+        return paginate_keyset(
+            queryset, self.keyset_ordering, page_size,
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        page = self.get_keyset_page(queryset, page_size)
+        return (None, page, page.object_list, page.has_other_pages())
@@ -43,9 +43,11 @@ INSTALLED_APPS = [
     'transportation',
     'bookings',
     'payments',
+    'reporting',
 ]
 
 MIDDLEWARE = [
+    'ticket_reservation_system.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,6 +57,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Besides staff users, only these addresses may scrape /metrics (e.g. the Prometheus server)
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
 ROOT_URLCONF = 'ticket_reservation_system.urls'
 
 TEMPLATES = [
@@ -90,6 +95,49 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Search results and their version counters live in the cache, so production
+# should point this at a shared backend (Memcached/Redis) for all web processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ticket-reservation',
+    }
+}
+
+SEARCH_CACHE_TIMEOUT = 300  # seconds
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60  # seconds a booking/payment response is replayed for
+
+# Serve search, seat maps and booking pages with hand-written pymongo queries
+# instead of djongo's SQL translation (see `manage.py benchmark_reads`)
+NATIVE_MONGO_READS = False
+
+# Serve dated searches from an in-memory timetable of the next N days (transportation/snapshot.py)
+TIMETABLE_SNAPSHOT = True
+TIMETABLE_SNAPSHOT_DAYS = 30
+
+# Payment workers (`manage.py process_payments`)
+PAYMENT_GATEWAY_TIMEOUT = 30  # seconds per gateway call
+PAYMENT_MAX_ATTEMPTS = 5
+
+# Audit history is buffered and written in batches (ticket_reservation_system/audit.py)
+AUDIT_BATCH_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 1.0  # seconds
+
+# Days of departures kept materialized from schedule templates (`manage.py materialize_schedules`)
+SCHEDULE_HORIZON_DAYS = 90
+
+# Multi-leg journey planner (transportation/journeys.py)
+JOURNEY_SEARCH_BUDGET_MS = 200
+JOURNEY_MAX_LEGS = 3
+MIN_CONNECTION_MINUTES = {'Bus': 15, 'Train': 10, 'Flight': 60}  # per transport type, at each transfer
+
+# Dynamic pricing (`manage.py reprice_schedules`, transportation/pricing.py)
+PRICING_BATCH_SIZE = 10000  # departures per batch
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -0,0 +1,167 @@
+from django.core.cache import cache
+from django.db import models
+from django.http import Http404, HttpResponse
+from django.test import SimpleTestCase
+from bson.decimal128 import Decimal128
+from pymongo import UpdateOne
+from .idempotency import idempotent_response
+from .metrics import COMMAND_COUNT, QUERY_COUNT, REQUEST_LATENCY, MetricsMiddleware, mark_unmeasured
+from .money import MoneyField, _cents_to_legacy, _convert, _legacy_to_cents, from_cents, to_cents
+from .pagination import decode_cursor, encode_cursor, page_from_rows, paginate_keyset
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+
+class MoneyTests(SimpleTestCase):
+    def test_round_trip(self):
+        self.assertEqual(to_cents(Decimal('19.99')), 1999)
+        self.assertEqual(from_cents(1999), Decimal('19.99'))
+        self.assertIsNone(from_cents(None))
+
+    def test_rounds_half_up(self):
+        self.assertEqual(to_cents(Decimal('1.005')), 101)
+        self.assertEqual(to_cents(Decimal('1.004')), 100)
+        self.assertEqual(to_cents(0.1 + 0.2), 30)
+
+    def test_field_stores_cents(self):
+        field = MoneyField()
+        self.assertEqual(field.get_prep_value(Decimal('12.50')), 1250)
+        self.assertEqual(field.to_python('12.5'), Decimal('12.50'))
+        self.assertEqual(field.from_db_value(1250, None, None), Decimal('12.50'))
+
+    def test_legacy_values_convert_to_cents(self):
+        self.assertEqual(_legacy_to_cents(Decimal128('45.10')), 4510)
+        self.assertEqual(_legacy_to_cents(45.1), 4510)
+        self.assertEqual(_legacy_to_cents(45), 4500)
+        self.assertEqual(_legacy_to_cents('"45.10"'), 4510)
+        self.assertEqual(_legacy_to_cents(" '7' "), 700)
+        self.assertEqual(_cents_to_legacy(4510), Decimal128('45.10'))
+
+    def test_migration_rewrites_stored_documents(self):
+        collection = mock.Mock()
+        collection.find.return_value = [
+            {'_id': 1, 'price': Decimal128('10.50')},
+            {'_id': 2, 'price': '"3.20"'},
+            {'_id': 3, 'price': None},
+        ]
+        schema_editor = mock.Mock()
+        schema_editor.connection.connection = {'transportation_schedule': collection}
+        apps = mock.Mock()
+        apps.get_model.return_value._meta.db_table = 'transportation_schedule'
+
+        _convert('transportation', 'Schedule', ('price',), _legacy_to_cents)(apps, schema_editor)
+
+        collection.bulk_write.assert_called_once_with([
+            UpdateOne({'_id': 1}, {'$set': {'price': 1050}}),
+            UpdateOne({'_id': 2}, {'$set': {'price': 320}}),
+        ], ordered=False)
+
+
+class IdempotencyTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_first_response_is_replayed(self):
+        handle = mock.Mock(return_value=HttpResponse('created', status=201))
+
+        first = idempotent_response('idempotency:test', handle)
+        second = idempotent_response('idempotency:test', handle)
+
+        handle.assert_called_once()
+        self.assertEqual((second.status_code, second.content), (201, b'created'))
+        self.assertNotIn('Idempotent-Replayed', first)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+
+    def test_server_errors_are_not_replayed(self):
+        handle = mock.Mock(side_effect=[HttpResponse(status=503), HttpResponse('created', status=201)])
+
+        self.assertEqual(idempotent_response('idempotency:retry', handle).status_code, 503)
+        self.assertEqual(idempotent_response('idempotency:retry', handle).status_code, 201)
+        self.assertEqual(handle.call_count, 2)
+
+
+class MetricsTests(SimpleTestCase):
+    def request(self, view_name):
+        return mock.Mock(resolver_match=mock.Mock(view_name=view_name))
+
+    def test_async_client_requests_skip_database_histograms(self):
+        def uses_motor(request):
+            mark_unmeasured()
+            return HttpResponse()
+
+        MetricsMiddleware(uses_motor)(self.request('test:motor'))
+        MetricsMiddleware(lambda request: HttpResponse())(self.request('test:orm'))
+
+        self.assertIn('test:motor', REQUEST_LATENCY.counts)
+        self.assertNotIn('test:motor', QUERY_COUNT.counts)
+        self.assertNotIn('test:motor', COMMAND_COUNT.counts)
+        self.assertIn('test:orm', COMMAND_COUNT.counts)
+
+
+class Row:
+    def __init__(self, id, day):
+        self.id = id
+        self.day = day
+
+
+class RowQuerySet:
+    """Just enough of a QuerySet for paginate_keyset: Q filters, ordering and slicing over a list."""
+    model = mock.Mock()
+    model._meta.get_field.side_effect = lambda name: models.DateField() if name == 'day' else models.IntegerField()
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def _matches(self, row, condition):
+        results = (
+            self._matches(row, child) if hasattr(child, 'children') else self._compare(row, *child)
+            for child in condition.children
+        )
+        return any(results) if condition.connector == 'OR' else all(results)
+
+    def _compare(self, row, lookup, value):
+        name, _, operator = lookup.partition('__')
+        current = getattr(row, name)
+        return {'': current == value, 'gt': current > value, 'lt': current < value}[operator]
+
+    def filter(self, condition):
+        return RowQuerySet([row for row in self.rows if self._matches(row, condition)])
+
+    def order_by(self, *ordering):
+        rows = list(self.rows)
+        for field in reversed(ordering):
+            rows.sort(key=lambda row: getattr(row, field.lstrip('-')), reverse=field.startswith('-'))
+        return rows
+
+
+class KeysetPaginationTests(SimpleTestCase):
+    ordering = ('-day', 'id')
+
+    def setUp(self):
+        self.queryset = RowQuerySet([Row(id, date(2026, 1, 1 + id % 3)) for id in range(1, 8)])
+        self.expected = [row.id for row in self.queryset.order_by(*self.ordering)]
+
+    def test_pages_forward_and_back_over_every_row(self):
+        pages = [paginate_keyset(self.queryset, self.ordering, 3)]
+        while pages[-1].has_next():
+            pages.append(paginate_keyset(self.queryset, self.ordering, 3, after=pages[-1].next_cursor))
+        self.assertEqual([row.id for page in pages for row in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous())
+
+        back = paginate_keyset(self.queryset, self.ordering, 3, before=pages[2].previous_cursor)
+        self.assertEqual([row.id for row in back], [row.id for row in pages[1]])
+        self.assertTrue(back.has_previous())
+
+    def test_cursor_round_trip_and_rejects_garbage(self):
+        cursor = encode_cursor([date(2026, 1, 2), 5])
+        self.assertEqual(decode_cursor(RowQuerySet.model, self.ordering, cursor), [date(2026, 1, 2), 5])
+        with self.assertRaises(Http404):
+            decode_cursor(RowQuerySet.model, self.ordering, 'not-a-cursor')
+
+    def test_page_from_rows_matches_the_orm_pages(self):
+        rows = [{'id': row.id, 'day': row.day} for row in self.queryset.order_by(*self.ordering)]
+        first = page_from_rows(rows[:4], self.ordering, 3)
+        self.assertEqual([row['id'] for row in first], self.expected[:3])
+        self.assertEqual(first.next_cursor, paginate_keyset(self.queryset, self.ordering, 3).next_cursor)
@@ -1,5 +1,6 @@
-from django.contrib import admin
-from .models import TransportationType, Route, Vehicle, Schedule, Seat
+from django.contrib import admin, messages
+from .models import TransportationType, Route, Vehicle, ScheduleTemplate, Schedule, Seat, SeatInventory
+from .recurring import materialize
 
 @admin.register(TransportationType)
 class TransportationTypeAdmin(admin.ModelAdmin):
@@ -18,15 +19,34 @@ class VehicleAdmin(admin.ModelAdmin):
     list_filter = ('transportation_type', 'is_active')
     search_fields = ('vehicle_number',)
 
+@admin.register(ScheduleTemplate)
+class ScheduleTemplateAdmin(admin.ModelAdmin):
+    list_display = ('route', 'vehicle', 'departure_time', 'arrival_time', 'days_of_week', 'valid_from', 'valid_until', 'price', 'is_active')
+    list_filter = ('is_active', 'route__transportation_type')
+    search_fields = ('route__origin', 'route__destination', 'vehicle__vehicle_number')
+    actions = ['materialize_departures']
+
+    def materialize_departures(self, request, queryset):
+        created = materialize(template_ids=queryset.values_list('id', flat=True))
+        self.message_user(request, f'{created} departures created.', messages.SUCCESS)
+    materialize_departures.short_description = 'Create missing departures for the schedule horizon'
+
 @admin.register(Schedule)
 class ScheduleAdmin(admin.ModelAdmin):
     list_display = ('route', 'vehicle', 'departure_date', 'departure_time', 'price', 'available_seats', 'status')
     list_filter = ('status', 'departure_date', 'route__transportation_type')
     search_fields = ('route__origin', 'route__destination', 'vehicle__vehicle_number')
     date_hierarchy = 'departure_date'
+    raw_id_fields = ('template',)
 
 @admin.register(Seat)
 class SeatAdmin(admin.ModelAdmin):
-    list_display = ('vehicle', 'seat_number', 'seat_type', 'is_available')
-    list_filter = ('seat_type', 'is_available', 'vehicle__transportation_type')
+    list_display = ('vehicle', 'seat_number', 'seat_type')
+    list_filter = ('seat_type', 'vehicle__transportation_type')
     search_fields = ('vehicle__vehicle_number', 'seat_number')
+
+@admin.register(SeatInventory)
+class SeatInventoryAdmin(admin.ModelAdmin):
+    list_display = ('schedule', 'version', 'updated_at')
+    search_fields = ('schedule__route__origin', 'schedule__route__destination')
+    readonly_fields = ('seats', 'seat_states', 'version', 'updated_at')
@@ -0,0 +1,147 @@
+"""
+Automatic seat allocation for groups.
+
+Seats follow the layout from layout.seat_layout(): '<row><column letter>',
+with the aisle in the middle of each row. allocate() turns the free seats of
+each row into a bitmap (bit i set = column i free) and finds a block of
+adjacent free seats with one mask test per offset, instead of trying seat
+combinations. Blocks are ranked by:
+
+1. containing the preferred seat type (window, aisle or middle), if any;
+2. not being split by the aisle;
+3. leaving the fewest stranded single seats in the row;
+4. being nearer the front.
+
+A group that fits in no single row is seated in the fewest consecutive rows.
+"""
+from .layout import seat_position
+
+MAX_GROUP_SIZE = 6
+PREFERENCES = ('any', 'window', 'aisle', 'middle')
+
+
+class AllocationError(Exception):
+    """Raised when a schedule has too few free seats for the group."""
+
+
+class _Row:
+    __slots__ = ('number', 'free', 'width', 'positions', 'types')
+
+    def __init__(self, number):
+        self.number = number
+        self.free = 0
+        self.width = 0
+        self.positions = {}  # column -> index in the inventory's seat list
+        self.types = {}  # column -> seat type
+
+    def crosses_aisle(self, offset, count):
+        aisle = self.width // 2
+        return offset < aisle < offset + count
+
+    def stranded(self, taken):
+        # Free seats left with no free neighbour
+        remaining = self.free & ~taken
+        return bin(remaining & ~(remaining << 1) & ~(remaining >> 1)).count('1')
+
+
+def _rows(seats, free):
+    rows = {}
+    for position, seat in enumerate(seats):
+        parsed = seat_position(seat['seat_number'])
+        if parsed is None:
+            continue
+        number, column = parsed
+        row = rows.get(number)
+        if row is None:
+            row = rows[number] = _Row(number)
+        row.positions[column] = position
+        row.types[column] = seat['seat_type']
+        row.width = max(row.width, column + 1)
+        if free[position]:
+            row.free |= 1 << column
+    return [rows[number] for number in sorted(rows)]
+
+
+def _columns(bits):
+    column = 0
+    while bits:
+        if bits & 1:
+            yield column
+        bits >>= 1
+        column += 1
+
+
+def _misses(row, columns, preference):
+    if preference == 'any':
+        return 0
+    return 0 if any(row.types.get(column) == preference for column in columns) else 1
+
+
+def _best_block(rows, count, preference):
+    mask = (1 << count) - 1
+    best = None
+    for row in rows:
+        if bin(row.free).count('1') < count:
+            continue
+        for offset in range(row.width - count + 1):
+            if (row.free >> offset) & mask != mask:
+                continue
+            columns = range(offset, offset + count)
+            score = (
+                _misses(row, columns, preference),
+                row.crosses_aisle(offset, count),
+                row.stranded(mask << offset),
+                row.number,
+            )
+            if best is None or score < best[0]:
+                best = (score, [row.positions[column] for column in columns])
+    return best[1] if best else None
+
+
+def _fewest_rows(rows, count, preference):
+    best = None
+    for start in range(len(rows)):
+        picked = []
+        misses = 1
+        end = start
+        while end < len(rows) and len(picked) < count:
+            row = rows[end]
+            columns = list(_columns(row.free))[:count - len(picked)]
+            if columns and not _misses(row, columns, preference):
+                misses = 0
+            picked.extend(row.positions[column] for column in columns)
+            end += 1
+        if len(picked) < count:
+            break
+        score = (end - start, misses if preference != 'any' else 0, rows[start].number)
+        if best is None or score < best[0]:
+            best = (score, picked)
+    return best[1] if best else None
+
+
+def _scattered(rows, count, preference):
+    ranked = sorted(
+        (row.types.get(column) != preference if preference != 'any' else False, row.number, column, row.positions[column])
+        for row in rows for column in _columns(row.free)
+    )
+    return [position for *_, position in ranked[:count]]
+
+
+def allocate(seats, free, count, preference='any', together=True):
+    """
+    Positions in `seats` (an inventory's seat list) to give a group of
+    `count`. `free[i]` tells whether seat i can be taken.
+    """
+    if preference not in PREFERENCES:
+        preference = 'any'
+    if sum(1 for available in free if available) < count:
+        raise AllocationError(f'Fewer than {count} seats are free.')
+
+    rows = _rows(seats, free)
+    if not together:
+        positions = _scattered(rows, count, preference)
+    else:
+        positions = _best_block(rows, count, preference) or _fewest_rows(rows, count, preference)
+    if not positions or len(positions) < count:
+        raise AllocationError(f'Could not seat {count} passengers together.')
+    return positions
@@ -0,0 +1,118 @@
+"""
+Async read views for ASGI deployments.
+
+Search, the seat map page and the seat availability endpoint read MongoDB
+through the async client, so a request waiting on the database does not hold
+a worker thread. Without motor installed, or when the request arrives through
+WSGI, each view falls back to its synchronous implementation. Seat holds
+(POST to the seat map) always go through the synchronous SeatMapView.
+"""
+from django.contrib.auth import get_user
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from asgiref.sync import sync_to_async
+from ticket_reservation_system.mongo import async_reads_available
+from .models import Schedule
+from .views import SearchView, SeatMapView, connecting_journeys, parse_search_date, seat_preference_choices
+from . import allocation
+from . import inventory
+from . import repository
+from . import search_cache
+from . import snapshot
+
+SEARCH_PARAMS = ('origin', 'destination', 'departure_date', 'transport_type')
+
+_sync_search = sync_to_async(SearchView.as_view(), thread_sensitive=True)
+_sync_seat_map = sync_to_async(SeatMapView.as_view(), thread_sensitive=True)
+
+
+async def _load_user(request):
+    # request.user is a lazy object backed by the session and user tables;
+    # resolve it off the event loop before anything (like templates) touches it
+    request.user = await sync_to_async(get_user, thread_sensitive=True)(request)
+    return request.user
+
+
+async def search(request):
+    if not async_reads_available(request):
+        return await _sync_search(request)
+
+    search_params = {name: request.GET.get(name) or '' for name in SEARCH_PARAMS}
+    params = {name: request.GET.get(name) for name in SEARCH_PARAMS}
+    # A malformed date is ignored, as in SearchView
+    params['departure_date'] = parse_search_date(params['departure_date'])
+    after, before = request.GET.get('after'), request.GET.get('before')
+    page = await sync_to_async(snapshot.search, thread_sensitive=True)(
+        page_size=SearchView.paginate_by, after=after, before=before, **params
+    )
+    if page is None:
+        # Building the key reads cached versions; pages of records are cached apart from SearchView's
+        key = await sync_to_async(search_cache.results_key, thread_sensitive=True)(
+            params['origin'], params['destination'], params['departure_date'], params['transport_type'],
+            f"{after or ''}|{before or ''}", records=True,
+        )
+        page = await search_cache.aget_or_compute(key, lambda: repository.asearch_schedules(
+            page_size=SearchView.paginate_by, after=after, before=before, **params
+        ))
+    transportation_types = await search_cache.aget_or_compute(
+        search_cache.TRANSPORT_TYPE_RECORDS_KEY, repository.atransportation_types, timeout=None
+    )
+
+    journeys = []
+    if not page.object_list and not params['transport_type']:
+        journeys = await sync_to_async(connecting_journeys, thread_sensitive=True)(
+            params['origin'], params['destination'], params['departure_date']
+        )
+
+    await _load_user(request)
+    return render(request, SearchView.template_name, {
+        'schedules': page.object_list,
+        'object_list': page.object_list,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+        'transportation_types': transportation_types,
+        'search_params': search_params,
+        'journeys': journeys,
+    })
+
+
+async def seat_map(request, schedule_id):
+    if request.method != 'GET' or not async_reads_available(request):
+        return await _sync_seat_map(request, schedule_id=schedule_id)
+
+    schedule = await repository.aget_schedule(schedule_id)
+    if schedule is None:
+        raise Http404('No schedule found matching the query')
+    user = await _load_user(request)
+    payload = await inventory.aseat_map_payload(schedule_id)
+
+    return render(request, SeatMapView.template_name, {
+        'schedule': schedule,
+        'object': schedule,
+        'seat_rows': inventory.seat_rows(payload, user=user if user.is_authenticated else None),
+        'hold_minutes': inventory.SEAT_HOLD_TTL // 60,
+        'max_seats': allocation.MAX_GROUP_SIZE,
+        'preference_choices': seat_preference_choices(),
+    })
+
+
+def _seat_availability(request, schedule_id):
+    schedule = get_object_or_404(Schedule, pk=schedule_id)
+    user = request.user if request.user.is_authenticated else None
+    payload = inventory.seat_map_payload(schedule)
+    return JsonResponse(inventory.availability(schedule_id, inventory.seat_rows(payload, user=user), payload['valid_until']))
+
+
+async def seat_availability(request, schedule_id):
+    """Live seat states for a schedule as JSON, for polling from the seat map page."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not async_reads_available(request):
+        return await sync_to_async(_seat_availability, thread_sensitive=True)(request, schedule_id)
+
+    if not await repository.aschedule_exists(schedule_id):
+        raise Http404('No schedule found matching the query')
+    user = await _load_user(request)
+    payload = await inventory.aseat_map_payload(schedule_id)
+    rows = inventory.seat_rows(payload, user=user if user.is_authenticated else None)
+    return JsonResponse(inventory.availability(schedule_id, rows, payload['valid_until']))
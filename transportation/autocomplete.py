@@ -0,0 +1,177 @@
+"""
+City name autocomplete for the search form.
+
+One prefix trie per search field ('origin', 'destination') holds every
+normalized city name and each word in it, so 'bos', 'new y' and 'york' all
+reach 'New York'. Every trie node keeps its best SUGGESTION_LIMIT cities,
+ranked by popularity (bookings on the city's routes over the last
+POPULARITY_DAYS days, then the number of routes), so an exact-prefix lookup
+is one walk of the query's characters. When the prefix finds nothing, the
+query is matched again within one typo (a wrong, missing, extra or swapped
+character).
+
+The tries are rebuilt in the background of a request when a Route is saved
+(the routes version changes) or after INDEX_MAX_AGE seconds; until then
+requests keep using the previous index.
+"""
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from .models import Route, Schedule
+from .search_cache import routes_version
+from .search_index import normalize, terms_for
+from datetime import timedelta
+import threading
+import time
+
+FIELDS = ('origin', 'destination')
+SUGGESTION_LIMIT = 8
+POPULARITY_DAYS = 90
+INDEX_MAX_AGE = 10 * 60  # seconds; picks up popularity changes
+MIN_FUZZY_LENGTH = 3
+
+
+class TrieNode:
+    __slots__ = ('children', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.top = []  # (-bookings, -routes, name), best first once finalized
+
+
+class CityIndex:
+    def __init__(self, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.roots = {field: TrieNode() for field in FIELDS}
+
+    def add(self, field, name, bookings, routes):
+        entry = (-bookings, -routes, name)
+        for term in terms_for(name):
+            node = self.roots[field]
+            for char in term:
+                node = node.children.setdefault(char, TrieNode())
+                node.top.append(entry)
+
+    def finalize(self):
+        stack = list(self.roots.values())
+        while stack:
+            node = stack.pop()
+            # A city reaches a node once per matching word, always with the same entry
+            node.top = sorted(set(node.top))[:SUGGESTION_LIMIT]
+            stack.extend(node.children.values())
+
+    def _walk(self, node, query):
+        for char in query:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _fuzzy(self, node, query, position, edits, found):
+        """Collect the nodes reached by `query[position:]` with at most `edits` typos."""
+        if position == len(query):
+            found[id(node)] = node
+            return
+        char = query[position]
+        child = node.children.get(char)
+        if child is not None:
+            self._fuzzy(child, query, position + 1, edits, found)
+        if not edits:
+            return
+        self._fuzzy(node, query, position + 1, edits - 1, found)  # extra character
+        for other, child in node.children.items():
+            if other != char:
+                self._fuzzy(child, query, position + 1, edits - 1, found)  # wrong character
+            self._fuzzy(child, query, position, edits - 1, found)  # missing character
+        if position + 1 < len(query):
+            swapped = node.children.get(query[position + 1])
+            swapped = swapped and swapped.children.get(char)
+            if swapped is not None:
+                self._fuzzy(swapped, query, position + 2, edits - 1, found)
+
+    def suggest(self, field, query, limit=SUGGESTION_LIMIT):
+        query = normalize(query)
+        if not query:
+            return []
+        root = self.roots[field]
+        names = []
+        node = self._walk(root, query)
+        if node is not None:
+            names = [entry[-1] for entry in node.top[:limit]]
+        if not names and len(query) >= MIN_FUZZY_LENGTH:
+            found = {}
+            self._fuzzy(root, query, 0, 1, found)
+            ranked = sorted({entry for candidate in found.values() for entry in candidate.top})
+            for entry in ranked:
+                if entry[-1] not in names:
+                    names.append(entry[-1])
+            names = names[:limit]
+        return names
+
+
+def _popularity():
+    """(bookings, route count) per (field, city)."""
+    from bookings.models import Booking
+
+    since = timezone.now() - timedelta(days=POPULARITY_DAYS)
+    per_schedule = dict(
+        Booking.objects.filter(booking_date__gte=since)
+        .values('schedule_id')
+        .annotate(bookings=Count('id'))
+        .values_list('schedule_id', 'bookings')
+    )
+    per_route = {}
+    for schedule_id, route_id in Schedule.objects.filter(id__in=list(per_schedule)).values_list('id', 'route_id'):
+        per_route[route_id] = per_route.get(route_id, 0) + per_schedule[schedule_id]
+
+    scores = {}
+    for route_id, origin, destination in Route.objects.filter(is_active=True).values_list('id', 'origin', 'destination'):
+        for field, city in (('origin', origin), ('destination', destination)):
+            bookings, routes = scores.get((field, city), (0, 0))
+            scores[(field, city)] = (bookings + per_route.get(route_id, 0), routes + 1)
+    return scores
+
+
+def build_index(version=None):
+    index = CityIndex(version)
+    for (field, city), (bookings, routes) in _popularity().items():
+        index.add(field, city, bookings, routes)
+    index.finalize()
+    return index
+
+
+_index = None
+_build_lock = threading.Lock()
+
+
+def _rebuild(version):
+    global _index
+    try:
+        _index = build_index(version)
+    finally:
+        _build_lock.release()
+        connection.close()
+
+
+def get_index():
+    """The current index; a stale one is served while a rebuild runs in the background."""
+    global _index
+    version = routes_version()
+    index = _index
+    if index is not None and index.version == version and time.monotonic() - index.built_at < INDEX_MAX_AGE:
+        return index
+    if index is None:
+        # Nothing to serve yet: build it in this request
+        with _build_lock:
+            if _index is None:
+                _index = build_index(version)
+        return _index
+    if _build_lock.acquire(blocking=False):
+        threading.Thread(target=_rebuild, args=(version,), name='city-autocomplete', daemon=True).start()
+    return index
+
+
+def suggest(field, query, limit=SUGGESTION_LIMIT):
+    """City names for `field` ('origin' or 'destination') starting with `query`, most popular first."""
+    return get_index().suggest(field, query, limit)
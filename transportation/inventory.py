@@ -0,0 +1,380 @@
+from django.conf import settings
+from django.core.cache import cache
+from asgiref.sync import sync_to_async
+from ticket_reservation_system.mongo import native_reads_enabled
+from .models import Schedule, Seat, SeatInventory
+from .allocation import allocate, MAX_GROUP_SIZE
+from . import repository
+import re
+import time
+
+# Number of compare-and-swap attempts before giving up on a contended schedule
+MAX_WRITE_ATTEMPTS = 5
+
+# How long a selected seat stays reserved for the user filling in the booking form
+SEAT_HOLD_TTL = getattr(settings, 'SEAT_HOLD_TTL', 15 * 60)
+
+# Seat maps are invalidated on every inventory write, so this is only an upper bound
+SEAT_MAP_CACHE_TIMEOUT = getattr(settings, 'SEAT_MAP_CACHE_TIMEOUT', 60 * 60)
+
+_SEAT_NUMBER = re.compile(r'^(\d+)([A-Z]+)$')
+
+
+class SeatUnavailableError(Exception):
+    """Raised when one or more requested seats are already taken."""
+
+    def __init__(self, seat_ids):
+        self.seat_ids = list(seat_ids)
+        super().__init__(f"Seats not available: {', '.join(str(s) for s in self.seat_ids)}")
+
+
+class SeatLimitError(Exception):
+    """Raised when more seats are requested than one booking may take."""
+
+
+def _booked_seat_ids(schedule):
+    # Seats sold before the schedule had an inventory (bookings import this module)
+    from bookings.models import Booking, BookingSeat
+    from bookings.services import ACTIVE_STATUSES
+
+    booking_ids = list(
+        Booking.objects.filter(schedule_id=schedule.pk, status__in=ACTIVE_STATUSES).values_list('id', flat=True)
+    )
+    if not booking_ids:
+        return set()
+    return set(BookingSeat.objects.filter(booking_id__in=booking_ids).values_list('seat_id', flat=True))
+
+
+def build_inventory(schedule):
+    """Create the inventory document for a schedule from its vehicle's seats and its active bookings."""
+    seats = [
+        {'id': seat.id, 'seat_number': seat.seat_number, 'seat_type': seat.seat_type}
+        for seat in Seat.objects.filter(vehicle_id=schedule.vehicle_id).order_by('id')
+    ]
+    booked = _booked_seat_ids(schedule)
+    inventory, _ = SeatInventory.objects.get_or_create(
+        schedule=schedule,
+        defaults={
+            'seats': seats,
+            'seat_states': ''.join(
+                SeatInventory.SEAT_BOOKED if seat['id'] in booked else SeatInventory.SEAT_FREE for seat in seats
+            ),
+        }
+    )
+    return inventory
+
+
+def get_inventory(schedule):
+    try:
+        return SeatInventory.objects.get(schedule=schedule)
+    except SeatInventory.DoesNotExist:
+        return build_inventory(schedule)
+
+
+def _active_holds(inventory, now=None):
+    # Expired holds are simply ignored here and dropped on the next write,
+    # so no background job ever has to scan for them.
+    now = now or time.time()
+    return {
+        seat_id: hold for seat_id, hold in (inventory.holds or {}).items()
+        if hold['expires_at'] > now
+    }
+
+
+def _held_by_other(holds, seat_id, user_id):
+    hold = holds.get(str(seat_id))
+    return hold is not None and hold['user_id'] != user_id
+
+
+def _seat_map_key(schedule_id):
+    return f'seatmap:{schedule_id}'
+
+
+def _layout_rows(seats):
+    """Group seats into rows from their numbers ('12C' -> row 12), keeping the aisle in the middle."""
+    rows = []
+    for seat in seats:
+        match = _SEAT_NUMBER.match(seat['seat_number'])
+        row = match.group(1) if match else seat['seat_number']
+        if not rows or rows[-1]['row'] != row:
+            rows.append({'row': row, 'seats': []})
+        rows[-1]['seats'].append(seat)
+    for row in rows:
+        row['aisle_after'] = len(row['seats']) // 2
+    return rows
+
+
+def _build_seat_map(inventory):
+    holds = _active_holds(inventory)
+    seats = []
+    for position, seat in enumerate(inventory.seats):
+        hold = holds.get(str(seat['id']))
+        if not inventory.is_free(position):
+            state, held_by = 'occupied', None
+        elif hold is not None:
+            state, held_by = 'held', hold['user_id']
+        else:
+            state, held_by = 'available', None
+        seats.append(dict(seat, state=state, held_by=held_by))
+    return {
+        'rows': _layout_rows(seats),
+        # The payload goes stale when the first hold in it expires
+        'valid_until': min((hold['expires_at'] for hold in holds.values()), default=None),
+    }
+
+
+def _cached_seat_map(schedule_id):
+    payload = cache.get(_seat_map_key(schedule_id))
+    if payload is None or (payload['valid_until'] and payload['valid_until'] <= time.time()):
+        return None
+    return payload
+
+
+def _cache_seat_map(schedule_id, payload):
+    timeout = SEAT_MAP_CACHE_TIMEOUT
+    if payload['valid_until']:
+        timeout = min(timeout, max(int(payload['valid_until'] - time.time()) + 1, 1))
+    cache.set(_seat_map_key(schedule_id), payload, timeout)
+
+
+def seat_map_payload(schedule):
+    """Precomputed seat layout and availability for a schedule, served from the cache."""
+    payload = _cached_seat_map(schedule.pk)
+    if payload is None:
+        inventory = repository.load_inventory(schedule.pk) if native_reads_enabled() else None
+        if inventory is None:
+            inventory = get_inventory(schedule)
+        payload = _build_seat_map(inventory)
+        _cache_seat_map(schedule.pk, payload)
+    return payload
+
+
+async def aseat_map_payload(schedule_id):
+    """seat_map_payload() for async views, reading the inventory with the async client."""
+    # The cache API is synchronous, so it is called off the event loop
+    payload = await sync_to_async(_cached_seat_map, thread_sensitive=True)(schedule_id)
+    if payload is None:
+        inventory = await repository.aload_inventory(schedule_id)
+        if inventory is None:
+            # First view of this schedule: create the inventory through the ORM
+            inventory = await sync_to_async(
+                lambda: get_inventory(Schedule.objects.get(pk=schedule_id)), thread_sensitive=True
+            )()
+        payload = _build_seat_map(inventory)
+        await sync_to_async(_cache_seat_map, thread_sensitive=True)(schedule_id, payload)
+    return payload
+
+
+def seat_rows(payload, user=None):
+    """The seat rows of a seat map payload with availability as seen by `user`."""
+    user_id = user.id if user is not None else None
+    rows = []
+    for row in payload['rows']:
+        seats = []
+        for seat in row['seats']:
+            # A user's own holds are still selectable for them
+            is_held = seat['state'] == 'held' and seat['held_by'] != user_id
+            is_available = seat['state'] == 'available' or (seat['state'] == 'held' and not is_held)
+            seats.append({
+                'id': seat['id'],
+                'seat_number': seat['seat_number'],
+                'seat_type': seat['seat_type'],
+                'is_available': is_available,
+                'is_held': is_held,
+            })
+        rows.append({'row': row['row'], 'aisle_after': row['aisle_after'], 'seats': seats})
+    return rows
+
+
+def seat_map(schedule, user=None):
+    """Return the seat rows of a schedule with availability as seen by `user`."""
+    return seat_rows(seat_map_payload(schedule), user=user)
+
+
+def availability(schedule_id, rows, valid_until=None):
+    """JSON-ready availability summary built from seat_rows()."""
+    seats = [seat for row in rows for seat in row['seats']]
+    return {
+        'schedule_id': schedule_id,
+        'available': sum(seat['is_available'] for seat in seats),
+        'held': sum(seat['is_held'] for seat in seats),
+        'total': len(seats),
+        'valid_until': valid_until,
+        'seats': seats,
+    }
+
+
+def _update(schedule, seat_ids, apply):
+    """
+    Read-modify-write the schedule's inventory with optimistic concurrency.
+
+    `apply(inventory, index, states, holds)` mutates `states` and `holds` in place
+    and raises SeatUnavailableError to abort without writing. When it returns
+    False nothing changed: the write, the version bump and the seat map
+    invalidation are skipped.
+    """
+    seat_ids = [int(seat_id) for seat_id in seat_ids]
+    for _ in range(MAX_WRITE_ATTEMPTS):
+        inventory = get_inventory(schedule)
+        index = inventory.seat_index()
+
+        unknown = [seat_id for seat_id in seat_ids if seat_id not in index]
+        if unknown:
+            raise SeatUnavailableError(unknown)
+
+        states = list(inventory.seat_states)
+        holds = _active_holds(inventory)
+        if apply(inventory, index, states, holds) is False:
+            return seat_ids
+
+        # Conditional write: only succeeds if nobody changed the inventory since we read it
+        updated = SeatInventory.objects.filter(
+            pk=inventory.pk,
+            version=inventory.version
+        ).update(seat_states=''.join(states), holds=holds, version=inventory.version + 1)
+        if updated:
+            cache.delete(_seat_map_key(schedule.pk))
+            return seat_ids
+
+    raise SeatUnavailableError(seat_ids)
+
+
+def hold_seats(schedule, seat_ids, user, ttl=SEAT_HOLD_TTL):
+    """
+    Reserve free seats for `user` for `ttl` seconds, replacing any earlier hold
+    they had. At most MAX_GROUP_SIZE seats can be held at once.
+    """
+    seat_ids = [int(seat_id) for seat_id in seat_ids]
+    if len(set(seat_ids)) > MAX_GROUP_SIZE:
+        raise SeatLimitError(f'At most {MAX_GROUP_SIZE} seats can be held at once.')
+    expires_at = time.time() + ttl
+
+    def apply(inventory, index, states, holds):
+        conflicts = [
+            seat_id for seat_id in seat_ids
+            if states[index[seat_id]] != SeatInventory.SEAT_FREE
+            or _held_by_other(holds, seat_id, user.id)
+        ]
+        if conflicts:
+            raise SeatUnavailableError(conflicts)
+        for key in [key for key, hold in holds.items() if hold['user_id'] == user.id]:
+            del holds[key]
+        for seat_id in seat_ids:
+            holds[str(seat_id)] = {'user_id': user.id, 'expires_at': expires_at}
+
+    _update(schedule, seat_ids, apply)
+    return expires_at
+
+
+def auto_hold_seats(schedule, count, user, preference='any', together=True, ttl=SEAT_HOLD_TTL):
+    """
+    Choose `count` seats with allocation.allocate() and hold them for `user`
+    in the same conditional write, replacing any earlier hold they had.
+    Returns (seat ids, hold expiry); raises AllocationError if they do not fit.
+    """
+    expires_at = time.time() + ttl
+    chosen = []
+
+    def apply(inventory, index, states, holds):
+        # The user's own holds are given up, so those seats count as free
+        for key in [key for key, hold in holds.items() if hold['user_id'] == user.id]:
+            del holds[key]
+        free = [
+            states[position] == SeatInventory.SEAT_FREE and str(seat['id']) not in holds
+            for position, seat in enumerate(inventory.seats)
+        ]
+        # Recomputed on every attempt, so a lost race just picks again
+        chosen[:] = [inventory.seats[position]['id'] for position in allocate(
+            inventory.seats, free, count, preference=preference, together=together
+        )]
+        for seat_id in chosen:
+            holds[str(seat_id)] = {'user_id': user.id, 'expires_at': expires_at}
+
+    _update(schedule, [], apply)
+    return list(chosen), expires_at
+
+
+def user_holds(schedule, user):
+    """`user`'s active holds on this schedule, by seat id."""
+    return {
+        seat_id: hold for seat_id, hold in _active_holds(get_inventory(schedule)).items()
+        if hold['user_id'] == user.id
+    }
+
+
+def held_seat_ids(schedule, user):
+    """Ids of the seats `user` actively holds on this schedule."""
+    return {int(seat_id) for seat_id in user_holds(schedule, user)}
+
+
+def set_hold_price(schedule, user, price):
+    """
+    Record `price` (in cents) on `user`'s active holds unless they already
+    carry one. Returns the price the holds carry, or None if there are none.
+    """
+    recorded = []
+
+    def apply(inventory, index, states, holds):
+        mine = [hold for hold in holds.values() if hold['user_id'] == user.id]
+        current = next((hold['price'] for hold in mine if 'price' in hold), price)
+        recorded[:] = [current] if mine else []
+        if all(hold.get('price') == current for hold in mine):
+            return False
+        for hold in mine:
+            hold['price'] = current
+
+    _update(schedule, [], apply)
+    return recorded[0] if recorded else None
+
+
+def release_holds(schedule, user):
+    """Drop every hold `user` has on this schedule."""
+    def apply(inventory, index, states, holds):
+        mine = [key for key, hold in holds.items() if hold['user_id'] == user.id]
+        if not mine:
+            return False
+        for key in mine:
+            del holds[key]
+
+    _update(schedule, [], apply)
+
+
+def claim_seats(schedule, seat_ids, user=None):
+    """Mark seats as booked on this schedule, all or nothing."""
+    seat_ids = [int(seat_id) for seat_id in seat_ids]
+    user_id = user.id if user is not None else None
+
+    def apply(inventory, index, states, holds):
+        conflicts = [
+            seat_id for seat_id in seat_ids
+            if states[index[seat_id]] != SeatInventory.SEAT_FREE
+            or _held_by_other(holds, seat_id, user_id)
+        ]
+        if conflicts:
+            raise SeatUnavailableError(conflicts)
+        for seat_id in seat_ids:
+            states[index[seat_id]] = SeatInventory.SEAT_BOOKED
+            holds.pop(str(seat_id), None)
+
+    return _update(schedule, seat_ids, apply)
+
+
+def release_seats(schedule, seat_ids):
+    """
+    Mark previously booked seats on this schedule as free again. Seats that
+    are not booked are left alone; returns the ids that were released.
+    """
+    released = []
+
+    def apply(inventory, index, states, holds):
+        released[:] = [
+            int(seat_id) for seat_id in seat_ids
+            if states[index[int(seat_id)]] == SeatInventory.SEAT_BOOKED
+        ]
+        if not released:
+            return False
+        for seat_id in released:
+            states[index[seat_id]] = SeatInventory.SEAT_FREE
+
+    _update(schedule, seat_ids, apply)
+    return list(released)
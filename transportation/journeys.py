@@ -0,0 +1,313 @@
+"""
+Multi-leg journey planning across routes.
+
+Each process keeps an in-memory timetable graph: one "connection" per
+scheduled departure (origin city, destination city, departure and arrival
+minute, price), grouped by departure date and sorted by departure. A date's
+connections are reloaded only when its search-cache version changes (every
+schedule save and booking bumps it), and all of them when routes change, so
+the graph follows the database incrementally.
+
+Queries run on that graph without touching the database:
+
+- fastest journeys use the Connection Scan Algorithm: one pass over the
+  connections in departure order, relaxing arrival times per city;
+- the cheapest journey uses a label-setting (Dijkstra) search ordered by
+  price, pruning labels that arrive later than an already settled one.
+
+Changing vehicles requires MIN_CONNECTION_MINUTES for the transport types on
+both sides of the transfer. A query stops at JOURNEY_SEARCH_BUDGET_MS and
+returns what it found so far, marked incomplete.
+"""
+from django.conf import settings
+from django.utils import timezone
+from ticket_reservation_system.money import from_cents, to_cents
+from .models import Route, Schedule
+from .search_cache import date_version, routes_version
+from .search_index import normalize
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+import bisect
+import heapq
+import itertools
+import threading
+import time
+
+JOURNEY_SEARCH_BUDGET_MS = getattr(settings, 'JOURNEY_SEARCH_BUDGET_MS', 200)
+JOURNEY_MAX_LEGS = getattr(settings, 'JOURNEY_MAX_LEGS', 3)
+MIN_CONNECTION_MINUTES = getattr(settings, 'MIN_CONNECTION_MINUTES', {'Bus': 15, 'Train': 10, 'Flight': 60})
+DEFAULT_CONNECTION_MINUTES = 20
+
+# A date whose version changed is reloaded at most this often; seat counts
+# are re-checked when booking, so a few seconds of staleness is harmless.
+JOURNEY_REFRESH_INTERVAL = 5  # seconds
+MAX_LOADED_DAYS = 120
+
+# Journeys start on the requested date and may finish the day after
+JOURNEY_DAYS = 2
+
+MINUTES_PER_DAY = 24 * 60
+
+# Minutes are counted from date.min so they compare across days
+Connection = namedtuple(
+    'Connection', 'departure arrival origin destination schedule_id price transport_type'
+)
+
+
+def _minutes(day, at):
+    return day.toordinal() * MINUTES_PER_DAY + at.hour * 60 + at.minute
+
+
+def _datetime(minutes):
+    day, minute = divmod(minutes, MINUTES_PER_DAY)
+    return datetime.fromordinal(day) + timedelta(minutes=minute)
+
+
+def _transfer_minutes(arriving, departing):
+    return max(
+        MIN_CONNECTION_MINUTES.get(arriving.transport_type, DEFAULT_CONNECTION_MINUTES),
+        MIN_CONNECTION_MINUTES.get(departing.transport_type, DEFAULT_CONNECTION_MINUTES),
+    )
+
+
+class JourneyGraph:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes_version = None
+        self.routes = {}  # route id -> (origin key, destination key, transport type)
+        self.cities = {}  # normalized city -> display name
+        self.days = {}  # date -> (version, loaded at, connections)
+
+    def _load_routes(self):
+        self.routes = {}
+        self.cities = {}
+        for route_id, origin, destination, type_name in Route.objects.filter(
+            is_active=True
+        ).values_list('id', 'origin', 'destination', 'transportation_type__name'):
+            origin_key, destination_key = normalize(origin), normalize(destination)
+            self.cities.setdefault(origin_key, origin)
+            self.cities.setdefault(destination_key, destination)
+            self.routes[route_id] = (origin_key, destination_key, type_name)
+
+    def _load_day(self, day):
+        connections = []
+        for schedule_id, route_id, departure_time, arrival_time, price in Schedule.objects.filter(
+            departure_date=day, status='scheduled', available_seats__gt=0,
+        ).values_list('id', 'route_id', 'departure_time', 'arrival_time', 'price'):
+            route = self.routes.get(route_id)
+            if route is None:
+                continue
+            departure = _minutes(day, departure_time)
+            arrival = _minutes(day, arrival_time)
+            if arrival <= departure:
+                arrival += MINUTES_PER_DAY  # arrives after midnight
+            connections.append(Connection(
+                departure, arrival, route[0], route[1], schedule_id, to_cents(price), route[2]
+            ))
+        connections.sort()
+        return tuple(connections)
+
+    def snapshot(self, dates):
+        """Connections departing on `dates`, in departure order, and the city names; reloads what changed."""
+        with self.lock:
+            version = routes_version()
+            if version != self.routes_version:
+                self._load_routes()
+                self.routes_version = version
+                self.days = {}
+
+            now = time.monotonic()
+            connections = []
+            for day in dates:
+                # Read the version before loading, so a change made during the load triggers another one
+                version = date_version(day)
+                loaded = self.days.pop(day, None)
+                if loaded is None or (loaded[0] != version and now - loaded[1] >= JOURNEY_REFRESH_INTERVAL):
+                    loaded = (version, now, self._load_day(day))
+                # Re-inserted last, so the dict stays in least recently used order
+                self.days[day] = loaded
+                connections.extend(loaded[2])
+
+            while len(self.days) > MAX_LOADED_DAYS:
+                del self.days[next(iter(self.days))]
+            return connections, self.cities
+
+
+_graph = JourneyGraph()
+
+
+def matching_cities(cities, query):
+    """Normalized cities matching `query`, with the same word-prefix rules as the route search."""
+    name = normalize(query)
+    if name in cities:
+        return {name}
+    words = name.split()
+    if not words:
+        return set()
+    return {
+        city for city in cities
+        if all(any(part.startswith(word) for part in city.split()) for word in words)
+    }
+
+
+def _legs(label):
+    legs = []
+    while label is not None:
+        legs.append(label[0])
+        label = label[1]
+    return legs[::-1]
+
+
+def earliest_arrival(connections, sources, targets, start, last_departure, deadline):
+    """
+    Connection scan: the journey reaching `targets` first, leaving a source
+    city between `start` and `last_departure`. Returns (legs or None, complete).
+    """
+    arrival = {}  # city -> (minute, label) of the earliest way found there
+    best = None
+    for position in range(bisect.bisect_left(connections, (start,)), len(connections)):
+        connection = connections[position]
+        if best is not None and connection.departure >= best[0]:
+            break
+        if position & 255 == 0 and time.monotonic() > deadline:
+            return (_legs(best[1]) if best else None), False
+        if connection.destination in sources:
+            continue
+
+        if connection.origin in sources:
+            if connection.departure > last_departure:
+                continue
+            label = (connection, None, 1)
+        else:
+            reached = arrival.get(connection.origin)
+            if reached is None:
+                continue
+            previous = reached[1]
+            if previous[2] >= JOURNEY_MAX_LEGS:
+                continue
+            if connection.departure < reached[0] + _transfer_minutes(previous[0], connection):
+                continue
+            label = (connection, previous, previous[2] + 1)
+
+        current = arrival.get(connection.destination)
+        if current is None or connection.arrival < current[0]:
+            arrival[connection.destination] = (connection.arrival, label)
+            if connection.destination in targets and (best is None or connection.arrival < best[0]):
+                best = (connection.arrival, label)
+    return (_legs(best[1]) if best else None), True
+
+
+def cheapest(connections, sources, targets, start, last_departure, deadline):
+    """
+    Label-setting search by total price, ties broken by earlier arrival.
+    Returns (legs or None, complete).
+    """
+    outgoing = defaultdict(list)
+    for connection in connections[bisect.bisect_left(connections, (start,)):]:
+        outgoing[connection.origin].append(connection)
+    departures = {city: [connection.departure for connection in leaving] for city, leaving in outgoing.items()}
+    shortest_transfer = min(MIN_CONNECTION_MINUTES.values(), default=DEFAULT_CONNECTION_MINUTES)
+
+    heap = []
+    counter = itertools.count()
+    for city in sources:
+        for connection in outgoing.get(city, ()):
+            if connection.departure > last_departure:
+                break
+            if connection.destination not in sources:
+                heapq.heappush(heap, (connection.price, connection.arrival, next(counter), (connection, None, 1)))
+
+    settled = defaultdict(list)  # city -> arrival minutes of labels already expanded there
+    pops = 0
+    while heap:
+        pops += 1
+        if pops & 255 == 0 and time.monotonic() > deadline:
+            return None, False
+        cost, arrival, _, label = heapq.heappop(heap)
+        city = label[0].destination
+        # A cheaper (or equal) label already got here no later
+        if any(at <= arrival for at in settled[city]):
+            continue
+        settled[city].append(arrival)
+        if city in targets:
+            return _legs(label), True
+        if label[2] >= JOURNEY_MAX_LEGS or city not in outgoing:
+            continue
+
+        leaving = outgoing[city]
+        for index in range(bisect.bisect_left(departures[city], arrival + shortest_transfer), len(leaving)):
+            connection = leaving[index]
+            if connection.departure < arrival + _transfer_minutes(label[0], connection):
+                continue
+            if connection.destination in sources:
+                continue
+            if any(at <= connection.arrival for at in settled[connection.destination]):
+                continue
+            heapq.heappush(heap, (
+                cost + connection.price, connection.arrival, next(counter), (connection, label, label[2] + 1)
+            ))
+    return None, True
+
+
+def _journey(legs, cities):
+    return {
+        'legs': [{
+            'schedule_id': leg.schedule_id,
+            'origin': cities.get(leg.origin, leg.origin),
+            'destination': cities.get(leg.destination, leg.destination),
+            'departure': _datetime(leg.departure),
+            'arrival': _datetime(leg.arrival),
+            'price': from_cents(leg.price),
+            'transport_type': leg.transport_type,
+        } for leg in legs],
+        'departure': _datetime(legs[0].departure),
+        'arrival': _datetime(legs[-1].arrival),
+        'duration': timedelta(minutes=legs[-1].arrival - legs[0].departure),
+        'price': from_cents(sum(leg.price for leg in legs)),
+        'transfers': len(legs) - 1,
+        'is_cheapest': False,
+    }
+
+
+def plan(origin, destination, departure_date=None, limit=3):
+    """
+    Journeys from `origin` to `destination` leaving on `departure_date`
+    (default today, from now on): up to `limit` fastest options by departure
+    time and the cheapest one. Direct departures are included.
+    """
+    deadline = time.monotonic() + JOURNEY_SEARCH_BUDGET_MS / 1000
+    now = timezone.localtime()
+    departure_date = departure_date or now.date()
+    result = {'fastest': [], 'cheapest': None, 'cheapest_listed': False, 'complete': True}
+    if departure_date < now.date():
+        return result
+
+    connections, cities = _graph.snapshot([departure_date + timedelta(days=offset) for offset in range(JOURNEY_DAYS)])
+    sources = matching_cities(cities, origin)
+    targets = matching_cities(cities, destination) - sources
+    if not sources or not targets:
+        return result
+
+    first_departure = _minutes(departure_date, now.time() if departure_date == now.date() else datetime.min.time())
+    last_departure = _minutes(departure_date, datetime.max.time())
+
+    start = first_departure
+    while len(result['fastest']) < limit:
+        legs, complete = earliest_arrival(connections, sources, targets, start, last_departure, deadline)
+        if legs:
+            result['fastest'].append(_journey(legs, cities))
+        if not legs or not complete:
+            result['complete'] = complete
+            break
+        # The next option leaves after this one
+        start = legs[0].departure + 1
+
+    if result['fastest'] and result['complete']:
+        legs, result['complete'] = cheapest(connections, sources, targets, first_departure, last_departure, deadline)
+        if legs:
+            result['cheapest'] = dict(_journey(legs, cities), is_cheapest=True)
+            schedule_ids = [leg.schedule_id for leg in legs]
+            for journey in result['fastest']:
+                journey['is_cheapest'] = [leg['schedule_id'] for leg in journey['legs']] == schedule_ids
+                result['cheapest_listed'] = result['cheapest_listed'] or journey['is_cheapest']
+    return result
@@ -0,0 +1,27 @@
+def seat_layout(transport_type_name, capacity):
+    """Seat numbers and types for a vehicle: [('1A', 'window'), ('1B', 'aisle'), ...]"""
+    if transport_type_name == 'Flight':
+        # Flight layout: 3+3 seating
+        seats_per_row = 6
+        seat_types = {1: 'window', 2: 'middle', 3: 'aisle', 4: 'aisle', 5: 'middle', 6: 'window'}
+    elif transport_type_name in ('Bus', 'Train'):
+        # Bus and train layout: 2+2 seating
+        seats_per_row = 4
+        seat_types = {1: 'window', 2: 'aisle', 3: 'aisle', 4: 'window'}
+    else:
+        return []
+
+    rows = capacity // seats_per_row
+    return [
+        (f"{row}{chr(64 + seat_pos)}", seat_types[seat_pos])  # 1A, 1B, 1C, 1D
+        for row in range(1, rows + 1)
+        for seat_pos in range(1, seats_per_row + 1)
+    ]
+
+
+def seat_position(seat_number):
+    """Row number and zero-based column of a seat number from seat_layout(): '12C' -> (12, 2)."""
+    row, letter = seat_number[:-1], seat_number[-1:]
+    if not row.isdigit() or not 'A' <= letter <= 'Z':
+        return None
+    return int(row), ord(letter) - ord('A')
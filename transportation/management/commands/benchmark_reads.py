@@ -0,0 +1,125 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.utils import timezone
+from ticket_reservation_system.pagination import paginate_keyset
+from transportation.models import Schedule, SeatInventory
+from transportation.views import SearchView
+from transportation import repository
+from bookings.models import Booking
+from bookings.views import MyBookingsView
+from bookings import repository as booking_repository
+import json
+import statistics
+import time
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Compare read latency of the ORM (djongo) path and the native pymongo path for the hot pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Timed runs per query and path')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed runs before measuring')
+        parser.add_argument('--schedule', type=int, default=None,
+                            help='Schedule to search for and read the seat map of (default: next departure)')
+        parser.add_argument('--booking', default=None,
+                            help='booking_id to read (default: most recent booking); its owner is used for My Bookings')
+        parser.add_argument('--output', default=None, help='Optionally write the results as JSON')
+
+    def handle(self, *args, **options):
+        schedules = Schedule.objects.select_related('route')
+        if options['schedule']:
+            schedule = schedules.filter(id=options['schedule']).first()
+        else:
+            schedule = schedules.filter(
+                status='scheduled', departure_date__gte=timezone.now().date()
+            ).order_by('departure_date', 'departure_time').first()
+        if schedule is None:
+            raise CommandError('No schedule to benchmark. Run populate_data first.')
+
+        bookings = Booking.objects.all()
+        if options['booking']:
+            bookings = bookings.filter(booking_id=options['booking'])
+        booking = bookings.order_by('-created_at').first()
+
+        params = {
+            'origin': schedule.route.origin,
+            'destination': schedule.route.destination,
+            'departure_date': schedule.departure_date.isoformat(),
+        }
+        search_view = SearchView()
+        search_view.request = RequestFactory().get('/', params)
+        page_size = SearchView.paginate_by
+
+        cases = [
+            ('search', lambda: paginate_keyset(
+                search_view.get_queryset(), SearchView.keyset_ordering, page_size
+            ).object_list, lambda: repository.search_schedules(page_size=page_size, **params).object_list),
+            ('seat_map', lambda: SeatInventory.objects.get(schedule_id=schedule.id),
+             lambda: repository.load_inventory(schedule.id)),
+        ]
+
+        if booking is not None:
+            bookings_view = MyBookingsView()
+            bookings_view.request = RequestFactory().get('/')
+            bookings_view.request.user = booking.user
+            cases += [
+                ('my_bookings', lambda: paginate_keyset(
+                    bookings_view.get_queryset(), MyBookingsView.keyset_ordering, MyBookingsView.paginate_by
+                ).object_list, lambda: booking_repository.user_bookings(
+                    booking.user_id, MyBookingsView.paginate_by
+                ).object_list),
+                ('booking_detail', lambda: Booking.objects.select_related('schedule__route', 'payment')
+                 .prefetch_related('booked_seats__seat').get(user_id=booking.user_id, booking_id=booking.booking_id),
+                 lambda: booking_repository.booking_detail(booking.user_id, booking.booking_id)),
+            ]
+        else:
+            self.stdout.write(self.style.WARNING('No bookings found; skipping the booking queries.'))
+
+        self.check_results(cases)
+
+        results = {}
+        for name, orm, native in cases:
+            results[name] = {
+                'orm': self.measure(orm, options),
+                'native': self.measure(native, options),
+            }
+            orm_ms, native_ms = results[name]['orm']['p50_ms'], results[name]['native']['p50_ms']
+            results[name]['speedup_p50'] = round(orm_ms / native_ms, 2) if native_ms else None
+            self.stdout.write(
+                f"{name:15} orm p50 {orm_ms:8.2f} ms  p95 {results[name]['orm']['p95_ms']:8.2f} ms | "
+                f"native p50 {native_ms:8.2f} ms  p95 {results[name]['native']['p95_ms']:8.2f} ms | "
+                f"x{results[name]['speedup_p50']}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'iterations': options['iterations'], 'results': results}, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def check_results(self, cases):
+        """Both paths must return the same rows, or the comparison is meaningless."""
+        for name, orm, native in cases:
+            if name in ('search', 'my_bookings'):
+                orm_ids = [row.id for row in orm()]
+                native_ids = [row['id'] for row in native()]
+                if orm_ids != native_ids:
+                    raise CommandError(f'{name}: ORM returned {orm_ids} but the native query returned {native_ids}')
+
+    def measure(self, query, options):
+        for _ in range(options['warmup']):
+            query()
+        timings = []
+        for _ in range(options['iterations']):
+            started = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - started) * 1000)
+        return {
+            'mean_ms': round(statistics.mean(timings), 3),
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+        }
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from transportation.recurring import SCHEDULE_HORIZON_DAYS, materialize
+from datetime import date
+import time
+
+
+class Command(BaseCommand):
+    help = 'Create the departures of recurring schedule templates for a rolling window; safe to re-run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=SCHEDULE_HORIZON_DAYS, help='Length of the window in days')
+        parser.add_argument('--start', help='First day of the window (YYYY-MM-DD); default: today')
+        parser.add_argument('--template', type=int, action='append', dest='templates',
+                            help='Only materialize this template id; may be repeated')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Templates checked per round trip')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        try:
+            start_date = date.fromisoformat(options['start']) if options['start'] else None
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        started = time.monotonic()
+        created = materialize(
+            start_date=start_date,
+            horizon_days=options['days'],
+            template_ids=options['templates'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{created} schedules created in {time.monotonic() - started:.1f}s.'
+        ))
@@ -1,12 +1,29 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import datetime, timedelta, time
-from transportation.models import TransportationType, Route, Vehicle, Schedule, Seat
+from transportation.models import TransportationType, Route, Vehicle, ScheduleTemplate, Seat
+from transportation.layout import seat_layout
+from transportation import synthetic
+from transportation.recurring import materialize
 from decimal import Decimal
+import time as time_module
 
 class Command(BaseCommand):
     help = 'Populate database with sample transportation data'
 
+    def add_arguments(self, parser):
+        # Synthetic load-test data on top of the sample data
+        parser.add_argument('--routes', type=int, default=0, help='Number of synthetic routes to generate')
+        parser.add_argument('--vehicles', type=int, default=0, help='Number of synthetic vehicles to generate')
+        parser.add_argument('--days', type=int, default=7, help='Days of synthetic departures, starting today')
+        parser.add_argument('--departures-per-route', type=int, default=2)
+        parser.add_argument('--booking-density', type=float, default=0.0,
+                            help='Fraction of seats (0-1) to mark as sold on synthetic departures')
+        parser.add_argument('--seed', type=int, default=42, help='Same seed and arguments reproduce the same dataset')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes for generating days in parallel')
+        parser.add_argument('--reset', action='store_true', help='Delete existing synthetic data first')
+
     def handle(self, *args, **options):
         self.stdout.write('Creating sample data...')
         
@@ -88,7 +105,7 @@ class Command(BaseCommand):
         
         self.stdout.write('Seats created.')
         
-        # Create schedules for the next 7 days
+        # Sample departures run daily from recurring templates
         today = timezone.now().date()
         
         schedule_data = [
@@ -102,91 +119,53 @@ class Command(BaseCommand):
             (routes[6], vehicles[6], time(13, 0), time(16, 0), Decimal('280.00')), # Chicago-Miami Flight
         ]
         
-        for i in range(7):  # Next 7 days
-            schedule_date = today + timedelta(days=i)
-            
-            for route, vehicle, dep_time, arr_time, price in schedule_data:
-                Schedule.objects.get_or_create(
-                    route=route,
-                    vehicle=vehicle,
-                    departure_date=schedule_date,
-                    departure_time=dep_time,
-                    defaults={
-                        'arrival_time': arr_time,
-                        'price': price,
-                        'available_seats': vehicle.capacity,
-                        'status': 'scheduled'
-                    }
-                )
+        templates = []
+        for route, vehicle, dep_time, arr_time, price in schedule_data:
+            template, _ = ScheduleTemplate.objects.get_or_create(
+                route=route,
+                vehicle=vehicle,
+                departure_time=dep_time,
+                defaults={
+                    'arrival_time': arr_time,
+                    'valid_from': today,
+                    'price': price,
+                }
+            )
+            templates.append(template.id)
+        
+        # Departures that already exist for the week are skipped
+        materialize(start_date=today, horizon_days=7, template_ids=templates)
         
         self.stdout.write('Schedules created.')
         self.stdout.write(self.style.SUCCESS('Sample data populated successfully!'))
+
+        if options['routes'] or options['vehicles']:
+            self.populate_synthetic(options, [bus_type, train_type, flight_type], today)
+
+    def populate_synthetic(self, options, types, start_date):
+        started = time_module.monotonic()
+        transport_types = {transport_type.name: transport_type for transport_type in types}
+
+        if options['reset']:
+            synthetic.delete_synthetic_data()
+            self.stdout.write('Existing synthetic data deleted.')
+
+        routes = synthetic.create_routes(options['routes'], transport_types, options['seed'])
+        self.stdout.write(f'{routes} synthetic routes created.')
+
+        vehicles, seats = synthetic.create_vehicles(
+            options['vehicles'], transport_types, options['seed'], options['chunk_size']
+        )
+        self.stdout.write(f'{vehicles} synthetic vehicles with {seats} seats created.')
+
+        schedules = synthetic.generate_schedules(start_date, options, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'{schedules} synthetic schedules created in {time_module.monotonic() - started:.1f}s.'
+        ))
     
     def create_seats_for_vehicle(self, vehicle):
         """Create seats for a vehicle based on its type and capacity"""
-        if vehicle.transportation_type.name == 'Bus':
-            # Bus layout: 2+2 seating
-            seats_per_row = 4
-            rows = vehicle.capacity // seats_per_row
-            
-            for row in range(1, rows + 1):
-                for seat_pos in range(1, seats_per_row + 1):
-                    seat_number = f"{row}{chr(64 + seat_pos)}"  # 1A, 1B, 1C, 1D
-                    
-                    if seat_pos in [1, 4]:  # Window seats
-                        seat_type = 'window'
-                    elif seat_pos in [2, 3]:  # Aisle seats
-                        seat_type = 'aisle'
-                    else:
-                        seat_type = 'middle'
-                    
-                    Seat.objects.create(
-                        vehicle=vehicle,
-                        seat_number=seat_number,
-                        seat_type=seat_type,
-                        is_available=True
-                    )
-        
-        elif vehicle.transportation_type.name == 'Train':
-            # Train layout: 2+2 seating
-            seats_per_row = 4
-            rows = vehicle.capacity // seats_per_row
-            
-            for row in range(1, rows + 1):
-                for seat_pos in range(1, seats_per_row + 1):
-                    seat_number = f"{row}{chr(64 + seat_pos)}"
-                    
-                    if seat_pos in [1, 4]:
-                        seat_type = 'window'
-                    else:
-                        seat_type = 'aisle'
-                    
-                    Seat.objects.create(
-                        vehicle=vehicle,
-                        seat_number=seat_number,
-                        seat_type=seat_type,
-                        is_available=True
-                    )
-        
-        elif vehicle.transportation_type.name == 'Flight':
-            # Flight layout: 3+3 seating
-            seats_per_row = 6
-            rows = vehicle.capacity // seats_per_row
-            
-            for row in range(1, rows + 1):
-                for seat_pos in range(1, seats_per_row + 1):
-                    seat_number = f"{row}{chr(64 + seat_pos)}"
-                    
-                    if seat_pos in [1, 6]:  # Window seats
-                        seat_type = 'window'
-                    elif seat_pos in [3, 4]:  # Aisle seats
-                        seat_type = 'aisle'
-                    else:  # Middle seats
-                        seat_type = 'middle'
-                    
-                    Seat.objects.create(
-                        vehicle=vehicle,
-                        seat_number=seat_number,
-                        seat_type=seat_type,
-                        is_available=True
-                    )
+        Seat.objects.bulk_create([
+            Seat(vehicle=vehicle, seat_number=seat_number, seat_type=seat_type)
+            for seat_number, seat_type in seat_layout(vehicle.transportation_type.name, vehicle.capacity)
+        ])
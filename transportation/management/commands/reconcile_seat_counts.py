@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from transportation.models import Schedule, Seat, SeatInventory
+from transportation.search_cache import bump_date_version
+from bookings.models import BookingSeat
+from bookings.services import ACTIVE_STATUSES
+
+class Command(BaseCommand):
+    help = 'Recompute Schedule.available_seats from seat inventories and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        # Seats sold per schedule according to bookings, counted in one grouped aggregation
+        sold = dict(
+            BookingSeat.objects.filter(booking__status__in=ACTIVE_STATUSES)
+            .values('booking__schedule_id')
+            .annotate(sold=Count('id'))
+            .values_list('booking__schedule_id', 'sold')
+        )
+
+        # The inventory is the source of truth for taken seats; bookings only cross-check it
+        free = {}
+        mismatched = 0
+        for schedule_id, seat_states in SeatInventory.objects.values_list('schedule_id', 'seat_states').iterator():
+            free[schedule_id] = seat_states.count(SeatInventory.SEAT_FREE)
+            booked = len(seat_states) - free[schedule_id]
+            if booked != sold.get(schedule_id, 0):
+                mismatched += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(self.style.WARNING(
+                        f'Schedule {schedule_id}: {booked} seats booked in the inventory, '
+                        f'{sold.get(schedule_id, 0)} in active bookings'
+                    ))
+
+        # Inventories are built from the vehicle's seats, so count those rather than trusting capacity
+        seat_counts = dict(
+            Seat.objects.values('vehicle_id').annotate(seats=Count('id')).values_list('vehicle_id', 'seats')
+        )
+
+        drifted = 0
+        fixed = 0
+        checked = 0
+        dates = set()
+        for schedule_id, vehicle_id, available_seats, departure_date in Schedule.objects.values_list(
+            'id', 'vehicle_id', 'available_seats', 'departure_date'
+        ).iterator():
+            checked += 1
+            if schedule_id in free:
+                expected = free[schedule_id]
+            else:
+                # No inventory yet: it will be built from the same seats and bookings
+                expected = max(seat_counts.get(vehicle_id, 0) - sold.get(schedule_id, 0), 0)
+            if available_seats == expected:
+                continue
+            drifted += 1
+            self.stdout.write(f'Schedule {schedule_id}: available_seats {available_seats}, expected {expected}')
+            if options['dry_run']:
+                continue
+            # Conditional on the value read, so a booking or cancellation that moved the
+            # counter since then is not overwritten; the next run checks that row again
+            if Schedule.objects.filter(pk=schedule_id, available_seats=available_seats).update(available_seats=expected):
+                fixed += 1
+                dates.add(departure_date)
+
+        for departure_date in dates:
+            bump_date_version(departure_date)
+
+        if options['dry_run']:
+            summary = f'Checked {checked} schedules, found {drifted} with drifted seat counts.'
+        else:
+            summary = f'Checked {checked} schedules, fixed {fixed} of {drifted} with drifted seat counts.'
+        self.stdout.write(self.style.SUCCESS(summary))
+        if mismatched:
+            # Not fixed here: synthetic data, for one, sells seats in the inventory without booking rows
+            self.stdout.write(self.style.WARNING(
+                f'{mismatched} inventories disagree with their active bookings (run with -v 2 to list them).'
+            ))
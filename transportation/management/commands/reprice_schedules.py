@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from transportation import pricing
+import time
+
+
+class Command(BaseCommand):
+    help = 'Recompute dynamic fares for every upcoming departure'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=pricing.PRICING_BATCH_SIZE,
+                            help='Departures priced and written per round trip')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        priced, changed = pricing.reprice(batch_size=options['batch_size'])
+        engine = 'NumPy' if pricing.np is not None else 'pure Python'
+        self.stdout.write(self.style.SUCCESS(
+            f'{priced} departures priced ({changed} fares changed) with {engine} in {time.monotonic() - started:.1f}s.'
+        ))
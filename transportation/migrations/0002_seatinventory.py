@@ -0,0 +1,26 @@
+# Generated by Django 3.1.12 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import djongo.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatInventory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seats', djongo.models.fields.JSONField(default=list)),
+                ('seat_states', models.TextField(default='')),
+                ('version', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('schedule', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='seat_inventory', to='transportation.schedule')),
+            ],
+        ),
+    ]
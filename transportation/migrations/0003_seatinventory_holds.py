@@ -0,0 +1,19 @@
+# Generated by Django 3.1.12 on 2026-10-18 09:30
+
+from django.db import migrations
+import djongo.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0002_seatinventory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seatinventory',
+            name='holds',
+            field=djongo.models.fields.JSONField(default=dict),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.1.12 on 2026-10-18 10:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_search_terms(apps, schema_editor):
+    from transportation.search_index import index_route
+
+    Route = apps.get_model('transportation', 'Route')
+    RouteSearchTerm = apps.get_model('transportation', 'RouteSearchTerm')
+    for route in Route.objects.all():
+        index_route(route, term_model=RouteSearchTerm)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0003_seatinventory_holds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteSearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('origin', 'Origin'), ('destination', 'Destination')], max_length=20)),
+                ('term', models.CharField(max_length=100)),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='transportation.route')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='routesearchterm',
+            index=models.Index(fields=['field', 'term'], name='route_search_term_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['route', 'departure_date', 'departure_time'], name='schedule_route_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['departure_date', 'departure_time'], name='schedule_date_idx'),
+        ),
+        migrations.RunPython(build_search_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.12 on 2026-10-18 13:00
+
+from django.db import migrations
+import ticket_reservation_system.money
+from ticket_reservation_system.money import convert_to_cents
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0004_routesearchterm'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='schedule',
+            name='price',
+            field=ticket_reservation_system.money.MoneyField(),
+        ),
+        convert_to_cents('transportation', 'Schedule', 'price'),
+    ]
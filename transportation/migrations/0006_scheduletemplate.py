@@ -0,0 +1,41 @@
+# Generated by Django 3.1.12 on 2026-10-18 16:00
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import ticket_reservation_system.money
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0005_schedule_price_cents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleTemplate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('departure_time', models.TimeField()),
+                ('arrival_time', models.TimeField()),
+                ('days_of_week', models.CharField(default='1111111', help_text='Seven 0/1 flags, Monday first, e.g. 1111100 for weekdays only', max_length=7, validators=[django.core.validators.RegexValidator('^[01]{7}$', 'Use seven 0/1 flags, Monday first.')])),
+                ('valid_from', models.DateField()),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('price', ticket_reservation_system.money.MoneyField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_templates', to='transportation.route')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='transportation.vehicle')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='schedules', to='transportation.scheduletemplate'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['template', 'departure_date'], name='schedule_template_date_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.1.12 on 2026-10-18 18:00
+
+from django.db import migrations
+import ticket_reservation_system.money
+
+
+def copy_base_prices(apps, schema_editor):
+    Schedule = apps.get_model('transportation', 'Schedule')
+    # djongo's connection object is the pymongo Database
+    schema_editor.connection.connection[Schedule._meta.db_table].update_many(
+        {'base_price': None},
+        [{'$set': {'base_price': '$price'}}],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0006_scheduletemplate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='base_price',
+            field=ticket_reservation_system.money.MoneyField(blank=True, null=True),
+        ),
+        migrations.RunPython(copy_base_prices, migrations.RunPython.noop),
+    ]
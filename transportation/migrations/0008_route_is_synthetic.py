@@ -0,0 +1,18 @@
+# Generated by Django 3.1.12 on 2026-10-18 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0007_schedule_base_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='is_synthetic',
+            field=models.BooleanField(default=False),
+        ),
+    ]
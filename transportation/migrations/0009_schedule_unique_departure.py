@@ -0,0 +1,17 @@
+# Generated by Django 3.1.12 on 2026-10-18 21:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transportation', '0008_route_is_synthetic'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='schedule',
+            unique_together={('route', 'vehicle', 'departure_date', 'departure_time')},
+        ),
+    ]
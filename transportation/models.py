@@ -1,5 +1,7 @@
+from django.core.validators import RegexValidator
 from django.db import models
 from djongo import models as djongo_models
+from ticket_reservation_system.money import MoneyField
 from datetime import datetime, time
 
 class TransportationType(djongo_models.Model):
@@ -7,6 +9,11 @@ class TransportationType(djongo_models.Model):
     description = models.TextField(blank=True)
     icon = models.CharField(max_length=50, blank=True)  # For UI icons
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from .search_cache import invalidate_transport_types
+        invalidate_transport_types()
+
     def __str__(self):
         return self.name
 
@@ -17,13 +24,50 @@ class Route(djongo_models.Model):
     estimated_duration = models.DurationField()  # travel time
     transportation_type = models.ForeignKey(TransportationType, on_delete=models.CASCADE)
     is_active = models.BooleanField(default=True)
+    is_synthetic = models.BooleanField(default=False)  # created by `populate_data --routes`
 
     class Meta:
         unique_together = ['origin', 'destination', 'transportation_type']
 
+    def save(self, *args, **kwargs):
+        # Searches that matched the old names go stale as well as those matching the new ones
+        old_terms = list(RouteSearchTerm.objects.filter(route_id=self.pk).values_list('field', 'term')) if self.pk else []
+        super().save(*args, **kwargs)
+        # Keep the normalized search terms in sync with origin/destination
+        from .search_index import index_route, terms_for
+        from .search_cache import bump_routes_version
+        index_route(self)
+        new_terms = [
+            (field, term)
+            for field, value in (('origin', self.origin), ('destination', self.destination))
+            for term in terms_for(value)
+        ]
+        bump_routes_version(old_terms + new_terms)
+
     def __str__(self):
         return f"{self.origin} to {self.destination} ({self.transportation_type.name})"
 
+class RouteSearchTerm(djongo_models.Model):
+    # Normalized, case-folded words of a route's origin/destination, used
+    # for indexed prefix lookups instead of icontains scans over Route.
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name='search_terms')
+    field = models.CharField(
+        max_length=20,
+        choices=[
+            ('origin', 'Origin'),
+            ('destination', 'Destination'),
+        ]
+    )
+    term = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['field', 'term'], name='route_search_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.field}: {self.term}"
+
 class Vehicle(djongo_models.Model):
     vehicle_number = models.CharField(max_length=20, unique=True)
     transportation_type = models.ForeignKey(TransportationType, on_delete=models.CASCADE)
@@ -34,13 +78,41 @@ class Vehicle(djongo_models.Model):
     def __str__(self):
         return f"{self.vehicle_number} ({self.transportation_type.name})"
 
+class ScheduleTemplate(djongo_models.Model):
+    # A recurring departure. `manage.py materialize_schedules` turns it into
+    # one Schedule per running day inside the rolling horizon.
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name='schedule_templates')
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE)
+    departure_time = models.TimeField()
+    arrival_time = models.TimeField()
+    days_of_week = models.CharField(
+        max_length=7,
+        default='1111111',
+        validators=[RegexValidator(r'^[01]{7}$', 'Use seven 0/1 flags, Monday first.')],
+        help_text='Seven 0/1 flags, Monday first, e.g. 1111100 for weekdays only'
+    )
+    valid_from = models.DateField()
+    valid_until = models.DateField(null=True, blank=True)
+    price = MoneyField()
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def runs_on(self, day):
+        if day < self.valid_from or (self.valid_until and day > self.valid_until):
+            return False
+        return self.days_of_week[day.weekday()] == '1'
+
+    def __str__(self):
+        return f"{self.route} at {self.departure_time} ({self.days_of_week})"
+
 class Schedule(djongo_models.Model):
     route = models.ForeignKey(Route, on_delete=models.CASCADE)
     vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE)
     departure_time = models.TimeField()
     arrival_time = models.TimeField()
     departure_date = models.DateField()
-    price = models.DecimalField(max_digits=10, decimal_places=2)
+    price = MoneyField()  # current fare, kept up to date by transportation.pricing
+    base_price = MoneyField(null=True, blank=True)  # fare before dynamic pricing
     available_seats = models.IntegerField()
     status = models.CharField(
         max_length=20,
@@ -52,8 +124,37 @@ class Schedule(djongo_models.Model):
         ],
         default='scheduled'
     )
+    template = models.ForeignKey(
+        ScheduleTemplate, on_delete=models.SET_NULL, null=True, blank=True, related_name='schedules'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # One departure per vehicle and slot, however it was created (see recurring.materialize)
+        unique_together = ['route', 'vehicle', 'departure_date', 'departure_time']
+        indexes = [
+            models.Index(fields=['route', 'departure_date', 'departure_time'], name='schedule_route_date_idx'),
+            models.Index(fields=['departure_date', 'departure_time'], name='schedule_date_idx'),
+            models.Index(fields=['template', 'departure_date'], name='schedule_template_date_idx'),
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Read through __dict__ so deferred loads (.only()) do not trigger a query
+        self._original_departure_date = self.__dict__.get('departure_date')
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Cached search results for both the old and the new date are now stale
+        from .search_cache import bump_date_version
+        from .pricing import invalidate_price_table
+        bump_date_version(self.departure_date)
+        invalidate_price_table(self.departure_date)
+        if self._original_departure_date and self._original_departure_date != self.departure_date:
+            bump_date_version(self._original_departure_date)
+            invalidate_price_table(self._original_departure_date)
+        self._original_departure_date = self.departure_date
+
     def __str__(self):
         return f"{self.route} - {self.departure_date} {self.departure_time}"
 
@@ -68,6 +169,7 @@ class Seat(djongo_models.Model):
             ('middle', 'Middle'),
         ]
     )
+    # Unused: availability is per schedule, in SeatInventory.seat_states
     is_available = models.BooleanField(default=True)
 
     class Meta:
@@ -75,3 +177,26 @@ class Seat(djongo_models.Model):
 
     def __str__(self):
         return f"{self.vehicle.vehicle_number} - Seat {self.seat_number}"
+
+class SeatInventory(djongo_models.Model):
+    # One document per schedule holding the seat layout and a compact
+    # seat-state string ('0' free, '1' booked), indexed like `seats`.
+    # Temporary holds live in `holds` and expire on their own timestamp.
+    SEAT_FREE = '0'
+    SEAT_BOOKED = '1'
+
+    schedule = models.OneToOneField(Schedule, on_delete=models.CASCADE, related_name='seat_inventory')
+    seats = djongo_models.JSONField(default=list)  # [{'id', 'seat_number', 'seat_type'}, ...]
+    seat_states = models.TextField(default='')
+    holds = djongo_models.JSONField(default=dict)  # {seat_id: {'user_id', 'expires_at'}}
+    version = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def seat_index(self):
+        return {seat['id']: position for position, seat in enumerate(self.seats)}
+
+    def is_free(self, position):
+        return self.seat_states[position] == self.SEAT_FREE
+
+    def __str__(self):
+        return f"Inventory for {self.schedule}"
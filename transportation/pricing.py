@@ -0,0 +1,190 @@
+"""
+Dynamic fares for upcoming departures.
+
+reprice() recomputes the fare of every scheduled departure from today on:
+
+    price = base_price * clamp(occupancy_factor * time_factor, MIN_MULTIPLIER, MAX_MULTIPLIER)
+
+where occupancy_factor = 1 + OCCUPANCY_WEIGHT * occupancy ** 2 (occupancy is
+the share of the vehicle sold), and time_factor is EARLY_DISCOUNT more than
+EARLY_DAYS ahead, 1 otherwise, plus a last-minute surge for the transport
+type that grows linearly over the final LAST_MINUTE_HOURS. base_price is
+the fare a departure was created with; departures without one use their
+current price and get it recorded.
+
+Departures are read from MongoDB in batches of PRICING_BATCH_SIZE and priced
+with NumPy array arithmetic when NumPy is installed (plain Python otherwise,
+with the same results). Only changed fares are written, with one unordered
+bulk_write per batch. Every repriced date then gets a cached price table
+({schedule id: cents}) and a search version bump, so cached searches and the
+timetable snapshot pick up the new fares.
+
+Booking reads fares from the price tables. quote() locks the fare shown on
+the booking form by recording it on the user's seat holds in the inventory,
+so every worker charges that fare, for exactly as long as the seats are held.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from pymongo import UpdateOne
+from ticket_reservation_system.money import from_cents, to_cents
+from ticket_reservation_system.mongo import as_date, as_time, collection, to_mongo
+from .models import Route, Schedule, Vehicle
+from .search_cache import bump_date_version
+from . import inventory
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PRICING_BATCH_SIZE = getattr(settings, 'PRICING_BATCH_SIZE', 10000)
+PRICE_TABLE_TIMEOUT = 24 * 60 * 60  # seconds; a missing table falls back to Schedule.price
+
+OCCUPANCY_WEIGHT = 0.5
+EARLY_DAYS = 21
+EARLY_DISCOUNT = 0.9
+LAST_MINUTE_HOURS = 72
+LAST_MINUTE_SURGE = {'Bus': 0.1, 'Train': 0.2, 'Flight': 0.4}
+DEFAULT_SURGE = 0.15
+MIN_MULTIPLIER = 0.8
+MAX_MULTIPLIER = 2.0
+
+
+def _multipliers(sold, capacity, hours, surge):
+    occupancy = np.clip(sold / np.maximum(capacity, 1), 0, 1)
+    occupancy_factor = 1 + OCCUPANCY_WEIGHT * occupancy ** 2
+    time_factor = np.where(hours > EARLY_DAYS * 24, EARLY_DISCOUNT, 1.0)
+    time_factor = time_factor + surge * np.clip(1 - hours / LAST_MINUTE_HOURS, 0, 1)
+    return np.clip(occupancy_factor * time_factor, MIN_MULTIPLIER, MAX_MULTIPLIER)
+
+
+def _multiplier(sold, capacity, hours, surge):
+    occupancy = min(max(sold / max(capacity, 1), 0), 1)
+    occupancy_factor = 1 + OCCUPANCY_WEIGHT * occupancy ** 2
+    time_factor = EARLY_DISCOUNT if hours > EARLY_DAYS * 24 else 1.0
+    time_factor += surge * min(max(1 - hours / LAST_MINUTE_HOURS, 0), 1)
+    return min(max(occupancy_factor * time_factor, MIN_MULTIPLIER), MAX_MULTIPLIER)
+
+
+def compute_prices(base, sold, capacity, hours, surge):
+    """New fares in cents for parallel sequences of base fares (cents), seats sold, capacities, hours to departure and surges."""
+    if np is not None:
+        multipliers = _multipliers(
+            np.asarray(sold, dtype=float), np.asarray(capacity, dtype=float),
+            np.asarray(hours, dtype=float), np.asarray(surge, dtype=float),
+        )
+        return np.rint(np.asarray(base, dtype=float) * multipliers).astype(np.int64).tolist()
+    return [
+        round(base_price * _multiplier(*row))
+        for base_price, *row in zip(base, sold, capacity, hours, surge)
+    ]
+
+
+def _table_key(departure_date):
+    return f'pricing:table:{departure_date}'
+
+
+def invalidate_price_table(departure_date):
+    cache.delete(_table_key(departure_date))
+
+
+def current_price(schedule):
+    """The schedule's fare from the cached price table, or its stored price."""
+    table = cache.get(_table_key(schedule.departure_date))
+    cents = table.get(schedule.pk) if table else None
+    return from_cents(cents) if cents is not None else schedule.price
+
+
+def quote(schedule, user):
+    """
+    The fare offered to `user` for the seats they hold on `schedule` and when
+    the offer ends, or None when they hold no seats. The first quote fixes
+    the fare; holding other seats starts a new quote.
+    """
+    holds = inventory.user_holds(schedule, user)
+    if not holds:
+        return None
+    price = next((hold['price'] for hold in holds.values() if 'price' in hold), None)
+    if price is None:
+        price = inventory.set_hold_price(schedule, user, to_cents(current_price(schedule)))
+        if price is None:
+            return None
+    return from_cents(price), min(hold['expires_at'] for hold in holds.values())
+
+
+class _Batch:
+    def __init__(self):
+        self.documents = []
+        self.base = []
+        self.sold = []
+        self.capacity = []
+        self.hours = []
+        self.surge = []
+
+
+def _price_batch(batch, tables):
+    """Price one batch, write the changed fares and fill `tables`; returns the dates that changed."""
+    prices = compute_prices(batch.base, batch.sold, batch.capacity, batch.hours, batch.surge)
+    updates = []
+    changed_dates = set()
+    for document, base_price, price in zip(batch.documents, batch.base, prices):
+        departure_date = as_date(document['departure_date'])
+        tables.setdefault(departure_date, {})[document['id']] = price
+        values = {}
+        if price != document['price']:
+            values['price'] = price
+        if document.get('base_price') is None:
+            values['base_price'] = base_price
+        if values:
+            updates.append(UpdateOne({'_id': document['_id']}, {'$set': values}))
+            changed_dates.add(departure_date)
+    if updates:
+        collection(Schedule).bulk_write(updates, ordered=False)
+    return changed_dates, len(updates)
+
+
+def reprice(batch_size=PRICING_BATCH_SIZE):
+    """Recompute the fare of every upcoming departure. Returns (departures priced, fares changed)."""
+    now = timezone.localtime().replace(tzinfo=None)
+    capacities = dict(Vehicle.objects.values_list('id', 'capacity'))
+    surges = {
+        route_id: LAST_MINUTE_SURGE.get(type_name, DEFAULT_SURGE)
+        for route_id, type_name in Route.objects.values_list('id', 'transportation_type__name')
+    }
+
+    documents = collection(Schedule).find(
+        {'departure_date': {'$gte': to_mongo(now.date())}, 'status': 'scheduled'},
+        {'_id': 1, 'id': 1, 'route_id': 1, 'vehicle_id': 1, 'departure_date': 1, 'departure_time': 1,
+         'price': 1, 'base_price': 1, 'available_seats': 1},
+    ).sort([('departure_date', 1), ('departure_time', 1)]).batch_size(batch_size)
+
+    priced = changed = 0
+    tables = {}
+    changed_dates = set()
+    batch = _Batch()
+    for document in documents:
+        capacity = capacities.get(document['vehicle_id'], 0)
+        departure = datetime.combine(as_date(document['departure_date']), as_time(document['departure_time']))
+        batch.documents.append(document)
+        batch.base.append(document['price'] if document.get('base_price') is None else document['base_price'])
+        batch.sold.append(capacity - document['available_seats'])
+        batch.capacity.append(capacity)
+        batch.hours.append(max((departure - now).total_seconds() / 3600, 0))
+        batch.surge.append(surges.get(document['route_id'], DEFAULT_SURGE))
+        if len(batch.documents) >= batch_size:
+            dates, count = _price_batch(batch, tables)
+            changed_dates |= dates
+            priced, changed = priced + len(batch.documents), changed + count
+            batch = _Batch()
+    if batch.documents:
+        dates, count = _price_batch(batch, tables)
+        changed_dates |= dates
+        priced, changed = priced + len(batch.documents), changed + count
+
+    cache.set_many({_table_key(departure_date): table for departure_date, table in tables.items()}, PRICE_TABLE_TIMEOUT)
+    # bulk_write skips Schedule.save, so invalidate cached searches here
+    for departure_date in changed_dates:
+        bump_date_version(departure_date)
+    return priced, changed
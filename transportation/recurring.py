@@ -0,0 +1,111 @@
+"""
+Materialize recurring schedule templates into Schedule documents.
+
+materialize() keeps a rolling window of departures (SCHEDULE_HORIZON_DAYS,
+starting today) in step with the active templates. Templates are processed
+in chunks: for each chunk, one query reads the departures that already exist
+in the window, keyed by (route, vehicle, date, departure time), and only the
+missing ones are bulk-inserted. Re-running it is therefore idempotent, and a
+departure created by hand or by an older run is never duplicated.
+
+The read is only a shortcut: Schedule is unique on (route, vehicle, date,
+departure time), and inserts ignore conflicts, so a departure that another run
+inserted in the meantime is skipped rather than duplicated. The returned count
+may then include it.
+
+Existing departures are left untouched, including when a template's price or
+times change afterwards; edit those schedules directly. Seat inventories are
+built lazily on first access, as for any other schedule.
+"""
+from django.conf import settings
+from django.utils import timezone
+from .models import Schedule, ScheduleTemplate
+from .search_cache import bump_date_version
+from datetime import timedelta
+
+SCHEDULE_HORIZON_DAYS = getattr(settings, 'SCHEDULE_HORIZON_DAYS', 90)
+
+TEMPLATE_FIELDS = (
+    'id', 'route_id', 'vehicle_id', 'departure_time', 'arrival_time', 'days_of_week',
+    'valid_from', 'valid_until', 'price', 'vehicle__capacity',
+)
+
+
+def _running_days(template, days):
+    _, _, _, _, _, days_of_week, valid_from, valid_until, _, _ = template
+    for day in days:
+        if day < valid_from or (valid_until and day > valid_until):
+            continue
+        if days_of_week[day.weekday()] == '1':
+            yield day
+
+
+def _materialize_chunk(templates, days, batch_size):
+    route_ids = {template[1] for template in templates}
+    existing = set(Schedule.objects.filter(
+        route_id__in=route_ids,
+        departure_date__gte=days[0],
+        departure_date__lte=days[-1],
+    ).values_list('route_id', 'vehicle_id', 'departure_date', 'departure_time'))
+
+    new_schedules = []
+    for template in templates:
+        template_id, route_id, vehicle_id, departure_time, arrival_time, _, _, _, price, capacity = template
+        for day in _running_days(template, days):
+            key = (route_id, vehicle_id, day, departure_time)
+            if key in existing:
+                continue
+            # Two templates describing the same departure produce it once
+            existing.add(key)
+            new_schedules.append(Schedule(
+                route_id=route_id,
+                vehicle_id=vehicle_id,
+                template_id=template_id,
+                departure_date=day,
+                departure_time=departure_time,
+                arrival_time=arrival_time,
+                price=price,
+                base_price=price,
+                available_seats=capacity,
+                status='scheduled',
+            ))
+    Schedule.objects.bulk_create(new_schedules, batch_size=batch_size, ignore_conflicts=True)
+    return new_schedules
+
+
+def materialize(start_date=None, horizon_days=SCHEDULE_HORIZON_DAYS, template_ids=None,
+                chunk_size=500, batch_size=5000):
+    """Create the missing departures of active templates for `horizon_days` from `start_date`. Returns the count."""
+    start_date = start_date or timezone.now().date()
+    days = [start_date + timedelta(days=offset) for offset in range(horizon_days)]
+    if not days:
+        return 0
+
+    templates = ScheduleTemplate.objects.filter(
+        is_active=True,
+        route__is_active=True,
+        vehicle__is_active=True,
+        valid_from__lte=days[-1],
+    )
+    if template_ids is not None:
+        templates = templates.filter(id__in=list(template_ids))
+
+    created = 0
+    touched_dates = set()
+    chunk = []
+    for template in templates.order_by('id').values_list(*TEMPLATE_FIELDS):
+        chunk.append(template)
+        if len(chunk) >= chunk_size:
+            new_schedules = _materialize_chunk(chunk, days, batch_size)
+            created += len(new_schedules)
+            touched_dates.update(schedule.departure_date for schedule in new_schedules)
+            chunk = []
+    if chunk:
+        new_schedules = _materialize_chunk(chunk, days, batch_size)
+        created += len(new_schedules)
+        touched_dates.update(schedule.departure_date for schedule in new_schedules)
+
+    # bulk_create skips Schedule.save, so invalidate cached searches here
+    for departure_date in touched_dates:
+        bump_date_version(departure_date)
+    return created
@@ -0,0 +1,163 @@
+"""
+Hand-written MongoDB reads for the hottest transportation queries.
+
+Used instead of the ORM when settings.NATIVE_MONGO_READS is on, and by the
+async views through the `a`-prefixed coroutine variants. Results are
+plain dicts shaped like the model instances the templates already use
+(schedule.route.transportation_type.name, schedule.vehicle.vehicle_number,
+...), so the same templates render either path.
+"""
+from ticket_reservation_system.mongo import (
+    apaginate_aggregate, as_date, as_duration, as_time, async_collection, collection,
+    paginate_aggregate, to_mongo
+)
+from ticket_reservation_system.money import from_cents
+from .models import Route, Schedule, SeatInventory, TransportationType, Vehicle
+from .search_cache import acached_route_ids, cached_route_ids
+
+SEARCH_ORDERING = ('departure_date', 'departure_time', 'id')
+
+
+def _lookup(model, local_field, as_field, unwind=True):
+    stages = [{'$lookup': {
+        'from': model._meta.db_table,
+        'localField': local_field,
+        'foreignField': 'id',
+        'as': as_field,
+    }}]
+    if unwind:
+        stages.append({'$unwind': f'${as_field}'})
+    return stages
+
+
+def schedule_record(document):
+    """Convert a schedule document with joined route/vehicle into a template-ready dict."""
+    route = document.get('route') or {}
+    vehicle = document.get('vehicle') or {}
+    return {
+        'id': document['id'],
+        'route_id': document['route_id'],
+        'vehicle_id': document['vehicle_id'],
+        'departure_date': as_date(document['departure_date']),
+        'departure_time': as_time(document['departure_time']),
+        'arrival_time': as_time(document['arrival_time']),
+        'price': from_cents(document['price']),
+        'available_seats': document['available_seats'],
+        'status': document['status'],
+        'route': {
+            'id': route.get('id'),
+            'origin': route.get('origin'),
+            'destination': route.get('destination'),
+            'distance': route.get('distance'),
+            'estimated_duration': as_duration(route.get('estimated_duration')),
+            'transportation_type': {'name': (route.get('transportation_type') or {}).get('name')},
+        },
+        'vehicle': {
+            'id': vehicle.get('id'),
+            'vehicle_number': vehicle.get('vehicle_number'),
+            'capacity': vehicle.get('capacity'),
+            'amenities': vehicle.get('amenities'),
+        },
+    }
+
+
+SCHEDULE_JOINS = [
+    *_lookup(Route, 'route_id', 'route'),
+    *_lookup(TransportationType, 'route.transportation_type_id', 'route.transportation_type'),
+    *_lookup(Vehicle, 'vehicle_id', 'vehicle'),
+]
+
+
+def _intersect(route_ids, ids):
+    return set(ids) if route_ids is None else route_ids & set(ids)
+
+
+def _search_match(route_ids, departure_date):
+    match = {'status': 'scheduled', 'available_seats': {'$gt': 0}}
+    if route_ids is not None:
+        match['route_id'] = {'$in': sorted(route_ids)}
+    if departure_date:
+        match['departure_date'] = to_mongo(Schedule._meta.get_field('departure_date').to_python(departure_date))
+    return match
+
+
+def search_schedules(origin=None, destination=None, departure_date=None, transport_type=None,
+                     page_size=10, after=None, before=None):
+    """Native equivalent of SearchView's queryset and keyset page."""
+    route_ids = None
+    for field, query in (('origin', origin), ('destination', destination)):
+        if query:
+            route_ids = _intersect(route_ids, cached_route_ids(field, query))
+    if transport_type:
+        type_document = collection(TransportationType).find_one({'name': transport_type}, {'id': 1})
+        route_ids = _intersect(route_ids, collection(Route).distinct(
+            'id', {'transportation_type_id': type_document['id']}
+        ) if type_document else [])
+
+    return paginate_aggregate(
+        Schedule, _search_match(route_ids, departure_date), SEARCH_ORDERING, page_size, schedule_record,
+        stages=SCHEDULE_JOINS, after=after, before=before,
+    )
+
+
+async def asearch_schedules(origin=None, destination=None, departure_date=None, transport_type=None,
+                            page_size=10, after=None, before=None):
+    """search_schedules() on the async client."""
+    route_ids = None
+    for field, query in (('origin', origin), ('destination', destination)):
+        if query:
+            route_ids = _intersect(route_ids, await acached_route_ids(field, query))
+    if transport_type:
+        type_document = await async_collection(TransportationType).find_one({'name': transport_type}, {'id': 1})
+        route_ids = _intersect(route_ids, await async_collection(Route).distinct(
+            'id', {'transportation_type_id': type_document['id']}
+        ) if type_document else [])
+
+    return await apaginate_aggregate(
+        Schedule, _search_match(route_ids, departure_date), SEARCH_ORDERING, page_size, schedule_record,
+        stages=SCHEDULE_JOINS, after=after, before=before,
+    )
+
+
+async def aget_schedule(schedule_id):
+    """One schedule with its route and vehicle, or None."""
+    documents = await async_collection(Schedule).aggregate([
+        {'$match': {'id': schedule_id}},
+        {'$limit': 1},
+        *SCHEDULE_JOINS,
+    ]).to_list(1)
+    return schedule_record(documents[0]) if documents else None
+
+
+async def aschedule_exists(schedule_id):
+    return await async_collection(Schedule).count_documents({'id': schedule_id}, limit=1) > 0
+
+
+async def atransportation_types():
+    return [
+        {'id': document['id'], 'name': document['name']}
+        async for document in async_collection(TransportationType).find({}, {'id': 1, 'name': 1}).sort('id', 1)
+    ]
+
+
+def _inventory(document):
+    # An unsaved instance, so the seat map code can use it like an ORM row
+    return SeatInventory(
+        id=document['id'],
+        schedule_id=document['schedule_id'],
+        seats=document.get('seats') or [],
+        seat_states=document.get('seat_states') or '',
+        holds=document.get('holds') or {},
+        version=document.get('version', 0),
+    )
+
+
+def load_inventory(schedule_id):
+    """Read a schedule's seat inventory document, or None if it has not been built yet."""
+    document = collection(SeatInventory).find_one({'schedule_id': schedule_id})
+    return _inventory(document) if document is not None else None
+
+
+async def aload_inventory(schedule_id):
+    document = await async_collection(SeatInventory).find_one({'schedule_id': schedule_id})
+    return _inventory(document) if document is not None else None
@@ -0,0 +1,197 @@
+from django.conf import settings
+from django.core.cache import cache
+from asgiref.sync import sync_to_async
+from .search_index import normalize, matching_route_ids, amatching_route_ids
+import asyncio
+import hashlib
+import time
+
+SEARCH_CACHE_TIMEOUT = getattr(settings, 'SEARCH_CACHE_TIMEOUT', 5 * 60)
+
+# How long one request may spend filling a missing entry before others stop waiting for it
+FILL_LOCK_TIMEOUT = 10
+FILL_POLL_INTERVAL = 0.05
+
+ROUTES_VERSION_KEY = 'search:version:routes'
+ROUTES_EPOCH_KEY = 'search:version:routes:epoch'
+TRANSPORT_TYPES_KEY = 'search:transport_types'
+# The async views cache plain dicts rather than model instances, so under their own keys
+TRANSPORT_TYPE_RECORDS_KEY = 'search:transport_types:records'
+
+# City lookups and the search pages built on them follow the version of the
+# query's first ROUTE_PREFIX_LENGTH characters, so saving a route only
+# invalidates searches for cities sharing a prefix with its origin or destination.
+ROUTE_PREFIX_LENGTH = 2
+
+
+def _date_version_key(departure_date):
+    # Searches without a date depend on every date, so they share the 'any' counter
+    return f'search:version:date:{departure_date or "any"}'
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a counter that was evicted never reuses an old value
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), None)
+
+
+def _prefix_version_key(field, prefix):
+    return f'search:version:routes:{field}:{prefix}'
+
+
+def bump_routes_version(terms=None):
+    """
+    Invalidate route data. `terms` are the (field, search term) pairs of the
+    routes that changed, old and new; without them every city lookup is
+    invalidated.
+    """
+    _bump(ROUTES_VERSION_KEY)
+    if terms is None:
+        _bump(ROUTES_EPOCH_KEY)
+        return
+    for field, prefix in {(field, term[:ROUTE_PREFIX_LENGTH]) for field, term in terms}:
+        if len(prefix) == ROUTE_PREFIX_LENGTH:
+            _bump(_prefix_version_key(field, prefix))
+
+
+def bump_date_version(departure_date):
+    """Invalidate cached searches for a departure date (and undated searches)."""
+    _bump(_date_version_key(departure_date))
+    _bump(_date_version_key(None))
+
+
+def routes_version():
+    return _get_version(ROUTES_VERSION_KEY)
+
+
+def query_routes_version(field, query):
+    """Version of the routes a city query can match; it changes when any of them is saved."""
+    # Every matching route has a term starting with the query's first word
+    words = normalize(query).split()
+    if not words or len(words[0]) < ROUTE_PREFIX_LENGTH:
+        return _get_version(ROUTES_VERSION_KEY)
+    return _get_version(ROUTES_EPOCH_KEY), _get_version(_prefix_version_key(field, words[0][:ROUTE_PREFIX_LENGTH]))
+
+
+def date_version(departure_date):
+    """Current version of a departure date; it changes whenever that date's schedules do."""
+    return _get_version(_date_version_key(departure_date))
+
+
+def invalidate_transport_types():
+    cache.delete_many([TRANSPORT_TYPES_KEY, TRANSPORT_TYPE_RECORDS_KEY])
+
+
+def results_key(origin, destination, departure_date, transport_type, cursor, records=False):
+    """
+    Cache key of one search results page. `records` marks pages of plain dicts
+    (from the async client), kept apart from pages of Schedule instances.
+    """
+    if origin or destination:
+        # The page only shows routes matching the city queries
+        routes = tuple(query_routes_version(field, query) for field, query in (
+            ('origin', origin), ('destination', destination)
+        ) if query)
+    else:
+        routes = _get_version(ROUTES_VERSION_KEY)
+    params = (
+        normalize(origin),
+        normalize(destination),
+        departure_date or '',
+        transport_type or '',
+        cursor or '',
+        routes,
+        _get_version(_date_version_key(departure_date)),
+    )
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    return f"search:{'records' if records else 'results'}:{digest}"
+
+
+def _route_ids_key(field, query):
+    digest = hashlib.md5(repr((normalize(query), query_routes_version(field, query))).encode()).hexdigest()
+    return f'search:routes:{field}:{digest}'
+
+
+def cached_route_ids(field, query):
+    """matching_route_ids() memoized until a route it could match is saved."""
+    return get_or_compute(_route_ids_key(field, query), lambda: matching_route_ids(field, query))
+
+
+async def acached_route_ids(field, query):
+    """cached_route_ids() for async views; shares its cache entries."""
+    return await aget_or_compute(_route_ids_key(field, query), lambda: amatching_route_ids(field, query))
+
+
+def get_or_compute(key, compute, timeout=SEARCH_CACHE_TIMEOUT):
+    """
+    Return the cached value for `key`, computing it at most once at a time.
+
+    The first request to miss takes a short lock and fills the entry; concurrent
+    requests for the same key wait for that result instead of hitting the database.
+    """
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, FILL_LOCK_TIMEOUT):
+        try:
+            result = compute()
+            cache.set(key, result, timeout)
+            return result
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + FILL_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(FILL_POLL_INTERVAL)
+        result = cache.get(key)
+        if result is not None:
+            return result
+        if cache.get(lock_key) is None:
+            break
+
+    # The filling request failed or took too long; compute it ourselves
+    return compute()
+
+
+async def acache(method, *args):
+    """Call a cache method off the event loop; the cache API is synchronous in this Django."""
+    return await sync_to_async(lambda: getattr(cache, method)(*args), thread_sensitive=True)()
+
+
+async def aget_or_compute(key, compute, timeout=SEARCH_CACHE_TIMEOUT):
+    """get_or_compute() for async views: `compute` is a coroutine function and waiting does not block the loop."""
+    result = await acache('get', key)
+    if result is not None:
+        return result
+
+    lock_key = f'{key}:lock'
+    if await acache('add', lock_key, 1, FILL_LOCK_TIMEOUT):
+        try:
+            result = await compute()
+            await acache('set', key, result, timeout)
+            return result
+        finally:
+            await acache('delete', lock_key)
+
+    deadline = time.monotonic() + FILL_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(FILL_POLL_INTERVAL)
+        result = await acache('get', key)
+        if result is not None:
+            return result
+        if await acache('get', lock_key) is None:
+            break
+
+    return await compute()
@@ -0,0 +1,71 @@
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize(text):
+    """Case-fold, strip accents and collapse punctuation: ' São-Paulo ' -> 'sao paulo'."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(_NON_WORD.sub(' ', text.casefold()).split())
+
+
+def terms_for(text):
+    """Index terms for a city name: the full normalized name plus each word in it."""
+    name = normalize(text)
+    if not name:
+        return set()
+    return {name} | set(name.split())
+
+
+def index_route(route, term_model=None):
+    """Replace the search terms stored for a route."""
+    if term_model is None:
+        from .models import RouteSearchTerm as term_model
+
+    term_model.objects.filter(route_id=route.pk).delete()
+    term_model.objects.bulk_create([
+        term_model(route_id=route.pk, field=field, term=term)
+        for field, value in (('origin', route.origin), ('destination', route.destination))
+        for term in sorted(terms_for(value))
+    ])
+
+
+def matching_route_ids(field, query):
+    """
+    Ids of routes whose `field` ('origin' or 'destination') matches `query`.
+
+    Every word of the query has to be a prefix of some word of the city name,
+    so 'new y', 'york' and 'NEW YORK' all find 'New York'. Each lookup is an
+    anchored prefix match on an indexed column.
+    """
+    from .models import RouteSearchTerm
+
+    words = normalize(query).split()
+    route_ids = None
+    for word in words:
+        matches = set(RouteSearchTerm.objects.filter(
+            field=field,
+            term__startswith=word
+        ).values_list('route_id', flat=True))
+        route_ids = matches if route_ids is None else route_ids & matches
+        if not route_ids:
+            return set()
+    return route_ids or set()
+
+
+async def amatching_route_ids(field, query):
+    """matching_route_ids() on the async MongoDB client."""
+    from ticket_reservation_system.mongo import async_collection
+    from .models import RouteSearchTerm
+
+    terms = async_collection(RouteSearchTerm)
+    route_ids = None
+    for word in normalize(query).split():
+        # An anchored, case-sensitive regex is a prefix scan on the term index
+        matches = set(await terms.distinct('route_id', {'field': field, 'term': {'$regex': f'^{re.escape(word)}'}}))
+        route_ids = matches if route_ids is None else route_ids & matches
+        if not route_ids:
+            return set()
+    return route_ids or set()
@@ -0,0 +1,280 @@
+"""
+In-memory timetable snapshot for search.
+
+Each web process keeps the scheduled departures of the next
+TIMETABLE_SNAPSHOT_DAYS days in compact column arrays, one set per departure
+date, ordered like the search results (departure time, then id). Routes and
+vehicles are kept once, in shared lookup records, with interned city names.
+A dated search whose date falls in that window is filtered, sorted and
+paginated from the snapshot without any database query.
+
+Freshness follows the search-cache version stamps: a date is reloaded on the
+next search after its version changes (schedule saves, bookings,
+cancellations), at most every SNAPSHOT_REFRESH_INTERVAL seconds, and at
+least every SNAPSHOT_MAX_AGE seconds so changes made by other processes show
+up too. A change of the routes version reloads routes and vehicles. Seat
+counts can therefore lag by a few seconds; booking re-checks every seat.
+
+Memory: a departure takes 36 bytes across its columns (8-byte id and price,
+4-byte route, vehicle, departure and arrival seconds, and seat count), so
+100k departures use about 3.5 MB. Shared route and vehicle records add
+roughly 1 KB each. stats() reports the exact column sizes.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from ticket_reservation_system.money import from_cents, to_cents
+from ticket_reservation_system.pagination import decode_cursor, page_from_rows
+from .models import Route, Schedule, Vehicle
+from .search_cache import cached_route_ids, date_version, routes_version
+from array import array
+from datetime import time as clock_time, timedelta
+import sys
+import threading
+import time
+
+TIMETABLE_SNAPSHOT = getattr(settings, 'TIMETABLE_SNAPSHOT', True)
+TIMETABLE_SNAPSHOT_DAYS = getattr(settings, 'TIMETABLE_SNAPSHOT_DAYS', 30)
+SNAPSHOT_REFRESH_INTERVAL = 2  # seconds
+SNAPSHOT_MAX_AGE = 60  # seconds
+
+SEARCH_ORDERING = ('departure_date', 'departure_time', 'id')
+
+
+def _seconds(at):
+    return at.hour * 3600 + at.minute * 60 + at.second
+
+
+def _clock(seconds):
+    hours, remainder = divmod(seconds, 3600)
+    return clock_time(hours, *divmod(remainder, 60))
+
+
+class DayColumns:
+    """The scheduled departures of one date, as parallel arrays in (departure time, id) order."""
+    __slots__ = ('version', 'loaded_at', 'ids', 'route_ids', 'vehicle_ids', 'departures', 'arrivals', 'prices', 'seats')
+
+    def __init__(self, version, loaded_at):
+        self.version = version
+        self.loaded_at = loaded_at
+        self.ids = array('q')
+        self.route_ids = array('i')
+        self.vehicle_ids = array('i')
+        self.departures = array('i')
+        self.arrivals = array('i')
+        self.prices = array('q')
+        self.seats = array('i')
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nbytes(self):
+        return sum(len(column) * column.itemsize for column in (
+            self.ids, self.route_ids, self.vehicle_ids, self.departures, self.arrivals, self.prices, self.seats
+        ))
+
+    def position(self, departure, schedule_id, inclusive=False):
+        """Index of the first row sorting after (departure, schedule_id), or at it when `inclusive`."""
+        key = (departure, schedule_id)
+        low, high = 0, len(self.ids)
+        while low < high:
+            middle = (low + high) // 2
+            row = (self.departures[middle], self.ids[middle])
+            if row < key or (row == key and not inclusive):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+class TimetableSnapshot:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes_version = None
+        self.routes = {}  # route id -> shared route record
+        self.route_types = {}  # route id -> transportation type name
+        self.vehicles = {}  # vehicle id -> shared vehicle record
+        self.days = {}  # date -> DayColumns
+
+    def _load_routes(self):
+        cities = {}
+        types = {}
+        routes = {}
+        route_types = {}
+        for route in Route.objects.select_related('transportation_type'):
+            type_name = sys.intern(route.transportation_type.name)
+            type_record = types.setdefault(type_name, {'name': type_name})
+            routes[route.id] = {
+                'id': route.id,
+                'origin': cities.setdefault(route.origin, sys.intern(route.origin)),
+                'destination': cities.setdefault(route.destination, sys.intern(route.destination)),
+                'distance': route.distance,
+                'estimated_duration': route.estimated_duration,
+                'transportation_type': type_record,
+            }
+            route_types[route.id] = type_name
+        vehicles = {
+            vehicle_id: {'id': vehicle_id, 'vehicle_number': number, 'capacity': capacity, 'amenities': amenities}
+            for vehicle_id, number, capacity, amenities in Vehicle.objects.values_list(
+                'id', 'vehicle_number', 'capacity', 'amenities'
+            )
+        }
+        self.routes, self.route_types, self.vehicles = routes, route_types, vehicles
+
+    def _load_day(self, day, version):
+        columns = DayColumns(version, time.monotonic())
+        for schedule_id, route_id, vehicle_id, departure_time, arrival_time, price, seats in Schedule.objects.filter(
+            departure_date=day, status='scheduled',
+        ).order_by('departure_time', 'id').values_list(
+            'id', 'route_id', 'vehicle_id', 'departure_time', 'arrival_time', 'price', 'available_seats'
+        ):
+            columns.ids.append(schedule_id)
+            columns.route_ids.append(route_id)
+            columns.vehicle_ids.append(vehicle_id)
+            columns.departures.append(_seconds(departure_time))
+            columns.arrivals.append(_seconds(arrival_time))
+            columns.prices.append(to_cents(price))
+            columns.seats.append(seats)
+        return columns
+
+    def _stale(self, columns, version, now):
+        if columns is None:
+            return True
+        age = now - columns.loaded_at
+        return age >= SNAPSHOT_MAX_AGE or (columns.version != version and age >= SNAPSHOT_REFRESH_INTERVAL)
+
+    def day(self, departure_date):
+        """The up-to-date columns of `departure_date`, loading them if needed."""
+        routes = routes_version()
+        version = date_version(departure_date)
+        columns = self.days.get(departure_date)
+        if routes == self.routes_version and not self._stale(columns, version, time.monotonic()):
+            return columns
+        with self.lock:
+            if routes != self.routes_version:
+                self._load_routes()
+                self.routes_version = routes
+            columns = self.days.get(departure_date)
+            if self._stale(columns, version, time.monotonic()):
+                columns = self._load_day(departure_date, version)
+                self.days[departure_date] = columns
+            # Past dates leave the window
+            today = timezone.now().date()
+            for stale_date in [loaded for loaded in self.days if loaded < today]:
+                del self.days[stale_date]
+            return columns
+
+    def record(self, departure_date, columns, index):
+        """A search result shaped like repository.schedule_record()."""
+        return {
+            'id': columns.ids[index],
+            'route_id': columns.route_ids[index],
+            'vehicle_id': columns.vehicle_ids[index],
+            'departure_date': departure_date,
+            'departure_time': _clock(columns.departures[index]),
+            'arrival_time': _clock(columns.arrivals[index]),
+            'price': from_cents(columns.prices[index]),
+            'available_seats': columns.seats[index],
+            'status': 'scheduled',
+            'route': self.routes.get(columns.route_ids[index]),
+            'vehicle': self.vehicles.get(columns.vehicle_ids[index]),
+        }
+
+
+_snapshot = TimetableSnapshot()
+
+
+def covers(departure_date):
+    today = timezone.now().date()
+    return TIMETABLE_SNAPSHOT and today <= departure_date < today + timedelta(days=TIMETABLE_SNAPSHOT_DAYS)
+
+
+def _route_filter(origin, destination, transport_type):
+    """Allowed route ids, or None when any route matches."""
+    route_ids = None
+    for field, query in (('origin', origin), ('destination', destination)):
+        if query:
+            matches = set(cached_route_ids(field, query))
+            route_ids = matches if route_ids is None else route_ids & matches
+    if transport_type:
+        matches = {route_id for route_id, name in _snapshot.route_types.items() if name == transport_type}
+        route_ids = matches if route_ids is None else route_ids & matches
+    return route_ids
+
+
+def _cursor_position(departure_date, columns, cursor, inclusive=False):
+    cursor_date, cursor_time, cursor_id = decode_cursor(Schedule, SEARCH_ORDERING, cursor)
+    if cursor_date < departure_date:
+        return 0
+    if cursor_date > departure_date:
+        return len(columns)
+    return columns.position(_seconds(cursor_time), cursor_id, inclusive=inclusive)
+
+
+def search(origin=None, destination=None, departure_date=None, transport_type=None,
+           page_size=10, after=None, before=None):
+    """
+    SearchView's keyset page computed from the snapshot, or None when the
+    snapshot does not cover the search (no date, or outside the window).
+    """
+    if not departure_date:
+        return None
+    try:
+        departure_date = Schedule._meta.get_field('departure_date').to_python(departure_date)
+    except ValidationError:
+        return None
+    if not covers(departure_date):
+        return None
+
+    columns = _snapshot.day(departure_date)
+    route_ids = _route_filter(origin, destination, transport_type)
+    seats = columns.seats
+    column_routes = columns.route_ids
+    known_routes = _snapshot.routes
+
+    def matches(index):
+        route_id = column_routes[index]
+        return seats[index] > 0 and route_id in known_routes and (route_ids is None or route_id in route_ids)
+
+    found = []
+    if before:
+        # Walk backwards from the cursor; page_from_rows puts them back in order
+        index = _cursor_position(departure_date, columns, before, inclusive=True) - 1
+        while index >= 0 and len(found) <= page_size:
+            if matches(index):
+                found.append(index)
+            index -= 1
+    else:
+        index = _cursor_position(departure_date, columns, after) if after else 0
+        while index < len(columns) and len(found) <= page_size:
+            if matches(index):
+                found.append(index)
+            index += 1
+
+    rows = [_snapshot.record(departure_date, columns, index) for index in found]
+    return page_from_rows(rows, SEARCH_ORDERING, page_size, after=after, before=before)
+
+
+def warm(days=None):
+    """Load the snapshot window; run at process start so the first searches do not pay for it."""
+    today = timezone.now().date()
+    for offset in range(TIMETABLE_SNAPSHOT_DAYS if days is None else days):
+        _snapshot.day(today + timedelta(days=offset))
+
+
+def warm_in_background():
+    if TIMETABLE_SNAPSHOT:
+        threading.Thread(target=warm, name='timetable-snapshot', daemon=True).start()
+
+
+def stats():
+    """Loaded departures and the bytes their columns take."""
+    with _snapshot.lock:
+        days = list(_snapshot.days.values())
+    return {
+        'days': len(days),
+        'departures': sum(len(columns) for columns in days),
+        'column_bytes': sum(columns.nbytes() for columns in days),
+        'routes': len(_snapshot.routes),
+        'vehicles': len(_snapshot.vehicles),
+    }
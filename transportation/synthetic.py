@@ -0,0 +1,239 @@
+"""
+Synthetic timetable generator used by `populate_data` for load-test datasets.
+
+Everything is derived from a seed so the same arguments always produce the
+same data, whether the days are generated in one process or split across
+worker processes.
+"""
+from django.db import connections
+from datetime import datetime, timedelta, time
+from decimal import Decimal
+from .models import Route, RouteSearchTerm, Vehicle, Schedule, Seat, SeatInventory
+from .layout import seat_layout
+from .search_index import terms_for
+from .search_cache import bump_date_version, bump_routes_version
+import multiprocessing
+import random
+
+SYNTHETIC_VEHICLE_PREFIX = 'SYN'
+
+CITIES = [
+    'New York', 'Boston', 'Philadelphia', 'Washington DC', 'Baltimore', 'Pittsburgh',
+    'Chicago', 'Detroit', 'Cleveland', 'Columbus', 'Indianapolis', 'Milwaukee',
+    'Minneapolis', 'St. Louis', 'Kansas City', 'Denver', 'Salt Lake City', 'Phoenix',
+    'Las Vegas', 'Los Angeles', 'San Diego', 'San Francisco', 'Sacramento', 'Portland',
+    'Seattle', 'Dallas', 'Houston', 'Austin', 'San Antonio', 'New Orleans',
+    'Atlanta', 'Nashville', 'Charlotte', 'Raleigh', 'Miami', 'Orlando',
+    'Tampa', 'Jacksonville', 'Memphis', 'Louisville',
+]
+
+# Per transport type: (nominal capacity, average speed km/h, price per km).
+# Vehicles get the seats seat_layout() fits into the nominal capacity.
+TRANSPORT_PROFILES = {
+    'Bus': (48, 70, Decimal('0.12')),
+    'Train': (120, 110, Decimal('0.25')),
+    'Flight': (180, 700, Decimal('0.15')),
+}
+
+
+def _city_pairs(rng, count):
+    cities = list(CITIES)
+    while len(cities) * (len(cities) - 1) < count:
+        cities.append(f'City {len(cities) + 1}')
+    pairs = [(origin, destination) for origin in cities for destination in cities if origin != destination]
+    rng.shuffle(pairs)
+    return pairs[:count]
+
+
+def create_routes(count, transport_types, seed):
+    """Bulk-create `count` routes (skipping existing ones) and index their search terms."""
+    rng = random.Random(f'{seed}:routes')
+    type_names = sorted(transport_types)
+    existing = set(Route.objects.values_list('origin', 'destination', 'transportation_type_id'))
+
+    new_routes = []
+    for origin, destination in _city_pairs(rng, count):
+        transport_type = transport_types[rng.choice(type_names)]
+        if (origin, destination, transport_type.id) in existing:
+            continue
+        _, speed, _ = TRANSPORT_PROFILES[transport_type.name]
+        distance = round(rng.uniform(80, 3000 if transport_type.name == 'Flight' else 900), 1)
+        new_routes.append(Route(
+            origin=origin,
+            destination=destination,
+            distance=distance,
+            estimated_duration=timedelta(minutes=int(distance / speed * 60) + 30),
+            transportation_type=transport_type,
+            is_active=True,
+            is_synthetic=True,
+        ))
+    Route.objects.bulk_create(new_routes, batch_size=1000)
+
+    # bulk_create skips Route.save, so build the search terms here in one pass
+    created = {(route.origin, route.destination, route.transportation_type_id) for route in new_routes}
+    terms = []
+    for route in Route.objects.all():
+        if (route.origin, route.destination, route.transportation_type_id) in created:
+            for field, value in (('origin', route.origin), ('destination', route.destination)):
+                terms.extend(RouteSearchTerm(route=route, field=field, term=term) for term in sorted(terms_for(value)))
+    RouteSearchTerm.objects.bulk_create(terms, batch_size=5000)
+    bump_routes_version()
+    return len(new_routes)
+
+
+def create_vehicles(count, transport_types, seed, chunk_size):
+    """Bulk-create synthetic vehicles and their seats."""
+    rng = random.Random(f'{seed}:vehicles')
+    type_names = sorted(transport_types)
+    existing = set(Vehicle.objects.filter(
+        vehicle_number__startswith=SYNTHETIC_VEHICLE_PREFIX
+    ).values_list('vehicle_number', flat=True))
+
+    new_vehicles = []
+    for number in range(1, count + 1):
+        vehicle_number = f'{SYNTHETIC_VEHICLE_PREFIX}{number:06d}'
+        transport_type = transport_types[rng.choice(type_names)]
+        if vehicle_number in existing:
+            continue
+        new_vehicles.append(Vehicle(
+            vehicle_number=vehicle_number,
+            transportation_type=transport_type,
+            # Whole rows only, so capacity matches the seats created below
+            capacity=len(seat_layout(transport_type.name, TRANSPORT_PROFILES[transport_type.name][0])),
+            amenities=['WiFi', 'AC'],
+            is_active=True,
+        ))
+    Vehicle.objects.bulk_create(new_vehicles, batch_size=chunk_size)
+
+    created = {vehicle.vehicle_number for vehicle in new_vehicles}
+    seats = [
+        Seat(vehicle=vehicle, seat_number=seat_number, seat_type=seat_type)
+        for vehicle in Vehicle.objects.filter(vehicle_number__in=created).select_related('transportation_type')
+        for seat_number, seat_type in seat_layout(vehicle.transportation_type.name, vehicle.capacity)
+    ]
+    Seat.objects.bulk_create(seats, batch_size=chunk_size)
+    return len(new_vehicles), len(seats)
+
+
+def timetable_inputs():
+    """Plain route, vehicle and seat data shared by every day of the timetable."""
+    routes = [
+        (route.id, route.transportation_type_id, route.distance, int(route.estimated_duration.total_seconds()))
+        for route in Route.objects.filter(is_active=True).order_by('id')
+    ]
+    vehicles = {}
+    for vehicle in Vehicle.objects.filter(
+        vehicle_number__startswith=SYNTHETIC_VEHICLE_PREFIX
+    ).select_related('transportation_type').order_by('id'):
+        vehicles.setdefault(vehicle.transportation_type_id, []).append((vehicle.id, vehicle.transportation_type.name))
+    seats = {}
+    for seat_id, vehicle_id, seat_number, seat_type in Seat.objects.filter(
+        vehicle__vehicle_number__startswith=SYNTHETIC_VEHICLE_PREFIX
+    ).order_by('id').values_list('id', 'vehicle_id', 'seat_number', 'seat_type'):
+        seats.setdefault(vehicle_id, []).append({'id': seat_id, 'seat_number': seat_number, 'seat_type': seat_type})
+    return routes, vehicles, seats
+
+
+# Set before forking so workers inherit the timetable inputs instead of receiving them per job
+_inputs = None
+
+
+def generate_day(job):
+    """Create every synthetic departure for one day. Runs in a worker process."""
+    departure_date, options = job
+    routes, vehicles, seats = _inputs
+    rng = random.Random(f"{options['seed']}:{departure_date.isoformat()}")
+
+    # Days generated by an earlier run are left alone; use --reset to regenerate them
+    if Schedule.objects.filter(
+        departure_date=departure_date,
+        vehicle__vehicle_number__startswith=SYNTHETIC_VEHICLE_PREFIX,
+    ).exists():
+        return 0
+
+    schedules = []
+    sold_states = {}
+    for route_id, type_id, distance, duration in routes:
+        fleet = vehicles.get(type_id)
+        if not fleet:
+            continue
+        for _ in range(options['departures_per_route']):
+            vehicle_id, type_name = rng.choice(fleet)
+            departure = datetime.combine(departure_date, time(rng.randrange(5, 23), rng.choice((0, 15, 30, 45))))
+            price = (Decimal(str(distance)) * TRANSPORT_PROFILES[type_name][2]).quantize(Decimal('0.01'))
+
+            key = (route_id, vehicle_id, departure.time())
+            if key in sold_states:
+                continue
+            sold = [rng.random() < options['booking_density'] for _ in seats.get(vehicle_id, [])]
+            sold_states[key] = sold
+
+            schedules.append(Schedule(
+                route_id=route_id,
+                vehicle_id=vehicle_id,
+                departure_date=departure_date,
+                departure_time=departure.time(),
+                arrival_time=(departure + timedelta(seconds=duration)).time(),
+                price=max(price, Decimal('10.00')),
+                # Counted from the seats the inventory is built from
+                available_seats=len(sold) - sum(sold),
+                status='scheduled',
+            ))
+    Schedule.objects.bulk_create(schedules, batch_size=options['chunk_size'])
+
+    if options['booking_density'] > 0:
+        # bulk_create does not return ids here, so read the day back to attach inventories
+        inventories = []
+        for schedule_id, route_id, vehicle_id, departure_time in Schedule.objects.filter(
+            departure_date=departure_date,
+            vehicle__vehicle_number__startswith=SYNTHETIC_VEHICLE_PREFIX,
+        ).values_list('id', 'route_id', 'vehicle_id', 'departure_time'):
+            sold = sold_states.get((route_id, vehicle_id, departure_time))
+            if sold is None:
+                continue
+            inventories.append(SeatInventory(
+                schedule_id=schedule_id,
+                seats=seats.get(vehicle_id, []),
+                seat_states=''.join(SeatInventory.SEAT_BOOKED if taken else SeatInventory.SEAT_FREE for taken in sold),
+            ))
+        SeatInventory.objects.bulk_create(inventories, batch_size=options['chunk_size'])
+
+    return len(schedules)
+
+
+def generate_schedules(start_date, options, stdout=None):
+    """Generate `options['days']` days of departures, optionally across worker processes."""
+    global _inputs
+    _inputs = timetable_inputs()
+    jobs = [(start_date + timedelta(days=offset), options) for offset in range(options['days'])]
+
+    if options['workers'] > 1:
+        # Each forked worker must open its own database connection
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+            total = _report(pool.imap(generate_day, jobs), stdout)
+    else:
+        total = _report(map(generate_day, jobs), stdout)
+
+    for departure_date, _ in jobs:
+        bump_date_version(departure_date)
+    return total
+
+
+def _report(counts, stdout):
+    total = 0
+    for day, count in enumerate(counts, start=1):
+        total += count
+        if stdout is not None:
+            stdout.write(f'  day {day}: {count} schedules')
+    return total
+
+
+def delete_synthetic_data():
+    """
+    Remove synthetic vehicles and routes; their seats, schedules, inventories
+    and search terms cascade.
+    """
+    Vehicle.objects.filter(vehicle_number__startswith=SYNTHETIC_VEHICLE_PREFIX).delete()
+    Route.objects.filter(is_synthetic=True).delete()
+    bump_routes_version()
@@ -1,3 +1,246 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from asgiref.sync import async_to_sync
+from .allocation import AllocationError, allocate
+from .autocomplete import CityIndex
+from .inventory import SeatLimitError, SeatUnavailableError, hold_seats, seat_map
+from .journeys import Connection, cheapest, earliest_arrival, matching_cities
+from .layout import seat_layout, seat_position
+from .models import Route, Schedule, Seat, TransportationType, Vehicle
+from . import pricing
+from . import snapshot
+from . import search_cache
+from datetime import date, time, timedelta
+from decimal import Decimal
+from unittest import mock
+import time as clock
 
-# Create your tests here.
+User = get_user_model()
+
+
+class SeatHoldTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='secret')
+        self.other_user = User.objects.create_user('bob', password='secret')
+        transport_type = TransportationType.objects.create(name='Bus')
+        route = Route.objects.create(
+            origin='Boston', destination='New York', distance=350,
+            estimated_duration=timedelta(hours=4), transportation_type=transport_type,
+        )
+        vehicle = Vehicle.objects.create(vehicle_number='BUS-TEST', transportation_type=transport_type, capacity=8)
+        self.seat_ids = [
+            Seat.objects.create(vehicle=vehicle, seat_number=f'{row}{column}', seat_type='window').id
+            for row in (1, 2) for column in 'ABCD'
+        ]
+        self.schedule = Schedule.objects.create(
+            route=route, vehicle=vehicle, departure_date=date.today() + timedelta(days=7),
+            departure_time=time(9, 0), arrival_time=time(13, 0), price=Decimal('25.00'), available_seats=8,
+        )
+
+    def seat_state(self, user, seat_id):
+        seat = next(seat for row in seat_map(self.schedule, user=user) for seat in row['seats'] if seat['id'] == seat_id)
+        return seat['is_available'], seat['is_held']
+
+    def test_hold_blocks_other_users_only(self):
+        hold_seats(self.schedule, [self.seat_ids[0]], self.user)
+
+        with self.assertRaises(SeatUnavailableError) as raised:
+            hold_seats(self.schedule, [self.seat_ids[0], self.seat_ids[1]], self.other_user)
+        self.assertEqual(raised.exception.seat_ids, [self.seat_ids[0]])
+        self.assertEqual(self.seat_state(self.other_user, self.seat_ids[0]), (False, True))
+        self.assertEqual(self.seat_state(self.user, self.seat_ids[0]), (True, False))
+
+    def test_new_hold_replaces_the_old_one(self):
+        hold_seats(self.schedule, [self.seat_ids[0]], self.user)
+        hold_seats(self.schedule, [self.seat_ids[1]], self.user)
+
+        hold_seats(self.schedule, [self.seat_ids[0]], self.other_user)
+        self.assertEqual(self.seat_state(self.user, self.seat_ids[0]), (False, True))
+
+    def test_expired_hold_frees_the_seat(self):
+        hold_seats(self.schedule, [self.seat_ids[0]], self.user, ttl=60)
+
+        later = clock.time() + 61
+        with mock.patch('transportation.inventory.time.time', return_value=later):
+            self.assertEqual(self.seat_state(self.other_user, self.seat_ids[0]), (True, False))
+            hold_seats(self.schedule, [self.seat_ids[0]], self.other_user)
+            self.assertEqual(self.seat_state(self.user, self.seat_ids[0]), (False, True))
+
+    def test_hold_is_capped_at_a_group(self):
+        with self.assertRaises(SeatLimitError):
+            hold_seats(self.schedule, self.seat_ids[:7], self.user)
+        self.assertEqual(self.seat_state(self.other_user, self.seat_ids[0]), (True, False))
+
+    def test_quote_lasts_as_long_as_the_hold(self):
+        self.assertIsNone(pricing.quote(self.schedule, self.user))
+
+        expires_at = hold_seats(self.schedule, self.seat_ids[:2], self.user)
+        self.assertEqual(pricing.quote(self.schedule, self.user), (Decimal('25.00'), expires_at))
+
+        self.schedule.price = Decimal('40.00')
+        self.schedule.save()
+        self.assertEqual(pricing.quote(self.schedule, self.user)[0], Decimal('25.00'))
+
+        # Holding other seats starts a new quote at the current fare
+        hold_seats(self.schedule, self.seat_ids[2:3], self.user)
+        self.assertEqual(pricing.quote(self.schedule, self.user)[0], Decimal('40.00'))
+
+
+class AsyncSearchCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fills_once_and_keeps_records_apart(self):
+        compute = mock.AsyncMock(return_value=[{'id': 1, 'name': 'Bus'}])
+        key = search_cache.results_key('Boston', '', None, '', '', records=True)
+
+        self.assertEqual(async_to_sync(search_cache.aget_or_compute)(key, compute), [{'id': 1, 'name': 'Bus'}])
+        self.assertEqual(async_to_sync(search_cache.aget_or_compute)(key, compute), [{'id': 1, 'name': 'Bus'}])
+        compute.assert_awaited_once()
+        self.assertNotEqual(key, search_cache.results_key('Boston', '', None, '', ''))
+
+
+class JourneyPlanningTests(SimpleTestCase):
+    # Minutes from the start of the day; Bus transfers need 15 minutes
+    connections = sorted([
+        Connection(50, 400, 'boston', 'new york', 5, 5000, 'Bus'),
+        Connection(60, 120, 'boston', 'philadelphia', 1, 1000, 'Bus'),
+        Connection(100, 300, 'boston', 'new york', 4, 1500, 'Bus'),
+        Connection(130, 200, 'philadelphia', 'new york', 2, 1000, 'Bus'),
+        Connection(140, 210, 'philadelphia', 'new york', 3, 1000, 'Bus'),
+    ])
+
+    def plan(self, search, start=0, last_departure=24 * 60):
+        legs, complete = search(self.connections, {'boston'}, {'new york'}, start, last_departure, clock.monotonic() + 5)
+        self.assertTrue(complete)
+        return [leg.schedule_id for leg in legs] if legs else None
+
+    def test_earliest_arrival_respects_transfer_time(self):
+        # Schedule 2 leaves Philadelphia 10 minutes after schedule 1 arrives, too soon to change
+        self.assertEqual(self.plan(earliest_arrival), [1, 3])
+        self.assertEqual(self.plan(earliest_arrival, start=61), [4])
+        self.assertIsNone(self.plan(earliest_arrival, start=101))
+
+    def test_cheapest_prefers_price_over_arrival(self):
+        self.assertEqual(self.plan(cheapest), [4])
+        self.assertEqual(self.plan(cheapest, last_departure=99), [1, 3])
+
+    def test_matching_cities_uses_word_prefixes(self):
+        cities = {'new york': 'New York', 'newark': 'Newark', 'boston': 'Boston'}
+        self.assertEqual(matching_cities(cities, 'New York'), {'new york'})
+        self.assertEqual(matching_cities(cities, 'new'), {'new york', 'newark'})
+        self.assertEqual(matching_cities(cities, 'york'), {'new york'})
+        self.assertEqual(matching_cities(cities, '  '), set())
+
+
+class CityAutocompleteTests(SimpleTestCase):
+    def setUp(self):
+        self.index = CityIndex(version=None)
+        self.index.add('origin', 'New York', bookings=5, routes=2)
+        self.index.add('origin', 'Newark', bookings=10, routes=1)
+        self.index.add('origin', 'Boston', bookings=0, routes=3)
+        self.index.add('destination', 'Boston', bookings=1, routes=1)
+        self.index.finalize()
+
+    def test_prefixes_of_any_word_rank_by_popularity(self):
+        self.assertEqual(self.index.suggest('origin', 'N'), ['Newark', 'New York'])
+        self.assertEqual(self.index.suggest('origin', 'new y'), ['New York'])
+        self.assertEqual(self.index.suggest('origin', 'york'), ['New York'])
+        self.assertEqual(self.index.suggest('origin', 'new', limit=1), ['Newark'])
+        self.assertEqual(self.index.suggest('destination', 'new'), [])
+
+    def test_one_typo_is_forgiven(self):
+        self.assertEqual(self.index.suggest('origin', 'bostn'), ['Boston'])  # missing
+        self.assertEqual(self.index.suggest('origin', 'bsoton'), ['Boston'])  # swapped
+        self.assertEqual(self.index.suggest('origin', 'bozton'), ['Boston'])  # wrong
+        self.assertEqual(self.index.suggest('origin', 'bxozton'), [])
+        self.assertEqual(self.index.suggest('origin', 'bx'), [])
+
+
+class SeatAllocationTests(SimpleTestCase):
+    # Three bus rows, 1A-1D to 3A-3D, the aisle between B and C
+    seats = [{'seat_number': number, 'seat_type': seat_type} for number, seat_type in seat_layout('Bus', 12)]
+
+    def numbers(self, positions):
+        return [self.seats[position]['seat_number'] for position in positions]
+
+    def test_pair_sits_on_one_side_of_the_aisle(self):
+        self.assertEqual(self.numbers(allocate(self.seats, [True] * 12, 2)), ['1A', '1B'])
+        self.assertEqual(self.numbers(allocate(self.seats, [True] * 12, 1, preference='aisle')), ['1B'])
+
+    def test_avoids_stranding_a_single_seat(self):
+        free = [True] * 12
+        free[3] = False  # 1D taken: seating the pair in 1A-1B would strand 1C
+        self.assertEqual(self.numbers(allocate(self.seats, free, 2)), ['2A', '2B'])
+
+    def test_large_group_takes_the_fewest_rows(self):
+        self.assertEqual(self.numbers(allocate(self.seats, [True] * 12, 6)), ['1A', '1B', '1C', '1D', '2A', '2B'])
+
+    def test_scattered_seats_follow_the_preference(self):
+        positions = allocate(self.seats, [True] * 12, 3, preference='window', together=False)
+        self.assertEqual(self.numbers(positions), ['1A', '1D', '2A'])
+
+    def test_too_few_free_seats(self):
+        with self.assertRaises(AllocationError):
+            allocate(self.seats, [True, True] + [False] * 10, 3)
+
+    def test_layout_uses_whole_rows(self):
+        self.assertEqual(len(seat_layout('Flight', 20)), 18)
+        self.assertEqual(seat_layout('Flight', 6)[:3], [('1A', 'window'), ('1B', 'middle'), ('1C', 'aisle')])
+        self.assertEqual(seat_layout('Ferry', 10), [])
+        self.assertEqual(seat_position('12C'), (12, 2))
+        self.assertIsNone(seat_position('C12'))
+
+
+class SnapshotSearchTests(SimpleTestCase):
+    def setUp(self):
+        self.day = timezone.now().date() + timedelta(days=1)
+        columns = snapshot.DayColumns(version=0, loaded_at=0)
+        # (id, route, departure hour, free seats); schedule 2 is sold out
+        for schedule_id, route_id, hour, seats in ((1, 10, 8, 5), (2, 10, 8, 0), (3, 11, 9, 5), (4, 10, 10, 5), (5, 10, 11, 5)):
+            columns.ids.append(schedule_id)
+            columns.route_ids.append(route_id)
+            columns.vehicle_ids.append(1)
+            columns.departures.append(hour * 3600)
+            columns.arrivals.append((hour + 1) * 3600)
+            columns.prices.append(2500)
+            columns.seats.append(seats)
+        self.columns = columns
+
+        timetable = snapshot.TimetableSnapshot()
+        timetable.routes = {10: {'id': 10}, 11: {'id': 11}}
+        timetable.route_types = {10: 'Bus', 11: 'Train'}
+        timetable.vehicles = {1: {'id': 1}}
+        mock.patch.object(snapshot, '_snapshot', timetable).start()
+        mock.patch.object(timetable, 'day', return_value=columns).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def ids(self, page):
+        return [record['id'] for record in page]
+
+    def test_pages_skip_sold_out_departures(self):
+        first = snapshot.search(departure_date=self.day, page_size=2)
+        self.assertEqual(self.ids(first), [1, 3])
+        second = snapshot.search(departure_date=self.day, page_size=2, after=first.next_cursor)
+        self.assertEqual(self.ids(second), [4, 5])
+        self.assertFalse(second.has_next())
+        back = snapshot.search(departure_date=self.day, page_size=2, before=second.previous_cursor)
+        self.assertEqual(self.ids(back), [1, 3])
+        self.assertFalse(back.has_previous())
+
+    def test_filters_by_transport_type(self):
+        page = snapshot.search(departure_date=self.day, transport_type='Train')
+        self.assertEqual(self.ids(page), [3])
+        self.assertEqual(page.object_list[0]['departure_time'], time(9, 0))
+
+    def test_only_dated_searches_in_the_window(self):
+        self.assertIsNone(snapshot.search(departure_date=None))
+        self.assertIsNone(snapshot.search(departure_date=self.day + timedelta(days=snapshot.TIMETABLE_SNAPSHOT_DAYS)))
+
+    def test_position_orders_by_departure_then_id(self):
+        self.assertEqual(self.columns.position(8 * 3600, 1), 1)
+        self.assertEqual(self.columns.position(8 * 3600, 1, inclusive=True), 0)
+        self.assertEqual(self.columns.position(9 * 3600, 0), 2)
@@ -1,10 +1,14 @@
 from django.urls import path
 from . import views
+from . import async_views
 
 app_name = 'transportation'
 
 urlpatterns = [
-    path('search/', views.SearchView.as_view(), name='search'),
+    path('search/', async_views.search, name='search'),
+    path('journeys/', views.journey_search, name='journey_search'),
+    path('autocomplete/', views.city_autocomplete, name='city_autocomplete'),
     path('schedule/<int:schedule_id>/', views.ScheduleDetailView.as_view(), name='schedule_detail'),
-    path('seat-map/<int:schedule_id>/', views.SeatMapView.as_view(), name='seat_map'),
+    path('seat-map/<int:schedule_id>/', async_views.seat_map, name='seat_map'),
+    path('seat-map/<int:schedule_id>/availability/', async_views.seat_availability, name='seat_availability'),
 ]
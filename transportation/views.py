@@ -1,46 +1,148 @@
 from django.shortcuts import render, get_object_or_404
 from django.views.generic import ListView, DetailView
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.db.models import Q
 from django.http import JsonResponse
+from ticket_reservation_system.mongo import native_reads_enabled
+from ticket_reservation_system.pagination import KeysetPaginationMixin
 from .models import Schedule, Seat, Route, TransportationType
+from . import allocation
+from . import autocomplete
+from . import inventory
+from . import journeys
+from . import repository
+from . import search_cache
+from . import snapshot
 from datetime import datetime
 
-class SearchView(ListView):
+def connecting_journeys(origin, destination, departure_date=None):
+    """Journey options for a search form: the fastest ones, then the cheapest if it is not among them."""
+    if not origin or not destination:
+        return []
+    try:
+        departure_date = Schedule._meta.get_field('departure_date').to_python(departure_date or None)
+    except ValidationError:
+        return []
+    result = journeys.plan(origin, destination, departure_date)
+    options = list(result['fastest'])
+    if result['cheapest'] and not result['cheapest_listed']:
+        options.append(result['cheapest'])
+    return options
+
+def parse_search_date(value):
+    """The departure date of a search, or None when it is missing or malformed."""
+    try:
+        return Schedule._meta.get_field('departure_date').to_python(value or None)
+    except ValidationError:
+        return None
+
+def seat_preference_choices():
+    return get_user_model()._meta.get_field('preferred_seat_type').choices
+
+class SearchView(KeysetPaginationMixin, ListView):
     model = Schedule
     template_name = 'transportation/search.html'
     context_object_name = 'schedules'
     paginate_by = 10
+    keyset_ordering = ('departure_date', 'departure_time', 'id')
 
     def get_queryset(self):
-        queryset = Schedule.objects.filter(status='scheduled')
+        # Sold-out departures are filtered in the query using the maintained seat counter
+        queryset = Schedule.objects.filter(status='scheduled', available_seats__gt=0)
 
         origin = self.request.GET.get('origin')
         destination = self.request.GET.get('destination')
-        departure_date = self.request.GET.get('departure_date')
+        departure_date = parse_search_date(self.request.GET.get('departure_date'))
         transport_type = self.request.GET.get('transport_type')
 
+        # Resolve cities through the route search index instead of regex scans
         if origin:
-            queryset = queryset.filter(route__origin__icontains=origin)
+            queryset = queryset.filter(route_id__in=search_cache.cached_route_ids('origin', origin))
         if destination:
-            queryset = queryset.filter(route__destination__icontains=destination)
+            queryset = queryset.filter(route_id__in=search_cache.cached_route_ids('destination', destination))
         if departure_date:
             queryset = queryset.filter(departure_date=departure_date)
         if transport_type:
             queryset = queryset.filter(route__transportation_type__name=transport_type)
 
-        return queryset.order_by('departure_date', 'departure_time')
+        return queryset.select_related('route__transportation_type', 'vehicle__transportation_type')
+
+    def get_keyset_page(self, queryset, page_size):
+        # Dated searches in the snapshot window never reach the database
+        page = snapshot.search(
+            origin=self.request.GET.get('origin'),
+            destination=self.request.GET.get('destination'),
+            departure_date=parse_search_date(self.request.GET.get('departure_date')),
+            transport_type=self.request.GET.get('transport_type'),
+            page_size=page_size,
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+        if page is not None:
+            return page
+
+        # Otherwise serve the page from the versioned search cache; the queryset
+        # is only evaluated on a miss, by a single request per key.
+        key = search_cache.results_key(
+            self.request.GET.get('origin'),
+            self.request.GET.get('destination'),
+            parse_search_date(self.request.GET.get('departure_date')),
+            self.request.GET.get('transport_type'),
+            f"{self.request.GET.get('after', '')}|{self.request.GET.get('before', '')}",
+        )
+        return search_cache.get_or_compute(key, lambda: self.compute_keyset_page(queryset, page_size))
+
+    def compute_keyset_page(self, queryset, page_size):
+        if native_reads_enabled():
+            return repository.search_schedules(
+                origin=self.request.GET.get('origin'),
+                destination=self.request.GET.get('destination'),
+                departure_date=parse_search_date(self.request.GET.get('departure_date')),
+                transport_type=self.request.GET.get('transport_type'),
+                page_size=page_size,
+                after=self.request.GET.get('after'),
+                before=self.request.GET.get('before'),
+            )
+        return super().get_keyset_page(queryset, page_size)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['transportation_types'] = TransportationType.objects.all()
+        context['transportation_types'] = search_cache.get_or_compute(
+            search_cache.TRANSPORT_TYPES_KEY,
+            lambda: list(TransportationType.objects.all()),
+            timeout=None
+        )
         context['search_params'] = {
             'origin': self.request.GET.get('origin', ''),
             'destination': self.request.GET.get('destination', ''),
             'departure_date': self.request.GET.get('departure_date', ''),
             'transport_type': self.request.GET.get('transport_type', ''),
         }
+        # No direct departure: offer journeys that change at an intermediate city
+        if not context['schedules'] and not self.request.GET.get('transport_type'):
+            context['journeys'] = connecting_journeys(
+                self.request.GET.get('origin'),
+                self.request.GET.get('destination'),
+                self.request.GET.get('departure_date'),
+            )
         return context
 
+def journey_search(request):
+    """Fastest and cheapest journeys between two cities as JSON, including connections."""
+    origin, destination = request.GET.get('origin'), request.GET.get('destination')
+    if not origin or not destination:
+        return JsonResponse({'error': 'origin and destination are required.'}, status=400)
+    try:
+        departure_date = Schedule._meta.get_field('departure_date').to_python(request.GET.get('departure_date') or None)
+    except ValidationError:
+        return JsonResponse({'error': 'Invalid departure_date.'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 3)), 1), 10)
+    except ValueError:
+        limit = 3
+    return JsonResponse(journeys.plan(origin, destination, departure_date, limit=limit))
+
 class ScheduleDetailView(DetailView):
     model = Schedule
     template_name = 'transportation/schedule_detail.html'
@@ -55,26 +157,66 @@ class SeatMapView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        schedule = self.get_object()
-        seats = Seat.objects.filter(vehicle=schedule.vehicle).order_by('seat_number')
-        context['seats'] = seats
+        user = self.request.user if self.request.user.is_authenticated else None
+        context['seat_rows'] = inventory.seat_map(self.object, user=user)
+        context['hold_minutes'] = inventory.SEAT_HOLD_TTL // 60
+        context['max_seats'] = allocation.MAX_GROUP_SIZE
+        context['preference_choices'] = seat_preference_choices()
         return context
 
     def post(self, request, *args, **kwargs):
-        # AJAX endpoint for seat selection
+        # AJAX endpoint for seat selection: holds the selected seats for a limited time
         schedule = self.get_object()
         seat_ids = request.POST.getlist('seat_ids')
 
-        selected_seats = Seat.objects.filter(
-            id__in=seat_ids,
-            vehicle=schedule.vehicle,
-            is_available=True
-        )
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Please log in to select seats.'}, status=401)
+
+        if request.POST.get('passengers'):
+            # Automatic allocation: pick and hold seats for the whole group in one request
+            try:
+                passengers = int(request.POST['passengers'])
+            except ValueError:
+                passengers = 0
+            if not 1 <= passengers <= allocation.MAX_GROUP_SIZE:
+                return JsonResponse({'error': f'Choose between 1 and {allocation.MAX_GROUP_SIZE} passengers.'}, status=400)
+            try:
+                seat_ids, expires_at = inventory.auto_hold_seats(
+                    schedule, passengers, request.user,
+                    preference=request.POST.get('preference') or request.user.preferred_seat_type,
+                    together=request.POST.get('together', '1') != '0',
+                )
+            except allocation.AllocationError:
+                return JsonResponse({'error': f'There are not enough free seats for {passengers} passengers.'}, status=409)
+            except inventory.SeatUnavailableError:
+                return JsonResponse({'error': 'The seat map is busy, please try again.'}, status=409)
+        else:
+            try:
+                if seat_ids:
+                    expires_at = inventory.hold_seats(schedule, seat_ids, request.user)
+                else:
+                    inventory.release_holds(schedule, request.user)
+                    expires_at = None
+            except inventory.SeatLimitError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            except (inventory.SeatUnavailableError, ValueError) as e:
+                unavailable = getattr(e, 'seat_ids', seat_ids)
+                return JsonResponse({'error': 'Some seats are no longer available.', 'unavailable': unavailable}, status=409)
 
+        held = set(int(seat_id) for seat_id in seat_ids)
         seat_data = [{
-            'id': seat.id,
-            'seat_number': seat.seat_number,
-            'seat_type': seat.seat_type,
-        } for seat in selected_seats]
+            'id': seat['id'],
+            'seat_number': seat['seat_number'],
+            'seat_type': seat['seat_type'],
+        } for row in inventory.seat_map(schedule, user=request.user) for seat in row['seats'] if seat['id'] in held]
+
+        return JsonResponse({'seats': seat_data, 'expires_at': expires_at})
 
-        return JsonResponse({'seats': seat_data})
+def city_autocomplete(request):
+    """City suggestions for the search form: ?q=<typed text>&field=origin|destination."""
+    field = request.GET.get('field', 'origin')
+    if field not in autocomplete.FIELDS:
+        return JsonResponse({'error': 'field must be origin or destination.'}, status=400)
+    response = JsonResponse({'results': autocomplete.suggest(field, request.GET.get('q', ''))})
+    response['Cache-Control'] = 'private, max-age=60'
+    return response